@@ -0,0 +1,33 @@
+"""create_processed_messages
+
+Revision ID: 3f6b0c1d27a4
+Revises: 975418163ed6
+Create Date: 2026-10-18 10:02:47.550912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6b0c1d27a4'
+down_revision: Union[str, None] = '975418163ed6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('processed_messages',
+    sa.Column('wamid', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('wamid')
+    )
+    op.create_index(op.f('ix_processed_messages_claimed_at'), 'processed_messages', ['claimed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_processed_messages_claimed_at'), table_name='processed_messages')
+    op.drop_table('processed_messages')
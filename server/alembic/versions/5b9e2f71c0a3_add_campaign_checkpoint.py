@@ -0,0 +1,33 @@
+"""add_campaign_checkpoint
+
+Revision ID: 5b9e2f71c0a3
+Revises: 8e41b7c2d5f0
+Create Date: 2026-10-18 15:02:44.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e2f71c0a3'
+down_revision: Union[str, None] = '8e41b7c2d5f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('campaigns', sa.Column('checkpoint_offset', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('campaigns', sa.Column('checkpoint_done', sa.JSON(), nullable=True))
+    op.add_column('campaigns', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    # Stale-campaign recovery scans running campaigns by heartbeat
+    op.create_index('ix_campaigns_status_heartbeat', 'campaigns', ['status', 'heartbeat_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_campaigns_status_heartbeat', table_name='campaigns')
+    op.drop_column('campaigns', 'heartbeat_at')
+    op.drop_column('campaigns', 'checkpoint_done')
+    op.drop_column('campaigns', 'checkpoint_offset')
@@ -0,0 +1,52 @@
+"""create_outbound_dead_letters
+
+Revision ID: 8e41b7c2d5f0
+Revises: c17d11d73c9d
+Create Date: 2026-10-18 12:03:47.512906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41b7c2d5f0'
+down_revision: Union[str, None] = 'c17d11d73c9d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('outbound_dead_letters',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('campaign_id', sa.String(), nullable=True),
+    sa.Column('recipient', sa.String(), nullable=False),
+    sa.Column('template_name', sa.String(), nullable=False),
+    sa.Column('template_data', sa.JSON(), nullable=True),
+    sa.Column('error_class', sa.String(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('error_code', sa.Integer(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('redriven_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbound_dead_letters_campaign_id'), 'outbound_dead_letters', ['campaign_id'], unique=False)
+    op.create_index(
+        'ix_outbound_dead_letters_dead',
+        'outbound_dead_letters',
+        ['created_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'dead'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbound_dead_letters_dead', table_name='outbound_dead_letters')
+    op.drop_index(op.f('ix_outbound_dead_letters_campaign_id'), table_name='outbound_dead_letters')
+    op.drop_table('outbound_dead_letters')
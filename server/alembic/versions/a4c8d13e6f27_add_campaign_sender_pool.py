@@ -0,0 +1,26 @@
+"""add_campaign_sender_pool
+
+Revision ID: a4c8d13e6f27
+Revises: 5b9e2f71c0a3
+Create Date: 2026-10-18 15:47:09.381144
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c8d13e6f27'
+down_revision: Union[str, None] = '5b9e2f71c0a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('campaigns', sa.Column('sender_pool', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('campaigns', 'sender_pool')
@@ -0,0 +1,82 @@
+"""create_campaign_recipients
+
+Revision ID: b7d3e5f19a42
+Revises: e2f4b6a81d35
+Create Date: 2026-10-18 18:02:15.640218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3e5f19a42'
+down_revision: Union[str, None] = 'e2f4b6a81d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('campaign_recipients',
+    sa.Column('campaign_id', sa.String(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('phone', sa.String(), nullable=False),
+    sa.Column('variables', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(), server_default='pending', nullable=False),
+    sa.Column('wamid', sa.String(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('delivered_at', sa.DateTime(), nullable=True),
+    sa.Column('read_at', sa.DateTime(), nullable=True),
+    sa.Column('failed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('campaign_id', 'position')
+    )
+    op.add_column('campaigns', sa.Column('recipient_count', sa.Integer(), nullable=True))
+
+    # Move the JSON recipient lists over. Whether the recipients of a
+    # campaign that already sent were reached is not known, so they are
+    # marked "unknown" rather than "pending".
+    op.execute("""
+        INSERT INTO campaign_recipients (campaign_id, position, phone, status)
+        SELECT c.id, r.ordinality - 1, r.value,
+               CASE WHEN c.status = 'pending'
+                      OR (c.status IN ('in_progress', 'paused') AND r.ordinality - 1 >= c.checkpoint_offset)
+                    THEN 'pending' ELSE 'unknown' END
+        FROM campaigns c,
+             json_array_elements_text(c.recipients) WITH ORDINALITY AS r(value, ordinality)
+        WHERE c.recipients IS NOT NULL AND json_typeof(c.recipients) = 'array'
+    """)
+    op.execute("""
+        UPDATE campaigns SET recipient_count = json_array_length(recipients)
+        WHERE recipients IS NOT NULL AND json_typeof(recipients) = 'array'
+    """)
+    op.drop_column('campaigns', 'recipients')
+
+    op.create_index('ix_campaign_recipients_status', 'campaign_recipients', ['campaign_id', 'status'], unique=False)
+    op.create_index(
+        'ix_campaign_recipients_wamid',
+        'campaign_recipients',
+        ['wamid'],
+        unique=False,
+        postgresql_where=sa.text('wamid IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.add_column('campaigns', sa.Column('recipients', sa.JSON(), nullable=True))
+    op.execute("""
+        UPDATE campaigns c SET recipients = r.phones
+        FROM (
+            SELECT campaign_id, json_agg(phone ORDER BY position) AS phones
+            FROM campaign_recipients
+            GROUP BY campaign_id
+        ) r
+        WHERE r.campaign_id = c.id AND c.recipient_type = 'individual'
+    """)
+    op.drop_index('ix_campaign_recipients_wamid', table_name='campaign_recipients')
+    op.drop_index('ix_campaign_recipients_status', table_name='campaign_recipients')
+    op.drop_column('campaigns', 'recipient_count')
+    op.drop_table('campaign_recipients')
@@ -0,0 +1,26 @@
+"""add_campaign_delivered_count
+
+Revision ID: c17d11d73c9d
+Revises: 3f6b0c1d27a4
+Create Date: 2026-10-18 10:41:13.204387
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c17d11d73c9d'
+down_revision: Union[str, None] = '3f6b0c1d27a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('campaigns', sa.Column('delivered_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('campaigns', 'delivered_count')
@@ -0,0 +1,75 @@
+"""create_campaign_jobs
+
+Revision ID: c5e8a2d47b16
+Revises: b7d3e5f19a42
+Create Date: 2026-10-18 21:14:52.307415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8a2d47b16'
+down_revision: Union[str, None] = 'b7d3e5f19a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('campaign_jobs',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('campaign_id', sa.String(), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sa.String(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_campaign_jobs_queued',
+        'campaign_jobs',
+        ['run_after'],
+        unique=False,
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+    op.create_index(
+        'ix_campaign_jobs_running',
+        'campaign_jobs',
+        ['heartbeat_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'running'"),
+    )
+    op.create_index(
+        'ix_campaign_jobs_open_send',
+        'campaign_jobs',
+        ['campaign_id'],
+        unique=True,
+        postgresql_where=sa.text("kind = 'send' AND status IN ('queued', 'running')"),
+    )
+
+    # Campaigns that were sending in the API process are picked up by the
+    # workers and resume from their checkpoint
+    op.execute("""
+        INSERT INTO campaign_jobs (kind, campaign_id, status, attempts, run_after, created_at)
+        SELECT 'send', id, 'queued', 0, now() at time zone 'utc', now() at time zone 'utc'
+        FROM campaigns
+        WHERE status = 'in_progress'
+           OR (status = 'pending' AND recipient_type <> 'upload')
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_campaign_jobs_open_send', table_name='campaign_jobs')
+    op.drop_index('ix_campaign_jobs_running', table_name='campaign_jobs')
+    op.drop_index('ix_campaign_jobs_queued', table_name='campaign_jobs')
+    op.drop_table('campaign_jobs')
@@ -0,0 +1,46 @@
+"""add_campaign_scheduled_at
+
+Revision ID: d8f1c3b59e27
+Revises: c5e8a2d47b16
+Create Date: 2026-10-18 23:40:11.928364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f1c3b59e27'
+down_revision: Union[str, None] = 'c5e8a2d47b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('campaigns', sa.Column('scheduled_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_campaigns_scheduled',
+        'campaigns',
+        ['scheduled_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'scheduled'"),
+    )
+
+
+def downgrade() -> None:
+    # Campaigns still waiting for their time go to the job queue, which
+    # holds them until run_after
+    op.execute("""
+        WITH released AS (
+            UPDATE campaigns SET status = 'pending'
+            WHERE status = 'scheduled'
+            RETURNING id, scheduled_at
+        )
+        INSERT INTO campaign_jobs (kind, campaign_id, status, attempts, run_after, created_at)
+        SELECT 'send', id, 'queued', 0, scheduled_at, now() at time zone 'utc'
+        FROM released
+    """)
+    op.drop_index('ix_campaigns_scheduled', table_name='campaigns')
+    op.drop_column('campaigns', 'scheduled_at')
@@ -0,0 +1,30 @@
+"""add_campaign_list_columns
+
+Revision ID: e2f4b6a81d35
+Revises: a4c8d13e6f27
+Create Date: 2026-10-18 16:31:52.907415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f4b6a81d35'
+down_revision: Union[str, None] = 'a4c8d13e6f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('campaigns', sa.Column('phone_column', sa.String(), nullable=True))
+    op.add_column('campaigns', sa.Column('column_mapping', sa.JSON(), nullable=True))
+    op.add_column('outbound_dead_letters', sa.Column('variables', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('outbound_dead_letters', 'variables')
+    op.drop_column('campaigns', 'column_mapping')
+    op.drop_column('campaigns', 'phone_column')
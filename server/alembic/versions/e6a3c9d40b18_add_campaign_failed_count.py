@@ -0,0 +1,41 @@
+"""add_campaign_failed_count
+
+Revision ID: e6a3c9d40b18
+Revises: d8f1c3b59e27
+Create Date: 2026-10-19 09:12:47.530218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a3c9d40b18'
+down_revision: Union[str, None] = 'd8f1c3b59e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('campaigns', sa.Column('failed_count', sa.Integer(), server_default='0', nullable=False))
+    # Failed status webhooks used to go to error_count; recipients with a
+    # message id were sent before they failed, so move them over
+    op.execute("""
+        UPDATE campaigns AS c SET
+            failed_count = f.failed,
+            error_count = GREATEST(0, c.error_count - f.failed)
+        FROM (
+            SELECT campaign_id, count(*) AS failed
+            FROM campaign_recipients
+            WHERE status = 'failed' AND wamid IS NOT NULL
+            GROUP BY campaign_id
+        ) AS f
+        WHERE c.id = f.campaign_id
+    """)
+
+
+def downgrade() -> None:
+    op.execute("UPDATE campaigns SET error_count = error_count + failed_count")
+    op.drop_column('campaigns', 'failed_count')
@@ -0,0 +1,38 @@
+"""add_dead_letter_position
+
+Revision ID: f3b8d1e62a97
+Revises: e6a3c9d40b18
+Create Date: 2026-10-19 14:26:05.318742
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1e62a97'
+down_revision: Union[str, None] = 'e6a3c9d40b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('outbound_dead_letters', sa.Column('position', sa.Integer(), nullable=True))
+    # Existing letters find their recipient by phone number, which is unique
+    # within a campaign
+    op.execute("""
+        UPDATE outbound_dead_letters AS d SET position = r.position
+        FROM (
+            SELECT campaign_id, phone, min(position) AS position
+            FROM campaign_recipients
+            WHERE status = 'failed'
+            GROUP BY campaign_id, phone
+        ) AS r
+        WHERE r.campaign_id = d.campaign_id AND r.phone = d.recipient
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('outbound_dead_letters', 'position')
@@ -16,13 +16,13 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+# Stateless apart from the shared Graph API pool, so one instance serves all requests
+_whatsapp_service = WhatsAppService()
+
+
 async def get_whatsapp_service() -> WhatsAppService:
     """Get WhatsApp service instance."""
-    service = WhatsAppService()
-    try:
-        yield service
-    finally:
-        await service.close()
+    return _whatsapp_service
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
     """Get current authenticated user."""
@@ -51,6 +51,123 @@ class Settings(BaseSettings):
     def WHATSAPP_API_URL(self) -> str:
         return f"https://graph.facebook.com/{self.VERSION}"
 
+    # Webhook Processing
+    # Reject deliveries whose x-hub-signature-256 does not match APP_SECRET
+    WEBHOOK_VERIFY_SIGNATURE: bool = True
+    # When enabled, POST /webhook only validates and enqueues the payload and a
+    # pool of background workers does the actual handling.
+    WEBHOOK_ACK_FAST: bool = False
+    WEBHOOK_QUEUE_SIZE: int = 1000
+    WEBHOOK_WORKERS: int = 8
+    # Maximum number of events from one delivery handled concurrently
+    WEBHOOK_EVENT_FANOUT: int = 16
+    # Durable inbox (requires WEBHOOK_ACK_FAST): payloads are committed in
+    # batches before they are acknowledged and replayed after a crash.
+    WEBHOOK_INBOX_ENABLED: bool = False
+    WEBHOOK_INBOX_BATCH_SIZE: int = 500
+    # Events being handled have their lease renewed every third of this; it
+    # only bounds how long a crashed replica's events wait to be replayed
+    WEBHOOK_INBOX_LEASE_SECONDS: int = 60
+    WEBHOOK_INBOX_MAX_ATTEMPTS: int = 5
+    WEBHOOK_INBOX_REPLAY_INTERVAL: float = 15.0
+    WEBHOOK_INBOX_RETENTION_HOURS: int = 24
+    # Per-conversation ordering: pending turns per user and total parallel turns
+    CONVERSATION_MAX_PENDING: int = 32
+    CONVERSATION_MAX_CONCURRENCY: int = 64
+    # Consecutive messages from one user within the window share one LLM turn;
+    # the first message of a burst is never held longer than the max wait.
+    MESSAGE_DEBOUNCE_SECONDS: float = 1.5
+    MESSAGE_DEBOUNCE_MAX_WAIT_SECONDS: float = 5.0
+    # Delivery/read statuses are grouped in memory and flushed as bulk updates
+    STATUS_FLUSH_INTERVAL: float = 2.0
+    STATUS_MAX_PENDING: int = 10000
+    # Inbound message dedupe keyed on wamid (LRU in front of a unique key)
+    MESSAGE_DEDUPE_ENABLED: bool = True
+    MESSAGE_DEDUPE_CACHE_SIZE: int = 100000
+    MESSAGE_DEDUPE_TTL_SECONDS: int = 86400
+    MESSAGE_DEDUPE_LEASE_SECONDS: int = 300
+    MESSAGE_DEDUPE_RETENTION_HOURS: int = 168
+
+    # Shared Graph API client: one keep-alive pool per process
+    GRAPH_HTTP2: bool = True
+    GRAPH_MAX_CONNECTIONS: int = 100
+    GRAPH_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    GRAPH_KEEPALIVE_EXPIRY: float = 60.0
+    GRAPH_CONNECT_TIMEOUT: float = 5.0
+    GRAPH_TIMEOUT: float = 30.0
+    GRAPH_MESSAGES_TIMEOUT: float = 10.0
+    GRAPH_MEDIA_TIMEOUT: float = 60.0
+
+    # Campaign fan-out: messages per second per phone number (WhatsApp
+    # throughput tier), bucket burst size and number of concurrent sends
+    WHATSAPP_MESSAGING_RATE: float = 80.0
+    WHATSAPP_MESSAGING_BURST: float = 1.0
+    CAMPAIGN_SEND_CONCURRENCY: int = 50
+    # On Graph API throttling (codes 4, 80007, 130429) the rate is cut by the
+    # factor and then raised by the step every interval back to the tier rate.
+    # Throttled sends are retried up to the retry limit.
+    WHATSAPP_RATE_DECREASE_FACTOR: float = 0.5
+    WHATSAPP_RATE_INCREASE_STEP: float = 5.0
+    WHATSAPP_RATE_INCREASE_INTERVAL: float = 1.0
+    WHATSAPP_RATE_MIN: float = 1.0
+    CAMPAIGN_THROTTLE_MAX_RETRIES: int = 5
+    # Transient send failures (5xx, timeouts) are retried with full-jitter
+    # exponential backoff; sends that still fail go to outbound_dead_letters.
+    CAMPAIGN_RETRY_MAX_ATTEMPTS: int = 5
+    CAMPAIGN_RETRY_BASE_DELAY: float = 1.0
+    CAMPAIGN_RETRY_MAX_DELAY: float = 60.0
+    # Minimum spacing between messages to the same recipient (Meta pair rate,
+    # error 131056). Campaign workers set a send aside instead of waiting
+    # longer than CAMPAIGN_MAX_PAIR_WAIT for its slot.
+    WHATSAPP_PAIR_RATE_INTERVAL: float = 6.0
+    CAMPAIGN_MAX_PAIR_WAIT: float = 0.5
+    # Campaign progress is checkpointed every batch of recipients or interval
+    # seconds, whichever comes first.
+    CAMPAIGN_CHECKPOINT_BATCH: int = 500
+    CAMPAIGN_CHECKPOINT_INTERVAL: float = 5.0
+    # Campaigns are sent by workers (python -m app.worker) that claim queued
+    # jobs from campaign_jobs, up to CAMPAIGN_WORKER_JOBS at a time each. A
+    # job whose worker stopped renewing its lease for CAMPAIGN_STALE_SECONDS
+    # is taken over and resumed, at most CAMPAIGN_JOB_MAX_ATTEMPTS times.
+    # CAMPAIGN_WORKER_IN_PROCESS also runs a worker inside the API process.
+    CAMPAIGN_WORKER_JOBS: int = 4
+    CAMPAIGN_WORKER_POLL_INTERVAL: float = 1.0
+    CAMPAIGN_STALE_SECONDS: float = 120.0
+    CAMPAIGN_JOB_MAX_ATTEMPTS: int = 5
+    CAMPAIGN_JOB_RETENTION_HOURS: int = 168
+    CAMPAIGN_WORKER_IN_PROCESS: bool = False
+    # Scheduled campaigns are queued when due by one worker at a time, chosen
+    # with a Postgres advisory lock. It reads up to CAMPAIGN_SCHEDULER_BATCH
+    # due campaigns every interval seconds, so one scheduled less than the
+    # interval ahead may start up to that late.
+    CAMPAIGN_SCHEDULER_INTERVAL: float = 10.0
+    CAMPAIGN_SCHEDULER_BATCH: int = 1000
+    # A sender number of a campaign pool is taken out of rotation for the
+    # cooldown after this many server, timeout or auth errors in a row
+    SENDER_FAILURE_THRESHOLD: int = 5
+    SENDER_COOLDOWN_SECONDS: float = 60.0
+    # Country code given to numbers written without one (a trunk 0 or at
+    # most 10 digits); empty takes every number as including its country code
+    PHONE_DEFAULT_COUNTRY_CODE: str = ""
+    # Recipient lists (CSV/XLSX) of list campaigns: local files are looked up
+    # in CAMPAIGN_LIST_DIR, http(s) URLs are downloaded first. Rows are read
+    # CAMPAIGN_LIST_CHUNK_SIZE at a time.
+    CAMPAIGN_LIST_DIR: str = "uploads/campaign_lists"
+    CAMPAIGN_LIST_CHUNK_SIZE: int = 5000
+    CAMPAIGN_LIST_DOWNLOAD_TIMEOUT: float = 300.0
+    # Recipients are read back from campaign_recipients this many at a time
+    CAMPAIGN_RECIPIENT_BATCH: int = 5000
+    # Streamed recipient uploads are validated and stored this many lines at a time
+    RECIPIENT_UPLOAD_BATCH_LINES: int = 10000
+    RECIPIENT_UPLOAD_MAX_LINE_BYTES: int = 65536
+    # Message templates are cached and refetched every TTL seconds; a lookup
+    # of an unknown name searches the Graph API at most once per miss interval
+    TEMPLATE_CACHE_TTL: float = 300.0
+    TEMPLATE_MISS_REFRESH_INTERVAL: float = 30.0
+    # Warn when the event loop is held longer than this (seconds)
+    LOOP_LAG_MONITOR: bool = True
+    LOOP_LAG_THRESHOLD: float = 0.1
+
     # OpenAI Configuration
     OPENAI_API_KEY: str
     OPENAI_ASSISTANT_ID: str
@@ -0,0 +1,162 @@
+"""Process-wide pooled HTTP client for the Meta Graph API."""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401 - only needed so httpx can negotiate HTTP/2
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - http2 is an optional extra of httpx
+    HTTP2_AVAILABLE = False
+
+
+class GraphClient:
+    """One keep-alive connection pool to graph.facebook.com per process.
+
+    Every Graph API caller goes through the same ``httpx.AsyncClient``, so
+    TLS handshakes only happen when the pool grows. Over HTTP/2 many requests
+    share one connection. The client is opened on startup and closed on
+    shutdown; it is also created on first use so that scripts work without
+    the app lifespan. An httpcore trace hook counts new connections against
+    requests so the reuse ratio can be watched in production.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        # A custom transport (e.g. httpx.MockTransport) replaces the network
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._requests = 0
+        self._connections = 0
+        self._tls_handshakes = 0
+        self._http2_responses = 0
+        self._pages = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._ensure_client()
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        """Build the client if there is none open yet, and return it."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build()
+        return self._client
+
+    def _build(self) -> httpx.AsyncClient:
+        http2 = settings.GRAPH_HTTP2 and HTTP2_AVAILABLE
+        if settings.GRAPH_HTTP2 and not HTTP2_AVAILABLE:
+            logger.warning("h2 is not installed; Graph API client falls back to HTTP/1.1")
+        return httpx.AsyncClient(
+            base_url=settings.WHATSAPP_API_URL,
+            headers={
+                "Authorization": f"Bearer {settings.WHATSAPP_TOKEN}",
+                "Content-Type": "application/json",
+            },
+            http2=http2,
+            transport=self.transport,
+            limits=httpx.Limits(
+                max_connections=settings.GRAPH_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GRAPH_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GRAPH_KEEPALIVE_EXPIRY,
+            ),
+            timeout=self.timeout("default"),
+            event_hooks={"request": [self._on_request], "response": [self._on_response]},
+        )
+
+    @staticmethod
+    def timeout(endpoint: str = "default") -> httpx.Timeout:
+        """Timeout for a class of Graph endpoints: messages, media or default."""
+        read = {
+            "messages": settings.GRAPH_MESSAGES_TIMEOUT,
+            "media": settings.GRAPH_MEDIA_TIMEOUT,
+        }.get(endpoint, settings.GRAPH_TIMEOUT)
+        return httpx.Timeout(read, connect=settings.GRAPH_CONNECT_TIMEOUT)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[httpx.AsyncClient]:
+        """Drop-in for ``async with httpx.AsyncClient()`` that keeps the pool open."""
+        yield self.client
+
+    async def paginate(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        page_size: int = 100,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the items of a Graph API list edge, following its cursors.
+
+        While the caller works through one page, the next page is already
+        being fetched. Stopping early (``break`` or ``aclose``) cancels that
+        prefetch, so no further pages are requested.
+        """
+
+        async def fetch(page_url: str, page_params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            response = await self.client.get(page_url, params=page_params, headers=headers)
+            response.raise_for_status()
+            return response.json()
+
+        loop = asyncio.get_running_loop()
+        pending: Optional[asyncio.Future] = loop.create_task(
+            fetch(url, {"limit": page_size, **(params or {})})
+        )
+        try:
+            while pending is not None:
+                page = await pending
+                # The next link is absolute and carries the cursor and all params
+                next_url = page.get("paging", {}).get("next")
+                pending = loop.create_task(fetch(next_url, None)) if next_url else None
+                self._pages += 1
+                for item in page.get("data", []):
+                    yield item
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+
+    async def start(self) -> None:
+        self._ensure_client()
+        logger.info(
+            f"Graph API client ready (http2={settings.GRAPH_HTTP2 and HTTP2_AVAILABLE}, "
+            f"max_connections={settings.GRAPH_MAX_CONNECTIONS})"
+        )
+
+    async def close(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        self._requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _on_response(self, response: httpx.Response) -> None:
+        if response.http_version == "HTTP/2":
+            self._http2_responses += 1
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self._connections += 1
+        elif event_name == "connection.start_tls.complete":
+            self._tls_handshakes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        reused = max(0, self._requests - self._connections)
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "requests": self._requests,
+            "new_connections": self._connections,
+            "tls_handshakes": self._tls_handshakes,
+            "http2_responses": self._http2_responses,
+            "pages": self._pages,
+            "reuse_ratio": round(reused / self._requests, 4) if self._requests else 0.0,
+        }
+
+
+graph_client = GraphClient()
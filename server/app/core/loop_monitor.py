@@ -0,0 +1,72 @@
+"""Detect code that blocks the asyncio event loop."""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up a periodic sleeper.
+
+    A coroutine sleeps for ``interval`` seconds and checks how much later
+    than that it actually resumed. Any lag comes from a callback that held
+    the loop, for example a synchronous HTTP call or a heavy computation
+    inside ``async def``. Stalls longer than ``threshold`` are logged with
+    their duration.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._task: Optional[asyncio.Task] = None
+        self._samples = 0
+        self._total_lag = 0.0
+        self._max_lag = 0.0
+        self._stalls = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def max_lag(self) -> float:
+        return self._max_lag
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self._samples += 1
+            self._total_lag += lag
+            self._max_lag = max(self._max_lag, lag)
+            if lag > self.threshold:
+                self._stalls += 1
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "stalls": self._stalls,
+            "max_lag_ms": round(self._max_lag * 1000, 2),
+            "average_lag_ms": round(self._total_lag / self._samples * 1000, 3) if self._samples else 0.0,
+        }
+
+
+loop_monitor = LoopLagMonitor(threshold=settings.LOOP_LAG_THRESHOLD)
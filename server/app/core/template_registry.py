@@ -0,0 +1,223 @@
+"""Process-wide cache of the WABA's message templates."""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.graph_client import graph_client
+
+TEMPLATE_FIELDS = "id,name,status,language,category,components"
+
+TemplateKey = Tuple[str, str]
+
+
+class TemplateRegistry:
+    """Message templates indexed by (name, language).
+
+    The whole template list is fetched page by page and swapped in at once,
+    every ``ttl`` seconds in the background. Lookups never wait on the
+    Graph API unless the registry is empty, or the name is unknown and
+    nothing was fetched in the last ``miss_refresh_interval`` seconds.
+    ``message_template_status_update`` webhooks change a template's status
+    straight away. A template approved before it was ever fetched triggers
+    a refresh. A lookup of an unknown name pages through the templates only
+    until it finds it.
+    """
+
+    def __init__(self, ttl: float = 300.0, miss_refresh_interval: float = 30.0) -> None:
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self._templates: Dict[TemplateKey, Dict[str, Any]] = {}
+        self._by_name: Dict[str, List[TemplateKey]] = {}
+        self._loaded_at: Optional[float] = None
+        # Created on first use, inside the running loop
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending_refresh: Optional[asyncio.Task] = None
+        self._searched_at = float("-inf")
+        self._refreshes = 0
+        self._failures = 0
+        self._hits = 0
+        self._misses = 0
+        self._status_updates = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @staticmethod
+    def iterate() -> AsyncIterator[Dict[str, Any]]:
+        """Every template of the WABA straight from the Graph API, page by page."""
+        return graph_client.paginate(
+            f"/{settings.BUSINESS_ID}/message_templates", params={"fields": TEMPLATE_FIELDS}
+        )
+
+    async def _fetch_all(self) -> List[Dict[str, Any]]:
+        return [template async for template in self.iterate()]
+
+    async def refresh(self) -> None:
+        """Fetch every template and replace the index; one refresh at a time."""
+        started = time.monotonic()
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            # Someone else refreshed while we waited for the lock
+            if self._loaded_at is not None and self._loaded_at >= started:
+                return
+            try:
+                templates = await self._fetch_all()
+            except Exception as e:
+                self._failures += 1
+                logger.error(f"Failed to refresh message templates: {str(e)}")
+                raise
+            index: Dict[TemplateKey, Dict[str, Any]] = {}
+            by_name: Dict[str, List[TemplateKey]] = {}
+            for template in templates:
+                key = (template.get("name", ""), template.get("language", ""))
+                index[key] = template
+                by_name.setdefault(key[0], []).append(key)
+            self._templates, self._by_name = index, by_name
+            self._loaded_at = time.monotonic()
+            self._refreshes += 1
+            logger.info(f"Loaded {len(index)} message templates")
+
+    async def get(
+        self, name: str, language: Optional[str] = None, approved_only: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """The template called ``name``, in ``language`` when given."""
+        template = self._lookup(name, language, approved_only)
+        if template is None and self._loaded_at is None:
+            try:
+                await self.refresh()
+            except Exception:
+                pass
+            template = self._lookup(name, language, approved_only)
+        elif template is None and self._should_search_on_miss():
+            template = await self._search(name, language, approved_only)
+        if template is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return template
+
+    def _lookup(
+        self, name: str, language: Optional[str], approved_only: bool
+    ) -> Optional[Dict[str, Any]]:
+        keys = [(name, language)] if language else self._by_name.get(name, [])
+        for key in keys:
+            template = self._templates.get(key)
+            if template and (not approved_only or template.get("status") == "APPROVED"):
+                return template
+        return None
+
+    def _should_search_on_miss(self) -> bool:
+        now = time.monotonic()
+        if now - max(self._loaded_at or 0.0, self._searched_at) < self.miss_refresh_interval:
+            return False
+        self._searched_at = now
+        return True
+
+    async def _search(
+        self, name: str, language: Optional[str], approved_only: bool
+    ) -> Optional[Dict[str, Any]]:
+        """Page through the Graph API until the template turns up, then stop."""
+        try:
+            async for template in self.iterate():
+                if template.get("name") != name:
+                    continue
+                if language and template.get("language") != language:
+                    continue
+                self._add(template)
+                if not approved_only or template.get("status") == "APPROVED":
+                    return template
+        except Exception as e:
+            logger.error(f"Failed to look up template {name}: {str(e)}")
+        return None
+
+    def _add(self, template: Dict[str, Any]) -> None:
+        key = (template.get("name", ""), template.get("language", ""))
+        # Copy on write, like refresh, so readers never see a half-updated index
+        keys = self._by_name.get(key[0], [])
+        self._templates = {**self._templates, key: template}
+        self._by_name = {**self._by_name, key[0]: keys if key in keys else [*keys, key]}
+
+    async def approved(self) -> List[Dict[str, Any]]:
+        if self._loaded_at is None:
+            await self.refresh()
+        return [t for t in self._templates.values() if t.get("status") == "APPROVED"]
+
+    def apply_status_update(self, value: Dict[str, Any]) -> None:
+        """Apply a ``message_template_status_update`` webhook value."""
+        self._status_updates += 1
+        name = value.get("message_template_name", "")
+        language = value.get("message_template_language", "")
+        status = value.get("event", "")
+        template = self._templates.get((name, language))
+        if template is not None:
+            # Copy on write: readers may hold the old dict
+            self._templates[(name, language)] = {**template, "status": status}
+            logger.info(f"Template {name} ({language}) is now {status}")
+        elif status == "APPROVED":
+            # Components are not in the webhook; fetch the new template
+            self.schedule_refresh()
+
+    def schedule_refresh(self) -> None:
+        """Refresh in the background, e.g. when templates were edited in Meta."""
+        if self._pending_refresh is not None and not self._pending_refresh.done():
+            return
+
+        async def run() -> None:
+            try:
+                await self.refresh()
+            except Exception:
+                pass
+
+        self._pending_refresh = asyncio.get_running_loop().create_task(
+            run(), name="template-refresh"
+        )
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        try:
+            await self.refresh()
+        except Exception:
+            # Serve lookups with on-demand refreshes until the loop succeeds
+            pass
+        self._task = asyncio.create_task(self._run(), name="template-registry")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, self._pending_refresh) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._pending_refresh = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.refresh()
+            except Exception:
+                # Keep serving the last good copy
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "templates": len(self._templates),
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            "refreshes": self._refreshes,
+            "refresh_failures": self._failures,
+            "hits": self._hits,
+            "misses": self._misses,
+            "status_updates": self._status_updates,
+        }
+
+
+template_registry = TemplateRegistry(
+    ttl=settings.TEMPLATE_CACHE_TTL,
+    miss_refresh_interval=settings.TEMPLATE_MISS_REFRESH_INTERVAL,
+)
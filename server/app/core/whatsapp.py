@@ -1,6 +1,8 @@
 import httpx
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from app.core.config import settings
+from app.core.graph_client import graph_client
+from app.core.template_registry import template_registry
 from app.schemas.whatsapp import PhoneNumber
 from fastapi import HTTPException, Request
 import logging
@@ -64,131 +66,74 @@ class WhatsAppClient:
         
         print("=== WhatsApp Client Initialized Successfully ===\n")
 
-    async def get_phone_numbers(
-        self, 
+    async def iter_phone_numbers(
+        self,
         business_id: str,
         sort_ascending: bool = False,
         account_mode: Optional[str] = None
-    ) -> List[PhoneNumber]:
+    ) -> AsyncIterator[PhoneNumber]:
         """
-        Fetch all phone numbers associated with the business account using Graph API
+        Yield the phone numbers of the business account page by page,
+        following Graph API cursors; stop iterating to stop fetching
         """
-        print("\n=== Starting Phone Number Fetch ===")
-        
-        try:
-            if not business_id:
-                error_msg = "business_id is required"
-                print(f"\nERROR: {error_msg}")
-                raise ValueError(error_msg)
+        if not business_id:
+            raise HTTPException(status_code=400, detail="business_id is required")
 
-            # Construct URL and parameters
-            url = f"{self.base_url}/{self.version}/{business_id}/phone_numbers"
-            params = {}
-            
-            if sort_ascending:
-                params["sort"] = "last_onboarded_time_ascending"
-            if account_mode:
-                params["account_mode"] = account_mode
-            
-            # Log request details
-            print("\nRequest Details:")
-            print(f"- URL: {url}")
-            print(f"- Method: GET")
-            print(f"- Parameters: {json.dumps(params)}")
-            print(f"- Headers: {json.dumps({k: '***' if k == 'Authorization' else v for k, v in self.headers.items()})}")
-            
-            # Make the request
-            print("\nMaking request to Meta API...")
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url, 
-                    headers=self.headers,
-                    params=params,
-                    timeout=30.0
-                )
-                
-                # Log response details
-                print("\n=== Meta API Response ===")
-                print(f"- Status Code: {response.status_code}")
-                print(f"- Content Type: {response.headers.get('content-type', 'unknown')}")
-                print(f"- Response Body: {response.text[:2000]}")
-                
-                # Handle non-200 responses
-                if response.status_code != 200:
-                    error_msg = f"Meta API error: {response.text}"
-                    print(f"\nERROR: {error_msg}")
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=error_msg
-                    )
-                
-                # Parse response
+        params = {}
+        if sort_ascending:
+            params["sort"] = "last_onboarded_time_ascending"
+        if account_mode:
+            params["account_mode"] = account_mode
+
+        logger.debug(f"Fetching phone numbers for {business_id} with {params}")
+        try:
+            async for number in graph_client.paginate(
+                f"{self.base_url}/{self.version}/{business_id}/phone_numbers",
+                params=params,
+                headers=self.headers
+            ):
                 try:
-                    data = response.json()
-                    print("\nRaw Meta API Response Data:")
-                    print(json.dumps(data, indent=2))
-                except json.JSONDecodeError as e:
-                    error_msg = f"Failed to parse JSON response: {str(e)}"
-                    print(f"\nERROR: {error_msg}")
-                    print(f"Raw response: {response.text[:1000]}")
-                    raise HTTPException(status_code=500, detail=error_msg)
-                
-                # Process phone numbers
-                if not data or "data" not in data:
-                    print("\nWarning: No phone numbers in response")
-                    return []
-
-                phone_numbers = []
-                print("\nProcessing phone numbers:")
-                for number in data.get("data", []):
-                    try:
-                        print(f"\nProcessing number data:")
-                        print(json.dumps(number, indent=2))
-                        
-                        # Check if the number is registered with WhatsApp
-                        verification_status = number.get("code_verification_status")
-                        whatsapp_registered = verification_status == "VERIFIED"
-                        
-                        phone_number = PhoneNumber(
-                            id=number.get("id"),
-                            verified_name=number.get("verified_name"),
-                            display_phone_number=number.get("display_phone_number"),
-                            quality_rating=number.get("quality_rating", "NA"),
-                            code_verification_status=verification_status,
-                            whatsapp_registered=whatsapp_registered
-                        )
-                        phone_numbers.append(phone_number)
-                        print("Successfully processed phone number:")
-                        print(json.dumps(phone_number.dict(), indent=2))
-                        
-                    except Exception as e:
-                        print(f"\nError processing phone number: {str(e)}")
-                        print(f"Problematic data: {json.dumps(number, indent=2)}")
-
-                print(f"\n=== Phone Number Fetch Completed ===")
-                print(f"Successfully processed {len(phone_numbers)} phone numbers")
-                return phone_numbers
+                    # Check if the number is registered with WhatsApp
+                    verification_status = number.get("code_verification_status")
+                    yield PhoneNumber(
+                        id=number.get("id"),
+                        verified_name=number.get("verified_name"),
+                        display_phone_number=number.get("display_phone_number"),
+                        quality_rating=number.get("quality_rating", "NA"),
+                        code_verification_status=verification_status,
+                        whatsapp_registered=verification_status == "VERIFIED"
+                    )
+                except ValueError as e:
+                    logger.error(f"Skipping malformed phone number {number.get('id')}: {str(e)}")
 
         except httpx.TimeoutException:
-            error_msg = "Meta API request timed out after 30 seconds"
-            print(f"\nERROR: {error_msg}")
-            raise HTTPException(status_code=504, detail=error_msg)
-            
-        except httpx.HTTPError as e:
-            error_msg = f"HTTP Error in Meta API call: {str(e)}"
-            print(f"\nERROR: {error_msg}")
-            if hasattr(e, 'response'):
-                print(f"Response status: {e.response.status_code}")
-                print(f"Response body: {e.response.text}")
+            raise HTTPException(status_code=504, detail="Meta API request timed out")
+
+        except httpx.HTTPStatusError as e:
             raise HTTPException(
-                status_code=e.response.status_code if hasattr(e, 'response') else 500,
-                detail=error_msg
+                status_code=e.response.status_code,
+                detail=f"Meta API error: {e.response.text}"
             )
-            
-        except Exception as e:
-            error_msg = f"Unexpected error in get_phone_numbers: {str(e)}"
-            print(f"\nERROR: {error_msg}")
-            raise HTTPException(status_code=500, detail=error_msg)
+
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"HTTP Error in Meta API call: {str(e)}")
+
+    async def get_phone_numbers(
+        self, 
+        business_id: str,
+        sort_ascending: bool = False,
+        account_mode: Optional[str] = None
+    ) -> List[PhoneNumber]:
+        """
+        Fetch all phone numbers associated with the business account using Graph API
+        """
+        phone_numbers = [
+            number async for number in self.iter_phone_numbers(
+                business_id, sort_ascending=sort_ascending, account_mode=account_mode
+            )
+        ]
+        logger.debug(f"Fetched {len(phone_numbers)} phone numbers")
+        return phone_numbers
 
     async def get_single_phone_number(self, phone_number_id: str, include_name_status: bool = False):
         """
@@ -204,7 +149,7 @@ class WhatsAppClient:
             logger.debug(f"Request params: {params}")
             logger.debug(f"Request headers: {self.headers}")
 
-            async with httpx.AsyncClient() as client:
+            async with graph_client.session() as client:
                 response = await client.get(
                     url,
                     headers=self.headers,
@@ -234,7 +179,7 @@ class WhatsAppClient:
         method: str
     ):
         """Request a verification code for a phone number"""
-        async with httpx.AsyncClient() as client:
+        async with graph_client.session() as client:
             response = await client.post(
                 f"{self.base_url}/{self.version}/{business_id}/request_code",
                 headers=self.headers,
@@ -255,7 +200,7 @@ class WhatsAppClient:
         code: str
     ):
         """Verify a phone number using the received code"""
-        async with httpx.AsyncClient() as client:
+        async with graph_client.session() as client:
             response = await client.post(
                 f"{self.base_url}/{self.version}/{business_id}/verify_code",
                 headers=self.headers,
@@ -300,7 +245,7 @@ class WhatsAppClient:
         logger.info(f"Headers: {{'Authorization': 'Bearer {self.access_token[:5]}...'}}")
         logger.info(f"Request body: {data}")
         
-        async with httpx.AsyncClient() as client:
+        async with graph_client.session() as client:
             response = await client.post(
                 url,
                 headers={"Authorization": f"Bearer {self.access_token}"},
@@ -334,7 +279,7 @@ class WhatsAppClient:
             logger.debug(f"Request payload: {json.dumps(payload, indent=2)}")
             logger.debug(f"Request headers: {json.dumps(self.headers, indent=2)}")
             
-            async with httpx.AsyncClient() as client:
+            async with graph_client.session() as client:
                 logger.debug("Sending registration request...")
                 response = await client.post(
                     url,
@@ -380,87 +325,54 @@ class WhatsAppClient:
             raise 
 
     async def get_template_content(self, phone_number_id: str, template_name: str):
-        """Fetch template content from Meta/WhatsApp API"""
+        """Template content from the shared template registry"""
         try:
-            url = f"{self.base_url}/{self.version}/{self.business_id}/message_templates"
-            params = {
-                "name": template_name,
-                "fields": "name,components,language,status"
+            template = await template_registry.get(template_name, approved_only=False)
+
+            if not template:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Template {template_name} not found"
+                )
+
+            # Process components into the expected format
+            content = {
+                "header": None,
+                "body": None,
+                "footer": None,
+                "buttons": []
             }
             
-            logger.debug(f"Fetching template content from: {url}")
-            logger.debug(f"Parameters: {params}")
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    headers=self.headers,
-                    params=params
-                )
-                
-                logger.debug(f"Response status: {response.status_code}")
-                logger.debug(f"Response body: {response.text}")
+            for component in template.get("components", []):
+                component_type = component.get("type", "").lower()
                 
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Failed to fetch template content: {response.text}"
-                    )
-                    
-                data = response.json()
-                templates = data.get("data", [])
-                
-                # Find the specific template by name
-                template = None
-                for t in templates:
-                    if t.get("name") == template_name:
-                        template = t
-                        break
-                        
-                if not template:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Template {template_name} not found"
-                    )
-                
-                # Process components into the expected format
-                content = {
-                    "header": None,
-                    "body": None,
-                    "footer": None,
-                    "buttons": []
-                }
-                
-                for component in template.get("components", []):
-                    component_type = component.get("type", "").lower()
-                    
-                    if component_type == "header":
-                        content["header"] = {
-                            "format": component.get("format", "text").lower(),
-                            "text": component.get("text", "")
+                if component_type == "header":
+                    content["header"] = {
+                        "format": component.get("format", "text").lower(),
+                        "text": component.get("text", "")
+                    }
+                elif component_type == "body":
+                    content["body"] = component.get("text", "")
+                elif component_type == "footer":
+                    content["footer"] = component.get("text", "")
+                elif component_type == "buttons":
+                    content["buttons"] = [
+                        {
+                            "type": btn.get("type", ""),
+                            "text": btn.get("text", ""),
+                            "url": btn.get("url", "") if btn.get("type") == "URL" else None
                         }
-                    elif component_type == "body":
-                        content["body"] = component.get("text", "")
-                    elif component_type == "footer":
-                        content["footer"] = component.get("text", "")
-                    elif component_type == "buttons":
-                        content["buttons"] = [
-                            {
-                                "type": btn.get("type", ""),
-                                "text": btn.get("text", ""),
-                                "url": btn.get("url", "") if btn.get("type") == "URL" else None
-                            }
-                            for btn in component.get("buttons", [])
-                        ]
-                
-                # Return the processed template data
-                return {
-                    "name": template.get("name", ""),
-                    "language": template.get("language", ""),
-                    "status": template.get("status", ""),
-                    "content": content
-                }
-                
+                        for btn in component.get("buttons", [])
+                    ]
+            
+            # Return the processed template data
+            return {
+                "name": template.get("name", ""),
+                "language": template.get("language", ""),
+                "status": template.get("status", ""),
+                "content": content
+            }
+
         except HTTPException as http_error:
             logger.error(f"HTTP error in get_template_content: {str(http_error)}")
             raise http_error
@@ -511,6 +423,17 @@ class WhatsAppWebhook:
             logger.error(f"Error processing webhook: {str(e)}")
             raise HTTPException(status_code=500, detail="Error processing webhook")
 
+    async def handle_account_updates(self, payload: Dict[str, Any]):
+        """Handle every change of a webhook except messages and statuses
+
+        Message traffic is handled by the bot; this covers template and
+        phone number notifications delivered on the same endpoint.
+        """
+        for entry in payload.get('entry', []):
+            for change in entry.get('changes', []):
+                if change.get('field') != 'messages':
+                    await self._process_webhook_change(change)
+
     async def _process_webhook_change(self, change: Dict[str, Any]):
         """Process different types of webhook changes"""
         field = change['field']
@@ -519,6 +442,8 @@ class WhatsAppWebhook:
         handlers = {
             'messages': self._handle_message,
             'message_template_status_update': self._handle_template_status,
+            'message_template_components_update': self._handle_template_change,
+            'template_category_update': self._handle_template_change,
             'phone_number_quality_update': self._handle_quality_update,
             # Add more handlers as needed
         }
@@ -537,6 +462,12 @@ class WhatsAppWebhook:
     async def _handle_template_status(self, value: Dict[str, Any]):
         """Handle template status updates"""
         logger.info(f"Template status update: {value}")
+        template_registry.apply_status_update(value)
+
+    async def _handle_template_change(self, value: Dict[str, Any]):
+        """Template components or category were edited in Meta"""
+        logger.info(f"Template change: {value}")
+        template_registry.schedule_refresh()
 
     async def _handle_quality_update(self, value: Dict[str, Any]):
         """Handle phone number quality updates"""
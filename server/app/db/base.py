@@ -3,3 +3,8 @@ from app.db.base_class import Base  # noqa
 from app.models.order import Order, KnowledgeBase  # noqa
 from app.models.user import User
 from app.models.campaign import Campaign
+from app.models.webhook_inbox import InboxEvent
+from app.models.processed_message import ProcessedMessage
+from app.models.dead_letter import OutboundDeadLetter
+from app.models.campaign_recipient import CampaignRecipient
+from app.models.campaign_job import CampaignJob
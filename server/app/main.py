@@ -5,8 +5,19 @@ from loguru import logger
 
 from app.api.v1.router import api_router
 from app.core.config import settings
+from app.core.graph_client import graph_client
+from app.core.loop_monitor import loop_monitor
+from app.core.template_registry import template_registry
 from app.core.logger import setup_logging
 from app.api.v1.whatsapp import router as whatsapp_router
+from app.api.v1.whatsapp.router import (
+    campaign_scheduler,
+    campaign_worker,
+    resubmit_inbox_event,
+    webhook_dispatcher,
+    webhook_inbox,
+    whatsapp_bot,
+)
 
 app = FastAPI(
     title="WhatsApp Bot API",
@@ -37,10 +48,36 @@ app.include_router(
 @app.on_event("startup")
 async def startup_event() -> None:
     logger.info("Starting up WhatsApp Bot API")
+    await graph_client.start()
+    if settings.LOOP_LAG_MONITOR:
+        await loop_monitor.start()
+    await whatsapp_bot.status_pipeline.start()
+    await template_registry.start()
+    # Campaigns are normally sent by separate worker processes (app.worker)
+    if settings.CAMPAIGN_WORKER_IN_PROCESS:
+        await campaign_worker.start()
+        await campaign_scheduler.start()
+    if settings.WEBHOOK_ACK_FAST:
+        await webhook_dispatcher.start()
+        if settings.WEBHOOK_INBOX_ENABLED:
+            await webhook_inbox.start(
+                resubmit=resubmit_inbox_event,
+                replay_interval=settings.WEBHOOK_INBOX_REPLAY_INTERVAL,
+            )
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
     logger.info("Shutting down WhatsApp Bot API")
+    await webhook_dispatcher.stop()
+    await webhook_inbox.stop()
+    await campaign_scheduler.stop()
+    await campaign_worker.stop()
+    whatsapp_bot.coalescer.close()
+    await whatsapp_bot.conversations.close()
+    await whatsapp_bot.status_pipeline.stop()
+    await template_registry.stop()
+    await graph_client.close()
+    await loop_monitor.stop()
 
 if __name__ == "__main__":
     uvicorn.run(
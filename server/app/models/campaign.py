@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import JSON, Column, DateTime, Integer, String, ForeignKey
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, ForeignKey, text
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 
@@ -18,22 +18,47 @@ class Campaign(Base):
     user_id = Column(String, ForeignKey("users.id"))
     name = Column(String, nullable=False)
     from_number = Column(String, nullable=False)
+    # Phone number IDs to spread the sends over; empty sends from the default number
+    sender_pool = Column(JSON, nullable=True)
     template_name = Column(String, nullable=False)
     template_language = Column(String, nullable=False)
     template_components = Column(JSON, nullable=True)
     template_data = Column(JSON, nullable=True)
     recipient_type = Column(String, nullable=False)
-    recipients = Column(JSON, nullable=True)
+    # Recipients live in campaign_recipients; None until they are stored there
+    recipient_count = Column(Integer, nullable=True)
     file_url = Column(String, nullable=True)
+    # List campaigns: the column holding the phone number, and template
+    # variable -> column; variables without an entry read the same-named column
+    phone_column = Column(String, nullable=True)
+    column_mapping = Column(JSON, nullable=True)
+    # scheduled -> pending -> in_progress -> completed, partial or failed;
+    # paused and cancelled by the user
     status = Column(String, default="pending", nullable=False)
+    # A "scheduled" campaign is handed to the workers at this time (UTC)
+    scheduled_at = Column(DateTime, nullable=True)
     sent_count = Column(Integer, default=0, nullable=False)
+    delivered_count = Column(Integer, default=0, nullable=False)
     open_count = Column(Integer, default=0, nullable=False)
     response_count = Column(Integer, default=0, nullable=False)
     error_count = Column(Integer, default=0, nullable=False)
+    # Messages the Graph API accepted (so counted in sent_count) that Meta
+    # later reported as failed through a status webhook
+    failed_count = Column(Integer, default=0, nullable=False)
     message_id = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     completed_at = Column(DateTime, nullable=True)
+    # Send progress: every recipient before checkpoint_offset is finished,
+    # checkpoint_done lists finished positions after it
+    checkpoint_offset = Column(Integer, default=0, nullable=False)
+    checkpoint_done = Column(JSON, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
 
     # Relationships
-    user = relationship("User", back_populates="campaigns") 
\ No newline at end of file
+    user = relationship("User", back_populates="campaigns")
+
+    __table_args__ = (
+        # The scheduler reads the next due campaigns in scheduled_at order
+        Index("ix_campaigns_scheduled", "scheduled_at", postgresql_where=text("status = 'scheduled'")),
+    )
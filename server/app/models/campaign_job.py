@@ -0,0 +1,44 @@
+"""Database model for the campaign job queue."""
+from datetime import datetime
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text, text
+
+from app.db.base_class import Base
+
+
+class CampaignJob(Base):
+    """Campaign work queued by the API and run by a campaign worker.
+
+    Workers claim jobs with ``FOR UPDATE SKIP LOCKED`` and hold them on a
+    lease they renew through ``heartbeat_at``; a running job whose lease
+    expired is claimed again by another worker.
+    """
+    __tablename__ = "campaign_jobs"
+
+    id = Column(BigInteger, primary_key=True)
+    # "send" a campaign, or "redrive" the dead letters listed in payload
+    kind = Column(String, nullable=False)
+    campaign_id = Column(String, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=True)
+    payload = Column(JSON, nullable=True)
+    # queued -> running -> done or failed
+    status = Column(String, default="queued", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    run_after = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Worker holding the job and its lease timestamp
+    locked_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_campaign_jobs_queued", "run_after", postgresql_where=text("status = 'queued'")),
+        Index("ix_campaign_jobs_running", "heartbeat_at", postgresql_where=text("status = 'running'")),
+        # At most one open send job per campaign, so a double resume queues it once
+        Index(
+            "ix_campaign_jobs_open_send",
+            "campaign_id",
+            unique=True,
+            postgresql_where=text("kind = 'send' AND status IN ('queued', 'running')"),
+        ),
+    )
@@ -0,0 +1,35 @@
+"""Database model for the recipients of a campaign."""
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, Integer, String, Text, text
+
+from app.db.base_class import Base
+
+
+class CampaignRecipient(Base):
+    """One recipient of a campaign, with the state of its message.
+
+    Rows are bulk-loaded with ``COPY``, so column defaults must be server
+    defaults. ``position`` numbers the recipients of a campaign from 0 in
+    send order and lines up with the campaign's checkpoint offset.
+    """
+    __tablename__ = "campaign_recipients"
+
+    campaign_id = Column(String, ForeignKey("campaigns.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    phone = Column(String, nullable=False)
+    # Per-recipient template variables of list campaigns
+    variables = Column(JSON, nullable=True)
+    # pending -> sent -> delivered -> read, or failed
+    status = Column(String, server_default="pending", nullable=False)
+    # Graph API message id, set once the send is accepted
+    wamid = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+    read_at = Column(DateTime, nullable=True)
+    failed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_campaign_recipients_status", "campaign_id", "status"),
+        # Status webhooks find their recipient by message id
+        Index("ix_campaign_recipients_wamid", "wamid", postgresql_where=text("wamid IS NOT NULL")),
+    )
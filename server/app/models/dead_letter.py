@@ -0,0 +1,38 @@
+"""Database model for outbound messages that ran out of retries."""
+from datetime import datetime
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Text, text
+
+from app.db.base_class import Base
+
+
+class OutboundDeadLetter(Base):
+    """A campaign send that still failed after its retries, kept for re-drive."""
+    __tablename__ = "outbound_dead_letters"
+
+    id = Column(BigInteger, primary_key=True)
+    campaign_id = Column(String, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=True, index=True)
+    # The recipient's row in campaign_recipients, so a re-drive can update it
+    position = Column(Integer, nullable=True)
+    recipient = Column(String, nullable=False)
+    template_name = Column(String, nullable=False)
+    template_data = Column(JSON, nullable=True)
+    # Per-recipient template variables of list campaigns
+    variables = Column(JSON, nullable=True)
+    error_class = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)
+    error_code = Column(Integer, nullable=True)
+    last_error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    # dead -> redriven once picked up by a re-drive
+    status = Column(String, default="dead", nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    redriven_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_outbound_dead_letters_dead",
+            "created_at",
+            postgresql_where=text("status = 'dead'"),
+        ),
+    )
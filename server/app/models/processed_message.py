@@ -0,0 +1,15 @@
+"""Database model for inbound message deduplication."""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String
+
+from app.db.base_class import Base
+
+
+class ProcessedMessage(Base):
+    """Inbound WhatsApp message (by wamid) that has been claimed for processing."""
+    __tablename__ = "processed_messages"
+
+    wamid = Column(String, primary_key=True)
+    status = Column(String, default="processing", nullable=False)
+    claimed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,28 @@
+"""Database model for the durable webhook inbox."""
+from datetime import datetime
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, String, text
+
+from app.db.base_class import Base
+
+
+class InboxEvent(Base):
+    """Webhook payload accepted from Meta and waiting to be processed."""
+    __tablename__ = "webhook_inbox"
+
+    id = Column(BigInteger, primary_key=True)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Lease timestamp: a pending row claimed more than the lease ago is up for replay
+    claimed_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_webhook_inbox_pending",
+            "claimed_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
@@ -1,7 +1,7 @@
 """Campaign schemas."""
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Union, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 class TemplateComponent(BaseModel):
@@ -16,12 +16,28 @@ class CampaignBase(BaseModel):
 
     name: str
     from_number: str
+    sender_pool: Optional[List[str]] = None
     template_name: str
     template_language: str
     template_components: Optional[List[TemplateComponent]] = None
-    recipient_type: str = Field(pattern="^(individual|list)$")
+    # "upload": recipients are streamed to POST /campaigns/{id}/recipients
+    recipient_type: str = Field(pattern="^(individual|list|upload)$")
     recipients: Optional[List[str]] = None
     file_url: Optional[str] = None
+    # For recipient_type "list": template parameters written as {{name}} are
+    # filled per row from the column mapped to ``name`` (default: same name)
+    phone_column: Optional[str] = None
+    column_mapping: Optional[Dict[str, str]] = None
+    # Send at this time instead of right away; without a UTC offset it is UTC
+    scheduled_at: Optional[datetime] = None
+
+    @field_validator("scheduled_at")
+    @classmethod
+    def scheduled_at_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """Stored as naive UTC, like every other timestamp."""
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
 
 
 class CampaignCreate(CampaignBase):
@@ -33,11 +49,13 @@ class CampaignCreate(CampaignBase):
 class CampaignUpdate(BaseModel):
     """Update campaign schema."""
 
-    status: Optional[str] = Field(pattern="^(pending|in_progress|completed|failed)$")
+    status: Optional[str] = Field(pattern="^(scheduled|pending|in_progress|completed|partial|failed|paused|cancelled)$")
     sent_count: Optional[int] = 0
+    delivered_count: Optional[int] = 0
     open_count: Optional[int] = 0
     response_count: Optional[int] = 0
     error_count: Optional[int] = 0
+    failed_count: Optional[int] = 0
     completed_at: Optional[datetime] = None
 
 
@@ -46,11 +64,13 @@ class Campaign(CampaignBase):
 
     id: str
     user_id: str
-    status: str = Field(default="pending", pattern="^(pending|in_progress|completed|failed)$")
+    status: str = Field(default="pending", pattern="^(scheduled|pending|in_progress|completed|partial|failed|paused|cancelled)$")
     sent_count: int = 0
+    delivered_count: int = 0
     open_count: int = 0
     response_count: int = 0
     error_count: int = 0
+    failed_count: int = 0
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
@@ -82,14 +102,43 @@ class MessageMetrics(BaseModel):
     last_status_update: Optional[str]
 
 
+class RecipientStatus(BaseModel):
+    """One campaign recipient and the state of its message."""
+
+    position: int
+    phone: str
+    status: str
+    wamid: Optional[str] = None
+    error: Optional[str] = None
+    sent_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+    read_at: Optional[datetime] = None
+    failed_at: Optional[datetime] = None
+
+
 class CampaignDetails(BaseModel):
     id: str
     name: str
     status: str
     template_name: str
     template_content: TemplateContent
-    recipients: List[str]
+    recipient_count: Optional[int] = None
+    # Recipients per status, e.g. {"sent": 10, "read": 4}
+    recipient_statuses: Dict[str, int] = {}
+    # One page of recipients; pass next_recipients_after as recipients_after for the next
+    recipients: List[RecipientStatus]
+    next_recipients_after: Optional[int] = None
     metrics: MessageMetrics
     created_at: str
+    scheduled_at: Optional[str] = None
     completed_at: Optional[str] = None
-    error_count: int 
\ No newline at end of file
+    error_count: int 
+    failed_count: int = 0
+
+
+class DeadLetterRedriveRequest(BaseModel):
+    """Select dead-lettered sends to try again."""
+
+    campaign_id: Optional[str] = None
+    ids: Optional[List[int]] = None
+    limit: int = Field(default=1000, ge=1, le=50000)
@@ -17,6 +17,9 @@ class WhatsAppMessageRequest(BaseModel):
     campaign_name: Optional[str] = None
     from_number: str
     recipients: Optional[List[str]] = None
+    # Phone number IDs to send the campaign from, or ["all"] for every
+    # registered number of the business
+    sender_pool: Optional[List[str]] = None
 
 class PhoneNumber(BaseModel):
     id: str
@@ -0,0 +1,243 @@
+"""Postgres-backed queue of campaign work, shared by the API and the workers."""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import and_, delete, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.campaign import Campaign
+from app.models.campaign_job import CampaignJob
+from app.services.dead_letters import claim_dead_letters
+
+# Key of the transaction-level advisory lock that serialises claims
+CLAIM_LOCK_KEY = 7_210_502
+# Candidate jobs read per claim, per job wanted, to find ones whose numbers are free
+CLAIM_SCAN_FACTOR = 10
+
+
+def job_senders(sender_pool: Optional[Iterable[str]]) -> Set[str]:
+    """Phone number IDs a job sends from: its campaign's pool, or the default number."""
+    return set(sender_pool or ()) or {settings.PHONE_NUMBER_ID}
+
+
+def enqueue_campaign(db: Session, campaign_id: str, run_after: Optional[datetime] = None) -> None:
+    """Queue a campaign for sending inside the session's transaction.
+
+    Does nothing when the campaign already has a queued or running send
+    job. The caller commits.
+    """
+    db.execute(
+        insert(CampaignJob)
+        .values(
+            kind="send",
+            campaign_id=campaign_id,
+            status="queued",
+            attempts=0,
+            run_after=run_after or datetime.utcnow(),
+            created_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(
+            index_elements=[CampaignJob.campaign_id],
+            index_where=and_(
+                CampaignJob.kind == "send", CampaignJob.status.in_(("queued", "running"))
+            ),
+        )
+    )
+
+
+class CampaignJobStore:
+    """Synchronous job queue queries. Every method runs in a single transaction."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self.session_factory = session_factory
+
+    def enqueue_redrive(
+        self,
+        campaign_id: Optional[str] = None,
+        ids: Optional[List[int]] = None,
+        limit: int = 1000,
+        user_id: Optional[str] = None,
+    ) -> int:
+        """Claim dead letters and queue jobs to re-send them, in one transaction.
+
+        Letters get one job per campaign, so each job sends from the numbers
+        of a single campaign. With ``user_id``, only that user's letters are
+        claimed. Returns the number of dead letters claimed.
+        """
+        with self.session_factory() as db:
+            letters = claim_dead_letters(
+                db, campaign_id=campaign_id, ids=ids, limit=limit, user_id=user_id
+            )
+            by_campaign: Dict[Optional[str], List[int]] = defaultdict(list)
+            for letter in letters:
+                by_campaign[letter["campaign_id"]].append(letter["id"])
+            for letter_campaign_id, letter_ids in by_campaign.items():
+                db.add(CampaignJob(
+                    kind="redrive",
+                    campaign_id=letter_campaign_id,
+                    payload={"ids": letter_ids},
+                ))
+            db.commit()
+        return len(letters)
+
+    def claim(
+        self, worker_id: str, limit: int, lease_seconds: float, max_attempts: int
+    ) -> List[Dict[str, Any]]:
+        """Lease up to ``limit`` jobs that are due or whose worker stopped renewing.
+
+        A worker only gets jobs whose sender numbers no other live worker is
+        sending from. Each process keeps its own token bucket and pair-rate
+        table per number, so this keeps every number at its tier rate, and
+        the pair rate per recipient, however many workers run. Jobs of a busy
+        number wait until its worker is done with it. Claims are serialised
+        by an advisory lock, so two workers cannot take the same free number
+        at the same moment; ``FOR UPDATE SKIP LOCKED`` keeps them off rows
+        another transaction is updating.
+
+        Jobs that were already tried ``max_attempts`` times are failed
+        instead, with their campaign, so one that brings its worker down
+        cannot take every worker down in turn.
+        """
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=lease_seconds)
+        expired = and_(CampaignJob.status == "running", CampaignJob.heartbeat_at < stale_before)
+        due = and_(CampaignJob.status == "queued", CampaignJob.run_after <= now)
+        with self.session_factory() as db:
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CLAIM_LOCK_KEY})
+            abandoned = [campaign_id for campaign_id in db.execute(
+                update(CampaignJob)
+                .where(expired, CampaignJob.attempts >= max_attempts)
+                .values(
+                    status="failed",
+                    last_error=f"Abandoned after {max_attempts} attempts",
+                    finished_at=now,
+                )
+                .returning(CampaignJob.campaign_id)
+            ).scalars() if campaign_id]
+            if abandoned:
+                db.execute(
+                    update(Campaign)
+                    .where(Campaign.id.in_(abandoned), Campaign.status == "in_progress")
+                    .values(status="failed", updated_at=now)
+                )
+
+            # Numbers held by other workers whose leases are still live
+            busy: Set[str] = set()
+            for sender_pool in db.execute(
+                select(Campaign.sender_pool)
+                .select_from(CampaignJob)
+                .outerjoin(Campaign, Campaign.id == CampaignJob.campaign_id)
+                .where(
+                    CampaignJob.status == "running",
+                    CampaignJob.heartbeat_at >= stale_before,
+                    CampaignJob.locked_by != worker_id,
+                )
+            ).scalars():
+                busy |= job_senders(sender_pool)
+
+            candidates = db.execute(
+                select(CampaignJob.id, Campaign.sender_pool)
+                .outerjoin(Campaign, Campaign.id == CampaignJob.campaign_id)
+                .where(or_(due, expired))
+                .order_by(CampaignJob.run_after)
+                .limit(limit * CLAIM_SCAN_FACTOR)
+                .with_for_update(of=CampaignJob, skip_locked=True)
+            ).all()
+            job_ids = [
+                job_id for job_id, sender_pool in candidates
+                if not job_senders(sender_pool) & busy
+            ][:limit]
+            rows = []
+            if job_ids:
+                rows = db.execute(
+                    update(CampaignJob)
+                    .where(CampaignJob.id.in_(job_ids))
+                    .values(
+                        status="running",
+                        locked_by=worker_id,
+                        heartbeat_at=now,
+                        attempts=CampaignJob.attempts + 1,
+                    )
+                    .returning(
+                        CampaignJob.id,
+                        CampaignJob.kind,
+                        CampaignJob.campaign_id,
+                        CampaignJob.payload,
+                        CampaignJob.attempts,
+                    )
+                ).mappings().all()
+            db.commit()
+        return [dict(row) for row in rows]
+
+    def heartbeat(self, worker_id: str, job_ids: List[int]) -> List[int]:
+        """Renew the lease on jobs; returns the ones this worker still holds."""
+        if not job_ids:
+            return []
+        with self.session_factory() as db:
+            held = db.execute(
+                update(CampaignJob)
+                .where(
+                    CampaignJob.id.in_(job_ids),
+                    CampaignJob.locked_by == worker_id,
+                    CampaignJob.status == "running",
+                )
+                .values(heartbeat_at=datetime.utcnow())
+                .returning(CampaignJob.id)
+            ).scalars().all()
+            db.commit()
+        return list(held)
+
+    def finish(self, worker_id: str, job_id: int, error: Optional[str] = None) -> None:
+        """Mark a job done, or failed with ``error``, if this worker still holds it."""
+        with self.session_factory() as db:
+            db.execute(
+                update(CampaignJob)
+                .where(CampaignJob.id == job_id, CampaignJob.locked_by == worker_id)
+                .values(
+                    status="failed" if error else "done",
+                    last_error=error[:2000] if error else None,
+                    finished_at=datetime.utcnow(),
+                )
+            )
+            db.commit()
+
+    def release(self, worker_id: str, job_id: int) -> None:
+        """Put a job this worker holds back in the queue for the next worker."""
+        with self.session_factory() as db:
+            db.execute(
+                update(CampaignJob)
+                .where(CampaignJob.id == job_id, CampaignJob.locked_by == worker_id)
+                # A hand-over is not a failed attempt
+                .values(
+                    status="queued",
+                    locked_by=None,
+                    heartbeat_at=None,
+                    attempts=CampaignJob.attempts - 1,
+                    run_after=datetime.utcnow(),
+                )
+            )
+            db.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """Jobs per status, done and failed ones included."""
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(CampaignJob.status, func.count()).group_by(CampaignJob.status)
+            ).all()
+        return {status: count for status, count in rows}
+
+    def purge_finished(self, older_than: datetime) -> int:
+        """Delete done and failed jobs that finished before ``older_than``."""
+        with self.session_factory() as db:
+            result = db.execute(
+                delete(CampaignJob).where(
+                    CampaignJob.status.in_(("done", "failed")),
+                    CampaignJob.finished_at < older_than,
+                )
+            )
+            db.commit()
+        return result.rowcount
@@ -0,0 +1,328 @@
+"""Bulk storage, paging and status tracking for campaign recipients."""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set,
+    Tuple, Union,
+)
+
+from sqlalchemy import bindparam, delete, func, select, text, update
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.campaign import Campaign
+from app.models.campaign_recipient import CampaignRecipient
+
+# A phone number, or a phone number with its template variables
+RecipientInput = Union[str, Tuple[str, Optional[Dict[str, str]]]]
+
+# (wamid, status, at, error) for one status webhook of a campaign message
+RecipientStatusUpdate = Tuple[str, str, datetime, Optional[str]]
+
+COPY_SQL = (
+    "COPY campaign_recipients (campaign_id, position, phone, variables) "
+    # An empty phone number stays an empty string; the sender counts it as an error
+    "FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (phone))"
+)
+COPY_CHUNK_ROWS = 5000
+
+# Applies status webhooks by message id, never moving a recipient backwards
+# (a late "delivered" does not undo "read"). The rows are locked first, so
+# the old values returned next to the new ones are the ones this statement
+# replaced; each row reports which counters its change moves.
+STATUS_UPDATE_SQL = text("""
+    WITH old AS (
+        SELECT r.campaign_id, r.position, r.status, r.delivered_at, r.read_at,
+               u.status AS new_status, u.at, u.error
+        FROM campaign_recipients AS r
+        JOIN unnest(
+            CAST(:wamids AS text[]),
+            CAST(:statuses AS text[]),
+            CAST(:stamps AS timestamp[]),
+            CAST(:errors AS text[])
+        ) AS u(wamid, status, at, error) ON r.wamid = u.wamid
+        -- A fixed lock order, so concurrent flushes cannot deadlock
+        ORDER BY r.campaign_id, r.position
+        FOR UPDATE OF r
+    )
+    UPDATE campaign_recipients AS r SET
+        status = CASE
+            WHEN old.new_status IN ('failed', 'read') THEN old.new_status
+            WHEN r.status IN ('read', 'failed') THEN r.status
+            ELSE old.new_status
+        END,
+        delivered_at = CASE WHEN old.new_status IN ('delivered', 'read')
+                            THEN COALESCE(r.delivered_at, old.at) ELSE r.delivered_at END,
+        read_at = CASE WHEN old.new_status = 'read' THEN COALESCE(r.read_at, old.at) ELSE r.read_at END,
+        failed_at = CASE WHEN old.new_status = 'failed'
+                         THEN COALESCE(r.failed_at, old.at) ELSE r.failed_at END,
+        error = CASE WHEN old.new_status = 'failed' THEN old.error ELSE r.error END
+    FROM old
+    WHERE r.campaign_id = old.campaign_id AND r.position = old.position
+    RETURNING
+        r.wamid,
+        r.campaign_id,
+        old.delivered_at IS NULL AND r.delivered_at IS NOT NULL AS delivered,
+        old.read_at IS NULL AND r.read_at IS NOT NULL AS read,
+        old.status <> 'failed' AND r.status = 'failed' AS failed
+""")
+
+
+class RecipientCopy:
+    """Recipients of a campaign as the CSV text ``COPY ... FROM STDIN`` reads.
+
+    psycopg2 pulls the data through ``read``; rows are encoded a chunk at a
+    time as it asks for them, so only one chunk is ever held in memory.
+    Positions are numbered from ``start`` in the order of ``rows``.
+    """
+
+    def __init__(
+        self,
+        campaign_id: str,
+        rows: Iterable[RecipientInput],
+        start: int = 0,
+        chunk_rows: int = COPY_CHUNK_ROWS,
+    ) -> None:
+        self.count = 0
+        self._start = start
+        self._chunks = self._encode(campaign_id, rows, chunk_rows)
+        self._chunk = ""
+        self._offset = 0
+
+    def _encode(
+        self, campaign_id: str, rows: Iterable[RecipientInput], chunk_rows: int
+    ) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for row in rows:
+            phone, variables = (row, None) if isinstance(row, str) else row
+            # None is written as an empty unquoted field, which COPY reads as NULL
+            writer.writerow((
+                campaign_id,
+                self._start + self.count,
+                phone,
+                json.dumps(variables) if variables else None,
+            ))
+            self.count += 1
+            if self.count % chunk_rows == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def read(self, size: int = -1) -> str:
+        parts = []
+        while size != 0:
+            if self._offset >= len(self._chunk):
+                self._chunk, self._offset = next(self._chunks, ""), 0
+                if not self._chunk:
+                    break
+            end = len(self._chunk) if size < 0 else min(len(self._chunk), self._offset + size)
+            parts.append(self._chunk[self._offset:end])
+            if size > 0:
+                size -= end - self._offset
+            self._offset = end
+        return "".join(parts)
+
+
+def copy_recipients(
+    db: Session, campaign_id: str, rows: Iterable[RecipientInput], start: int = 0
+) -> int:
+    """Bulk-load recipients with ``COPY`` inside the session's transaction.
+
+    Positions are numbered from ``start``. Returns the number of rows
+    loaded. The caller commits.
+    """
+    source = RecipientCopy(campaign_id, rows, start)
+    # The DBAPI connection of the session, so the COPY joins its transaction
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(COPY_SQL, source)
+    finally:
+        cursor.close()
+    return source.count
+
+
+def record_send_results(
+    db: Session,
+    campaign_id: str,
+    results: Sequence[Tuple[int, Optional[str], Optional[str]]],
+    now: datetime,
+) -> None:
+    """Write the outcome of sends, as (position, message id, error), in two batched UPDATEs."""
+    recipients = CampaignRecipient.__table__
+    sent = [
+        {"b_position": position, "b_wamid": wamid}
+        for position, wamid, error in results if error is None
+    ]
+    failed = [
+        {"b_position": position, "b_error": error[:2000]}
+        for position, wamid, error in results if error is not None
+    ]
+    where = (
+        recipients.c.campaign_id == campaign_id,
+        recipients.c.position == bindparam("b_position"),
+    )
+    if sent:
+        db.execute(
+            recipients.update().where(*where).values(
+                status="sent", wamid=bindparam("b_wamid"), sent_at=now
+            ),
+            sent,
+        )
+    if failed:
+        db.execute(
+            recipients.update().where(*where).values(
+                status="failed", error=bindparam("b_error"), failed_at=now
+            ),
+            failed,
+        )
+
+
+class RecipientStore:
+    """Synchronous recipient queries. Every method runs in a single transaction."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self.session_factory = session_factory
+
+    def replace(self, campaign_id: str, rows: Iterable[RecipientInput]) -> int:
+        """Load the recipients of a campaign, dropping any earlier partial load.
+
+        ``recipient_count`` is set in the same transaction, so a campaign
+        with a count always has all of its recipients.
+        """
+        with self.session_factory() as db:
+            db.execute(delete(CampaignRecipient).where(CampaignRecipient.campaign_id == campaign_id))
+            count = copy_recipients(db, campaign_id, rows)
+            db.execute(
+                update(Campaign).where(Campaign.id == campaign_id).values(recipient_count=count)
+            )
+            db.commit()
+        return count
+
+    def read_batch(
+        self, campaign_id: str, start: int, limit: int
+    ) -> List[Tuple[int, str, Optional[Dict[str, str]]]]:
+        """Recipients from position ``start`` on, as (position, phone, variables)."""
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(CampaignRecipient.position, CampaignRecipient.phone, CampaignRecipient.variables)
+                .where(CampaignRecipient.campaign_id == campaign_id, CampaignRecipient.position >= start)
+                .order_by(CampaignRecipient.position)
+                .limit(limit)
+            ).all()
+        return [tuple(row) for row in rows]
+
+    async def stream(
+        self, campaign_id: str, start: int = 0, batch_size: int = 5000
+    ) -> AsyncIterator[RecipientInput]:
+        """Yield the recipients of a campaign in position order from ``start``.
+
+        Reads ``batch_size`` rows per query by keyset on the primary key, so
+        every batch costs the same however deep into the campaign it is. The
+        next batch is read while the current one is being sent.
+        """
+        loop = asyncio.get_running_loop()
+
+        def fetch(position: int) -> asyncio.Future:
+            return loop.create_task(asyncio.to_thread(self.read_batch, campaign_id, position, batch_size))
+
+        pending: Optional[asyncio.Future] = fetch(start)
+        try:
+            while pending is not None:
+                batch = await pending
+                pending = fetch(batch[-1][0] + 1) if len(batch) == batch_size else None
+                for _, phone, variables in batch:
+                    yield (phone, variables) if variables else phone
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+
+    def page(
+        self,
+        campaign_id: str,
+        after: Optional[int] = None,
+        limit: int = 100,
+        status: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """One page of recipients with their message state, after position ``after``."""
+        query = select(
+            CampaignRecipient.position,
+            CampaignRecipient.phone,
+            CampaignRecipient.status,
+            CampaignRecipient.wamid,
+            CampaignRecipient.error,
+            CampaignRecipient.sent_at,
+            CampaignRecipient.delivered_at,
+            CampaignRecipient.read_at,
+            CampaignRecipient.failed_at,
+        ).where(CampaignRecipient.campaign_id == campaign_id)
+        if after is not None:
+            query = query.where(CampaignRecipient.position > after)
+        if status:
+            query = query.where(CampaignRecipient.status == status)
+        with self.session_factory() as db:
+            rows = db.execute(query.order_by(CampaignRecipient.position).limit(limit)).mappings().all()
+        return [dict(row) for row in rows]
+
+    def status_counts(self, campaign_id: str) -> Dict[str, int]:
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(CampaignRecipient.status, func.count())
+                .where(CampaignRecipient.campaign_id == campaign_id)
+                .group_by(CampaignRecipient.status)
+            ).all()
+        return {status: count for status, count in rows}
+
+    def apply_statuses(self, updates: Sequence[RecipientStatusUpdate]) -> Set[str]:
+        """Apply status webhooks to their recipients and count what changed.
+
+        Campaign counters only move for recipients whose state changed:
+        ``delivered_count`` the first time one is delivered (or read),
+        ``open_count`` the first time it is read and ``failed_count`` when
+        it turns failed. A redelivered webhook changes nothing and counts
+        nothing, however late it comes. Recipients and counters are written
+        in one transaction.
+
+        Returns the message ids that matched a recipient. One that did not
+        may belong to a send whose checkpoint has not stored its id yet.
+        """
+        if not updates:
+            return set()
+        wamids, statuses, stamps, errors = (list(column) for column in zip(*updates))
+        with self.session_factory() as db:
+            rows = db.execute(
+                STATUS_UPDATE_SQL,
+                {"wamids": wamids, "statuses": statuses, "stamps": stamps, "errors": errors},
+            ).all()
+            counts: Dict[str, Dict[str, int]] = {}
+            for _, campaign_id, delivered, read, failed in rows:
+                if not (delivered or read or failed):
+                    continue
+                row = counts.setdefault(
+                    campaign_id,
+                    {"b_id": campaign_id, "b_delivered": 0, "b_read": 0, "b_failed": 0},
+                )
+                row["b_delivered"] += int(delivered)
+                row["b_read"] += int(read)
+                row["b_failed"] += int(failed)
+            if counts:
+                campaigns = Campaign.__table__
+                # executemany: psycopg2 sends these in pages, not one trip per row
+                db.execute(
+                    campaigns.update()
+                    .where(campaigns.c.id == bindparam("b_id"))
+                    .values(
+                        delivered_count=campaigns.c.delivered_count + bindparam("b_delivered"),
+                        open_count=campaigns.c.open_count + bindparam("b_read"),
+                        failed_count=campaigns.c.failed_count + bindparam("b_failed"),
+                    ),
+                    [counts[campaign_id] for campaign_id in sorted(counts)],
+                )
+            db.commit()
+        return {wamid for wamid, *_ in rows}
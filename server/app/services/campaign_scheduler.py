@@ -0,0 +1,192 @@
+"""Hands scheduled campaigns to the job queue when they are due."""
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal, engine
+from app.models.campaign import Campaign
+from app.services.campaign_jobs import enqueue_campaign
+
+# Key of the session-level advisory lock held by the scheduling replica
+SCHEDULER_LOCK_KEY = 7_210_501
+
+
+class CampaignScheduler:
+    """Move "scheduled" campaigns to the job queue at their ``scheduled_at``.
+
+    Every worker runs one, but only the one holding a Postgres advisory
+    lock schedules. The lock is held on a connection of its own. If that
+    connection goes away, so does the lock, and another replica takes
+    over within ``reload_interval``. Two leaders at once would be
+    harmless: a campaign is moved out of "scheduled" by a conditional
+    UPDATE, so only one of them can dispatch it.
+
+    The leader reads the campaigns due before its next reload, earliest
+    first and at most ``batch_size`` of them, from a partial index on
+    ``scheduled_at``. They go into a heap, and the leader sleeps until the
+    first is due. Reloading picks up campaigns scheduled or cancelled in
+    the meantime. No timer or task exists per campaign, however many are
+    scheduled. A campaign scheduled less than ``reload_interval`` ahead
+    may be dispatched up to that late.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        bind: Engine = engine,
+        reload_interval: float = 10.0,
+        batch_size: int = 1000,
+        lock_key: int = SCHEDULER_LOCK_KEY,
+    ) -> None:
+        self.session_factory = session_factory
+        self.bind = bind
+        self.reload_interval = reload_interval
+        self.batch_size = max(1, batch_size)
+        self.lock_key = lock_key
+        self._lock_connection: Optional[Connection] = None
+        self._heap: List[Tuple[datetime, str]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._dispatched = 0
+        self._max_lateness = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def leader(self) -> bool:
+        return self._lock_connection is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="campaign-scheduler")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await asyncio.to_thread(self._resign)
+
+    def _lead(self) -> bool:
+        """Try to become the leader, or check that this replica still is."""
+        if self._lock_connection is not None:
+            # Fails if the connection, and with it the lock, is gone
+            self._lock_connection.execute(text("SELECT 1"))
+            self._lock_connection.commit()
+            return True
+        connection = self.bind.connect()
+        try:
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key}
+            ).scalar()
+            # A session-level lock outlives the transaction
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._lock_connection = connection
+        logger.info("Campaign scheduler took the leader lock")
+        return True
+
+    def _resign(self) -> None:
+        connection, self._lock_connection = self._lock_connection, None
+        self._heap = []
+        if connection is None:
+            return
+        # Closing the connection for good releases the lock; it must not go
+        # back to the pool still holding it
+        connection.invalidate()
+        connection.close()
+
+    def _load(self) -> List[Tuple[datetime, str]]:
+        """Campaigns due before the next reload, earliest first."""
+        until = datetime.utcnow() + timedelta(seconds=self.reload_interval)
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(Campaign.scheduled_at, Campaign.id)
+                .where(Campaign.status == "scheduled", Campaign.scheduled_at <= until)
+                .order_by(Campaign.scheduled_at)
+                .limit(self.batch_size)
+            ).all()
+        return [(scheduled_at, campaign_id) for scheduled_at, campaign_id in rows]
+
+    def _dispatch(self, campaign_ids: List[str]) -> List[str]:
+        """Queue due campaigns for the workers; returns the ones it queued."""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            started = db.execute(
+                update(Campaign)
+                .where(
+                    Campaign.id.in_(campaign_ids),
+                    Campaign.status == "scheduled",
+                    Campaign.scheduled_at <= now,
+                )
+                .values(status="pending", updated_at=now)
+                .returning(Campaign.id)
+            ).scalars().all()
+            for campaign_id in started:
+                enqueue_campaign(db, campaign_id)
+            db.commit()
+        return list(started)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await asyncio.to_thread(self._lead):
+                    await self._schedule()
+                else:
+                    await asyncio.sleep(self.reload_interval)
+            except Exception as e:
+                logger.error(f"Campaign scheduler failed: {str(e)}")
+                await asyncio.to_thread(self._resign)
+                await asyncio.sleep(self.reload_interval)
+
+    async def _schedule(self) -> None:
+        """Dispatch campaigns as they fall due, until the next reload."""
+        # Sorted, so already a heap
+        self._heap = await asyncio.to_thread(self._load)
+        more = len(self._heap) >= self.batch_size
+        reload_at = time.monotonic() + self.reload_interval
+        while True:
+            now = datetime.utcnow()
+            due: List[str] = []
+            while self._heap and self._heap[0][0] <= now:
+                scheduled_at, campaign_id = heapq.heappop(self._heap)
+                self._max_lateness = max(self._max_lateness, (now - scheduled_at).total_seconds())
+                due.append(campaign_id)
+            if due:
+                started = await asyncio.to_thread(self._dispatch, due)
+                self._dispatched += len(started)
+                logger.info(f"Dispatched {len(started)} scheduled campaigns")
+            # A full batch may have left due campaigns in the database
+            if more and not self._heap:
+                return
+            wait = reload_at - time.monotonic()
+            if wait <= 0:
+                return
+            if self._heap:
+                wait = min(wait, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+            await asyncio.sleep(max(0.0, wait))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "leader": self.leader,
+            "waiting": len(self._heap),
+            "next_due": self._heap[0][0].isoformat() if self._heap else None,
+            "dispatched": self._dispatched,
+            "max_lateness_seconds": round(self._max_lateness, 3),
+        }
@@ -0,0 +1,601 @@
+"""Concurrent, rate-limited fan-out of campaign template messages."""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple,
+    Optional, Sequence, Set, Tuple, Union,
+)
+
+from loguru import logger
+
+from app.services.dead_letters import DeadLetterStore
+from app.services.sender_pool import SenderHealth, SenderPool
+from app.services.whatsapp_service import WhatsAppService, pair_rate_scheduler
+from app.utils.error_handler import (
+    PairRateDeferredError,
+    WhatsAppError,
+    WhatsAppPairRateError,
+    WhatsAppThrottledError,
+)
+from app.utils.payload_compiler import CompiledPayload, compile_template_payload
+from app.utils.rate_limiter import AdaptiveRateController, TokenBucket
+from app.utils.retry import RetryPolicy, classify_error
+
+MAX_REPORTED_ERRORS = 100
+DEAD_LETTER_BATCH_SIZE = 500
+
+
+def is_sender_failure(error: Exception) -> bool:
+    """Whether a failed send says something about the sending number.
+
+    Server errors, timeouts and auth failures point at the number or its
+    connection. Other 4xx errors are about the recipient or the template.
+    """
+    if isinstance(error, WhatsAppError):
+        return classify_error(error) == "transient" or error.status_code in (401, 403)
+    return True
+
+
+class CampaignCheckpoint(NamedTuple):
+    """Progress of a campaign run since the previous checkpoint."""
+
+    # Every recipient position below offset is finished
+    offset: int
+    # Finished positions at or above offset
+    done: List[int]
+    sent_delta: int
+    error_delta: int
+    last_message_id: Optional[str]
+    # (position, message id, error) of every recipient finished since the last checkpoint
+    results: Sequence[Tuple[int, Optional[str], Optional[str]]] = ()
+
+
+# Persists a checkpoint; returns False when the campaign should stop
+Checkpointer = Callable[[CampaignCheckpoint], Awaitable[bool]]
+
+# A phone number, or a phone number with its template variables
+Recipient = Union[str, Tuple[str, Dict[str, str]]]
+
+
+class PendingSend(NamedTuple):
+    """One recipient on its way through the workers and the delay heap."""
+
+    index: int
+    recipient: str
+    variables: Optional[Dict[str, str]]
+    # Sends made so far
+    attempts: int
+
+
+async def iterate_recipients(
+    recipients: Union[Iterable[Recipient], AsyncIterable[Recipient]],
+) -> AsyncIterator[Recipient]:
+    if hasattr(recipients, "__aiter__"):
+        async for recipient in recipients:
+            yield recipient
+    else:
+        for recipient in recipients:
+            yield recipient
+
+
+class CampaignSendReport:
+    """Running totals for one campaign fan-out."""
+
+    def __init__(self, campaign_id: str, run_id: Optional[str] = None) -> None:
+        self.campaign_id = campaign_id
+        # Tells apart runs of one campaign, e.g. a send and a re-drive
+        self.run_id = run_id or campaign_id
+        # Runs that checkpoint can be stopped and resumed later
+        self.resumable = False
+        self.sent_count = 0
+        self.error_count = 0
+        self.throttled_count = 0
+        self.retried_count = 0
+        self.dead_lettered_count = 0
+        self.errors: List[str] = []
+        self.sent_by_sender: Counter = Counter()
+        self.last_message_id: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.stopped = False
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Messages accepted by the Graph API per second."""
+        return self.sent_count / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "campaign_id": self.campaign_id,
+            "run_id": self.run_id,
+            "sent_count": self.sent_count,
+            "error_count": self.error_count,
+            "throttled_count": self.throttled_count,
+            "retried_count": self.retried_count,
+            "dead_lettered_count": self.dead_lettered_count,
+            "sent_by_sender": dict(self.sent_by_sender),
+            "errors": self.errors or None,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput": round(self.throughput, 2),
+        }
+
+
+class CampaignRun:
+    """State of one ``send_campaign`` call, shared by its workers."""
+
+    def __init__(
+        self,
+        report: CampaignSendReport,
+        template_name: str,
+        template_data: Optional[Dict[str, Any]],
+        compiled: CompiledPayload,
+        pool: SenderPool,
+        source: AsyncIterator[Recipient],
+        start_offset: int,
+        skip: Iterable[int],
+        checkpoint: Optional[Checkpointer],
+        positions: Optional[Sequence[Optional[int]]],
+        stop: asyncio.Event,
+    ) -> None:
+        self.report = report
+        self.campaign_id = report.campaign_id
+        self.template_name = template_name
+        self.template_data = template_data
+        self.compiled = compiled
+        self.pool = pool
+        self.source = source
+        self.start_offset = start_offset
+        self.skipped = set(skip)
+        self.checkpoint = checkpoint
+        self.positions = positions
+        self.stop = stop
+        # Only one worker at a time may pull from the source: an async
+        # generator cannot be resumed while it is already awaiting
+        self.source_lock = asyncio.Lock()
+        self.exhausted = False
+        # Position of the next recipient the source yields
+        self.position = start_offset
+        # Sends waiting for a retry or a pair-rate slot, as (due_at, index, send)
+        self.delayed: List[Tuple[float, int, PendingSend]] = []
+        self.dead: List[Dict[str, Any]] = []
+        # Every position below the watermark is finished; finished positions
+        # above it are kept in ``done`` until the gap below them closes.
+        self.watermark = start_offset
+        self.done: Set[int] = {index for index in self.skipped if index >= start_offset}
+        # Outcomes since the last checkpoint
+        self.sent = 0
+        self.failed = 0
+        self.since = 0
+        # Per-recipient outcomes, only kept when there is a checkpoint to write them
+        self.results: List[Tuple[int, Optional[str], Optional[str]]] = []
+        # One checkpoint at a time, so an older one can never overwrite a newer one
+        self.checkpoint_lock = asyncio.Lock()
+
+    def position_of(self, index: int) -> Optional[int]:
+        """Position in campaign_recipients of the recipient at ``index``."""
+        return index if self.positions is None else self.positions[index - self.start_offset]
+
+    def delay(self, send: PendingSend, seconds: float) -> None:
+        heapq.heappush(self.delayed, (time.monotonic() + seconds, send.index, send))
+
+
+class CampaignSender:
+    """Send one template to many recipients concurrently.
+
+    A fixed pool of ``concurrency`` workers pulls recipients from an iterator,
+    so memory does not grow with the size of the campaign. Every send first
+    takes a token from the bucket of the sending phone number. Buckets are
+    shared by all campaigns in the process and refill at the WhatsApp
+    messaging tier rate, so throughput goes up to that ceiling and never
+    above it.
+
+    When Meta answers with a throttling error, the number's AIMD controller
+    cuts the bucket rate.
+
+    Failed sends are retried as ``retry_policy`` decides for their error
+    class. A retry goes on a delay heap keyed by its jittered due time, so it
+    holds no worker while it waits. A recipient whose pair-rate slot is more
+    than ``max_pair_wait`` seconds away (a duplicate in the list, or one just
+    messaged by the bot) goes on the same heap without spending a token.
+    Sends that run out of retries are written to the dead-letter table.
+
+    A campaign can send from a pool of business numbers. Each recipient is
+    assigned to one number of the pool by ``SenderPool``, and the worker
+    pool grows by ``concurrency`` per number. Every number has its own
+    bucket, AIMD controller and health state, so throughput adds up across
+    numbers and a failing number is taken out of rotation on its own.
+    """
+
+    def __init__(
+        self,
+        whatsapp_service: WhatsAppService,
+        rate: float = 80.0,
+        burst: Optional[float] = None,
+        concurrency: int = 50,
+        max_pair_wait: float = 0.5,
+        controller_options: Optional[Dict[str, float]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        dead_letters: Optional[DeadLetterStore] = None,
+        checkpoint_batch: int = 500,
+        checkpoint_interval: float = 5.0,
+        health_options: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.whatsapp_service = whatsapp_service
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = max(1, concurrency)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.dead_letters = dead_letters or DeadLetterStore()
+        self.checkpoint_batch = max(1, checkpoint_batch)
+        self.checkpoint_interval = checkpoint_interval
+        self._stop_events: Dict[str, asyncio.Event] = {}
+        self.max_pair_wait = max_pair_wait
+        self.controller_options = controller_options or {}
+        self._limiters: Dict[str, AdaptiveRateController] = {}
+        self.health_options = health_options or {}
+        self._health: Dict[str, SenderHealth] = {}
+        # Keyed by run id: one campaign can have a send and re-drives running
+        self._active: Dict[str, CampaignSendReport] = {}
+        self._run_ids = itertools.count(1)
+        self._sent = 0
+        self._failed = 0
+        self._throttled = 0
+        self._deferred = 0
+        self._retried = 0
+        self._dead_lettered = 0
+
+    def limiter(self, phone_number_id: str) -> AdaptiveRateController:
+        limiter = self._limiters.get(phone_number_id)
+        if limiter is None:
+            limiter = AdaptiveRateController(
+                TokenBucket(self.rate, self.burst),
+                ceiling=self.rate,
+                **self.controller_options,
+            )
+            self._limiters[phone_number_id] = limiter
+        return limiter
+
+    def health(self, phone_number_id: str) -> SenderHealth:
+        health = self._health.get(phone_number_id)
+        if health is None:
+            health = SenderHealth(**self.health_options)
+            self._health[phone_number_id] = health
+        return health
+
+    async def send_campaign(
+        self,
+        campaign_id: str,
+        recipients: Union[Iterable[Recipient], AsyncIterable[Recipient]],
+        template_name: str,
+        template_data: Optional[Dict[str, Any]] = None,
+        start_offset: int = 0,
+        skip: Iterable[int] = (),
+        checkpoint: Optional[Checkpointer] = None,
+        senders: Optional[Sequence[str]] = None,
+        run_id: Optional[str] = None,
+        positions: Optional[Sequence[Optional[int]]] = None,
+        resumable: Optional[bool] = None,
+        with_variables: bool = False,
+    ) -> CampaignSendReport:
+        """Send the template to every recipient and return the totals.
+
+        ``recipients`` yields the recipients from position ``start_offset``
+        on, as phone numbers or (phone number, variables) pairs, from a
+        plain or an async iterable. An empty phone number counts as an
+        error without a send. Positions in ``skip`` were already finished by an earlier run.
+        ``checkpoint`` is awaited with the progress, including the message
+        id or error of each finished recipient, every
+        ``checkpoint_batch`` finished recipients, at least every
+        ``checkpoint_interval`` seconds, and once more at the end. When it
+        returns False, no new sends are started and the run returns after
+        its in-flight sends. ``senders`` is the pool of phone number IDs to
+        send from; by default only the configured number is used. ``run_id``
+        names the run for ``request_stop``; by default a unique one is made.
+
+        Results and dead letters carry each recipient's position in
+        campaign_recipients. That is its index, unless ``positions`` maps
+        indexes to positions, as a re-drive of scattered recipients does.
+        ``resumable`` runs are stopped by ``stop_campaign``; by default, runs
+        with a checkpoint are. ``with_variables`` fills the template's
+        ``{{name}}`` parameters from each recipient's variables; without it
+        they are sent as written.
+        """
+        run_id = run_id or f"{campaign_id}:{next(self._run_ids)}"
+        report = CampaignSendReport(campaign_id, run_id)
+        report.resumable = checkpoint is not None if resumable is None else resumable
+        run = CampaignRun(
+            report,
+            template_name,
+            template_data,
+            # The payload is the same for every recipient but the "to" field
+            compile_template_payload(
+                template_name, template_data, callback_data=campaign_id, with_variables=with_variables
+            ),
+            SenderPool(senders or [self.whatsapp_service.phone_number_id], self.health),
+            iterate_recipients(recipients),
+            start_offset,
+            skip,
+            checkpoint,
+            positions,
+            self._stop_events.setdefault(run_id, asyncio.Event()),
+        )
+        self._active[run_id] = report
+
+        ticker = asyncio.create_task(self._heartbeat(run)) if checkpoint else None
+        try:
+            await asyncio.gather(*(self._worker(run) for _ in range(self.concurrency * len(run.pool))))
+        finally:
+            await self._close_run(run, ticker)
+
+        logger.info(
+            f"Campaign {campaign_id} {'stopped after' if report.stopped else 'sent'} "
+            f"{report.sent_count} messages ({report.error_count} errors) in "
+            f"{report.elapsed:.1f}s, {report.throughput:.1f} msg/s"
+        )
+        return report
+
+    async def _close_run(self, run: CampaignRun, ticker: Optional[asyncio.Task]) -> None:
+        # Lets a streaming source release its file
+        await run.source.aclose()
+        if ticker:
+            ticker.cancel()
+            await asyncio.gather(ticker, return_exceptions=True)
+            await self._save_checkpoint(run)
+        else:
+            await self._flush_dead_letters(run)
+        report = run.report
+        report.finished_at = time.monotonic()
+        report.stopped = run.stop.is_set()
+        self._active.pop(report.run_id, None)
+        self._stop_events.pop(report.run_id, None)
+
+    async def _worker(self, run: CampaignRun) -> None:
+        while True:
+            send = await self._next_recipient(run)
+            if send is None:
+                return
+            await self._send(run, send)
+
+    async def _next_recipient(self, run: CampaignRun) -> Optional[PendingSend]:
+        """The next due retry or, failing that, the next recipient of the source.
+
+        Waits for the earliest retry once the source is used up; None when
+        there is nothing left to send or the run was stopped.
+        """
+        while not run.stop.is_set():
+            if run.delayed and run.delayed[0][0] <= time.monotonic():
+                return heapq.heappop(run.delayed)[2]
+            if not run.exhausted:
+                async with run.source_lock:
+                    send = await self._pull(run)
+                if send is not None:
+                    return send
+                continue
+            if not run.delayed:
+                return None
+            await asyncio.sleep(run.delayed[0][0] - time.monotonic())
+        return None
+
+    async def _pull(self, run: CampaignRun) -> Optional[PendingSend]:
+        while not run.exhausted:
+            try:
+                item = await run.source.__anext__()
+            except StopAsyncIteration:
+                run.exhausted = True
+                return None
+            index = run.position
+            run.position += 1
+            if index in run.skipped:
+                continue
+            recipient, variables = (item, None) if isinstance(item, str) else item
+            return PendingSend(index, recipient, variables, 0)
+        return None
+
+    async def _send(self, run: CampaignRun, send: PendingSend) -> None:
+        """Send to one recipient, or put it back on the delay heap."""
+        report = run.report
+        if not send.recipient:
+            report.error_count += 1
+            self._failed += 1
+            if len(report.errors) < MAX_REPORTED_ERRORS:
+                report.errors.append(f"Recipient {send.index} has no phone number")
+            await self._finish(run, send.index, sent=False, error="No phone number")
+            return
+
+        wait = pair_rate_scheduler.delay_for(send.recipient)
+        if wait > self.max_pair_wait:
+            self._deferred += 1
+            run.delay(send, wait)
+            return
+
+        sender = run.pool.assign(send.recipient)
+        limiter = self.limiter(sender)
+        await limiter.bucket.acquire()
+        try:
+            response = await self.whatsapp_service.send_compiled_template(
+                phone_number=send.recipient,
+                compiled=run.compiled,
+                variables=send.variables,
+                max_pair_wait=self.max_pair_wait,
+                phone_number_id=sender,
+            )
+        except PairRateDeferredError as e:
+            self._deferred += 1
+            run.delay(send, e.retry_after)
+            return
+        except WhatsAppThrottledError as e:
+            report.throttled_count += 1
+            self._throttled += 1
+            # A pair-rate hit only concerns this recipient, not the number
+            if not isinstance(e, WhatsAppPairRateError):
+                limiter.on_throttle()
+            await self._fail(run, send._replace(attempts=send.attempts + 1), e)
+            return
+        except Exception as e:
+            if is_sender_failure(e):
+                self.health(sender).on_failure()
+            await self._fail(run, send._replace(attempts=send.attempts + 1), e)
+            return
+
+        limiter.on_success()
+        self.health(sender).on_success()
+        report.sent_by_sender[sender] += 1
+        message_id = None
+        if response and response.get("messages"):
+            message_id = report.last_message_id = response["messages"][0]["id"]
+        report.sent_count += 1
+        self._sent += 1
+        await self._finish(run, send.index, sent=True, message_id=message_id)
+
+    async def _fail(self, run: CampaignRun, send: PendingSend, error: Exception) -> None:
+        """Schedule a retry of a failed send, or give up on its recipient."""
+        retry_in = self.retry_policy.next_delay(error, send.attempts)
+        if retry_in is not None:
+            if isinstance(error, WhatsAppPairRateError):
+                retry_in = max(retry_in, pair_rate_scheduler.delay_for(send.recipient))
+            run.report.retried_count += 1
+            self._retried += 1
+            run.delay(send, retry_in)
+            return
+
+        report = run.report
+        report.error_count += 1
+        self._failed += 1
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(f"Error sending to {send.recipient}: {str(error)}")
+        logger.error(f"Giving up on {send.recipient} after {send.attempts} attempts: {str(error)}")
+        await self._dead_letter(run, send, error)
+        await self._finish(run, send.index, sent=False, error=str(error))
+
+    async def _dead_letter(self, run: CampaignRun, send: PendingSend, error: Exception) -> None:
+        run.dead.append({
+            "campaign_id": run.campaign_id,
+            "position": run.position_of(send.index),
+            "recipient": send.recipient,
+            "template_name": run.template_name,
+            "template_data": run.template_data,
+            "variables": send.variables,
+            "error_class": classify_error(error),
+            "status_code": error.status_code if isinstance(error, WhatsAppError) else None,
+            "error_code": getattr(error, "error_code", None),
+            "last_error": str(error)[:2000],
+            "attempts": send.attempts,
+        })
+        if len(run.dead) >= DEAD_LETTER_BATCH_SIZE:
+            await self._flush_dead_letters(run)
+
+    async def _flush_dead_letters(self, run: CampaignRun) -> None:
+        batch = run.dead[:]
+        del run.dead[:]
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self.dead_letters.write, batch)
+            run.report.dead_lettered_count += len(batch)
+            self._dead_lettered += len(batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} dead letters for campaign {run.campaign_id}: {str(e)}")
+
+    async def _finish(
+        self,
+        run: CampaignRun,
+        index: int,
+        sent: bool,
+        message_id: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Record a finished recipient and checkpoint once a batch is done."""
+        run.done.add(index)
+        if run.checkpoint:
+            stored_at = run.position_of(index)
+            if stored_at is not None:
+                run.results.append((stored_at, message_id, None if sent else error or "failed"))
+        if sent:
+            run.sent += 1
+        else:
+            run.failed += 1
+        run.since += 1
+        while run.watermark in run.done:
+            run.done.discard(run.watermark)
+            run.watermark += 1
+        if run.checkpoint and not run.checkpoint_lock.locked() and run.since >= self.checkpoint_batch:
+            await self._save_checkpoint(run)
+
+    async def _save_checkpoint(self, run: CampaignRun) -> None:
+        async with run.checkpoint_lock:
+            # Dead letters first, so nothing below the checkpoint is lost
+            await self._flush_dead_letters(run)
+            state = CampaignCheckpoint(
+                offset=run.watermark,
+                done=sorted(run.done),
+                sent_delta=run.sent,
+                error_delta=run.failed,
+                last_message_id=run.report.last_message_id,
+                results=run.results[:],
+            )
+            run.sent = run.failed = run.since = 0
+            del run.results[:]
+            try:
+                if not await run.checkpoint(state):
+                    run.stop.set()
+            except Exception as e:
+                # Keep sending; the deltas go out with the next checkpoint
+                run.sent += state.sent_delta
+                run.failed += state.error_delta
+                run.results[:0] = state.results
+                logger.error(f"Failed to checkpoint campaign {run.campaign_id}: {str(e)}")
+
+    async def _heartbeat(self, run: CampaignRun) -> None:
+        # Checkpoints double as the liveness signal, so they must keep
+        # coming even while every send is waiting on a retry
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            if not run.checkpoint_lock.locked():
+                await self._save_checkpoint(run)
+
+    def request_stop(self, run_id: str) -> bool:
+        """Ask a run in this process to stop; True if it was running."""
+        if run_id not in self._active:
+            return False
+        self._stop_events[run_id].set()
+        return True
+
+    def stop_campaign(self, campaign_id: str) -> int:
+        """Stop the resumable runs of a campaign in this process; returns how many.
+
+        Re-drives are left to finish: their dead letters are already claimed
+        and would not be sent by anyone else.
+        """
+        run_ids = [
+            run_id for run_id, report in self._active.items()
+            if report.campaign_id == campaign_id and report.resumable
+        ]
+        for run_id in run_ids:
+            self.request_stop(run_id)
+        return len(run_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "active_campaigns": [report.to_dict() for report in self._active.values()],
+            "sent": self._sent,
+            "failed": self._failed,
+            "throttled": self._throttled,
+            "pair_rate_deferred": self._deferred,
+            "retried": self._retried,
+            "dead_lettered": self._dead_lettered,
+            "retry_policy": self.retry_policy.describe(),
+            "pair_rate": pair_rate_scheduler.stats(),
+            "rate_limits": {
+                number: {**limiter.stats(), **limiter.bucket.stats()}
+                for number, limiter in self._limiters.items()
+            },
+            "sender_health": {number: health.stats() for number, health in self._health.items()},
+        }
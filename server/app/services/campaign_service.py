@@ -1,20 +1,104 @@
+import asyncio
+from collections import defaultdict
 from datetime import datetime
+from functools import partial
+import json
 import uuid
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import and_, case, func, update
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.db.session import SessionLocal
 from app.models.campaign import Campaign
 from app.schemas.campaign import CampaignCreate, CampaignUpdate
+from app.services.campaign_jobs import enqueue_campaign
+from app.services.campaign_sender import CampaignCheckpoint, CampaignSender
+from app.services.campaign_recipients import RecipientStore, copy_recipients, record_send_results
+from app.services.recipient_lists import ListReport, iter_list_recipients
 from app.services.whatsapp_service import WhatsAppService
+from app.utils.payload_compiler import compile_template_payload
+from app.utils.phone_numbers import PhoneDeduper, parse_phones
+
+# Statuses from which a campaign may (re)start sending
+RUNNABLE_STATUSES = ("pending", "in_progress")
+# Recipients of these campaigns carry the values of the template's {{name}} variables
+VARIABLE_RECIPIENT_TYPES = ("list", "upload")
+
+
+def queue_campaign(db: Session, campaign: Campaign) -> None:
+    """Queue a campaign for the workers, or leave it to the scheduler until it is due.
+
+    The caller commits.
+    """
+    if campaign.scheduled_at and campaign.scheduled_at > datetime.utcnow():
+        campaign.status = "scheduled"
+    else:
+        enqueue_campaign(db, campaign.id)
+
+
+def write_checkpoint(campaign_id: str, state: CampaignCheckpoint) -> Optional[str]:
+    """Persist send progress and return the campaign's current status.
+
+    Runs in its own session and transaction, off the event loop. Counts are
+    added as deltas so the campaign row stays correct whatever else updates
+    it. The outcome of each finished recipient is written in the same
+    transaction. The returned status tells the sender whether to keep going.
+    """
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        if state.results:
+            record_send_results(db, campaign_id, state.results, now)
+        status = db.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id)
+            .values(
+                checkpoint_offset=state.offset,
+                checkpoint_done=state.done or None,
+                sent_count=Campaign.sent_count + state.sent_delta,
+                error_count=Campaign.error_count + state.error_delta,
+                message_id=func.coalesce(state.last_message_id, Campaign.message_id),
+                heartbeat_at=now,
+                updated_at=now,
+            )
+            .returning(Campaign.status)
+        ).scalar()
+        db.commit()
+    return status
+
 
 class CampaignService:
-    def __init__(self, db: Session, whatsapp_service: WhatsAppService):
+    def __init__(
+        self,
+        db: Session,
+        whatsapp_service: WhatsAppService,
+        sender: Optional[CampaignSender] = None,
+    ):
         self.db = db
         self.whatsapp_service = whatsapp_service
+        # Pass the process-wide sender so campaigns share the rate limits
+        self.sender = sender or CampaignSender(whatsapp_service)
+        self.recipients = RecipientStore()
 
     def create_campaign(self, user_id: str, campaign_in: CampaignCreate) -> Campaign:
-        """Create a new campaign."""
+        """Create a new campaign.
+
+        Recipients of individual campaigns are normalised, deduplicated and
+        bulk-loaded into campaign_recipients in the same transaction; list
+        campaigns load their file when they first run. Both are queued for
+        the campaign workers in that transaction too, or scheduled when
+        ``scheduled_at`` is in the future, while upload campaigns wait for
+        their recipients. Raises ValueError when a recipient is not a valid
+        phone number.
+        """
         campaign_data = campaign_in.dict()
+        recipients = campaign_data.pop("recipients", None) or []
+        phones = parse_phones(recipients, settings.PHONE_DEFAULT_COUNTRY_CODE)
+        invalid = [value for value, valid in zip(recipients, phones.valid.tolist()) if not valid]
+        if invalid:
+            raise ValueError(f"Invalid phone numbers: {', '.join(map(str, invalid[:5]))}")
+        recipients = phones.e164(PhoneDeduper().first_seen(phones.numbers))
         
         # Store template data
         template_data = {
@@ -29,6 +113,12 @@ class CampaignService:
             **campaign_data
         )
         self.db.add(campaign)
+        # The campaign row must exist before its recipients and job reference it
+        self.db.flush()
+        if campaign.recipient_type != "list":
+            campaign.recipient_count = copy_recipients(self.db, campaign.id, recipients)
+        if campaign.recipient_type != "upload":
+            queue_campaign(self.db, campaign)
         self.db.commit()
         self.db.refresh(campaign)
         return campaign
@@ -55,37 +145,74 @@ class CampaignService:
         self.db.refresh(campaign)
         return campaign
 
-    async def process_campaign(self, campaign_id: str) -> Campaign:
-        """Process a campaign by sending messages to all recipients."""
+    async def process_campaign(self, campaign_id: str, run_id: Optional[str] = None) -> Campaign:
+        """Process a campaign by sending messages to all recipients.
+
+        Sending resumes after the campaign's last checkpoint, so a restarted
+        or resumed campaign skips the recipients it already finished.
+        ``run_id`` names the send for ``CampaignSender.request_stop``.
+        """
         campaign = self.get_campaign(campaign_id)
         if not campaign:
             raise ValueError("Campaign not found")
+        if campaign.status not in RUNNABLE_STATUSES:
+            logger.info(f"Not sending campaign {campaign_id} with status {campaign.status}")
+            return campaign
 
-        campaign.status = "in_progress"
-        campaign.updated_at = datetime.utcnow()
+        template_data = {
+            "language": {"code": campaign.template_language},
+            "components": campaign.template_components
+        }
+        try:
+            if campaign.recipient_count is None:
+                await self.load_list(campaign, template_data)
+            await self.check_variables(campaign, template_data)
+        except Exception:
+            campaign.status = "failed"
+            campaign.updated_at = datetime.utcnow()
+            self.db.commit()
+            raise
+
+        # Conditional, so a pause or cancel that lands first is not overwritten
+        now = datetime.utcnow()
+        started = self.db.query(Campaign).filter(
+            Campaign.id == campaign_id, Campaign.status.in_(RUNNABLE_STATUSES)
+        ).update(
+            {"status": "in_progress", "heartbeat_at": now, "updated_at": now},
+            synchronize_session=False,
+        )
         self.db.commit()
+        self.db.refresh(campaign)
+        if not started:
+            logger.info(f"Not sending campaign {campaign_id} with status {campaign.status}")
+            return campaign
 
         try:
-            if campaign.recipient_type == "individual":
-                for recipient in campaign.recipients:
-                    try:
-                        response = await self.whatsapp_service.send_template_message(
-                            phone_number=recipient,
-                            template_name=campaign.template_name,
-                            template_data={
-                                "language": {"code": campaign.template_language},
-                                "components": campaign.template_components
-                            }
-                        )
-                        # Store the message ID from the response
-                        if response and response.get("messages"):
-                            campaign.message_id = response["messages"][0]["id"]
-                        campaign.sent_count += 1
-                    except Exception as e:
-                        campaign.error_count += 1
-                        logger.error(f"Error sending to {recipient}: {str(e)}")
-
-            campaign.status = "completed"
+            offset = campaign.checkpoint_offset or 0
+            if offset:
+                logger.info(f"Resuming campaign {campaign_id} at recipient {offset}")
+
+            report = await self.sender.send_campaign(
+                campaign_id=campaign.id,
+                recipients=self.recipients.stream(
+                    campaign.id, start=offset, batch_size=settings.CAMPAIGN_RECIPIENT_BATCH
+                ),
+                template_name=campaign.template_name,
+                template_data=template_data,
+                start_offset=offset,
+                skip=campaign.checkpoint_done or [],
+                checkpoint=partial(self._save_checkpoint, campaign.id),
+                senders=campaign.sender_pool,
+                run_id=run_id,
+                with_variables=campaign.recipient_type in VARIABLE_RECIPIENT_TYPES,
+            )
+            # Counts were written by the checkpoints
+            self.db.refresh(campaign)
+            if report.stopped:
+                # Paused or cancelled; the status was set by whoever stopped it
+                return campaign
+
+            campaign.status = "completed" if campaign.error_count == 0 else "partial"
             campaign.completed_at = datetime.utcnow()
 
         except Exception as e:
@@ -97,4 +224,141 @@ class CampaignService:
             self.db.commit()
             self.db.refresh(campaign)
 
-        return campaign 
\ No newline at end of file
+        return campaign 
+
+    async def load_list(self, campaign: Campaign, template_data: Dict[str, Any]) -> None:
+        """Copy the rows of a list campaign's file into campaign_recipients."""
+        if campaign.recipient_type != "list" or not campaign.file_url:
+            raise ValueError("Campaign has no stored recipients and no list file")
+        report = ListReport()
+        rows = iter_list_recipients(
+            campaign.file_url,
+            phone_column=campaign.phone_column or "phone",
+            columns=self.list_columns(campaign, template_data),
+            report=report,
+        )
+        # Parsing and COPY both block; the whole load runs in one worker thread
+        count = await asyncio.to_thread(self.recipients.replace, campaign.id, rows)
+        logger.info(
+            f"Loaded {count} of {report.rows} rows for list campaign {campaign.id}: "
+            f"{report.duplicates} duplicates, {report.invalid} invalid numbers"
+            + (f" (rows {', '.join(map(str, report.invalid_rows))})" if report.invalid_rows else "")
+        )
+        self.db.refresh(campaign)
+
+    async def check_variables(self, campaign: Campaign, template_data: Dict[str, Any]) -> None:
+        """Raise ValueError when the recipients cannot fill the template's variables.
+
+        Every recipient of a campaign was stored with the same variables, so
+        the first one tells for all of them. Checked before any send, so a
+        template edited after its recipients were loaded fails the campaign
+        once instead of dead-lettering every recipient.
+        """
+        if campaign.recipient_type not in VARIABLE_RECIPIENT_TYPES:
+            return
+        needed = self.list_columns(campaign, template_data)
+        if not needed:
+            return
+        first = await asyncio.to_thread(self.recipients.read_batch, campaign.id, 0, 1)
+        present = set(first[0][2] or {}) if first else set(needed)
+        missing = [name for name in needed if name not in present]
+        if missing:
+            raise ValueError(f"Recipients have no values for template variables: {', '.join(missing)}")
+
+    @staticmethod
+    def list_columns(campaign: Campaign, template_data: Dict[str, Any]) -> Dict[str, str]:
+        """Map each ``{{name}}`` variable of the template to its list column."""
+        variables = compile_template_payload(
+            campaign.template_name, template_data, with_variables=True
+        ).variables
+        mapping = campaign.column_mapping or {}
+        return {name: mapping.get(name, name) for name in variables}
+
+    async def _save_checkpoint(self, campaign_id: str, state: CampaignCheckpoint) -> bool:
+        status = await asyncio.to_thread(write_checkpoint, campaign_id, state)
+        return status == "in_progress"
+
+    @staticmethod
+    async def _collect_results(
+        results: List[Tuple[int, Optional[str], Optional[str]]], state: CampaignCheckpoint
+    ) -> bool:
+        # A re-drive writes its outcomes once, with its counters
+        results.extend(state.results)
+        return True
+
+    async def redrive_dead_letters(
+        self, letters: List[Dict[str, Any]], run_id: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Send claimed dead letters again and fold the outcome into their campaigns.
+
+        Each re-drive is a run of its own in the sender, so it neither
+        shares nor ends the stop signal of a send of the same campaign.
+        """
+        groups: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for letter in letters:
+            key = (
+                letter["campaign_id"],
+                letter["template_name"],
+                json.dumps(letter["template_data"], sort_keys=True),
+            )
+            groups[key].append(letter)
+
+        sent = failed = 0
+        for (campaign_id, template_name, _), group in groups.items():
+            campaign = self.get_campaign(campaign_id) if campaign_id else None
+            results: List[Tuple[int, Optional[str], Optional[str]]] = []
+            report = await self.sender.send_campaign(
+                campaign_id=campaign_id,
+                recipients=[
+                    (letter["recipient"], letter["variables"]) if letter.get("variables")
+                    else letter["recipient"]
+                    for letter in group
+                ],
+                template_name=template_name,
+                template_data=group[0]["template_data"],
+                checkpoint=partial(self._collect_results, results) if campaign else None,
+                senders=campaign.sender_pool if campaign else None,
+                run_id=run_id,
+                positions=[letter.get("position") for letter in group],
+                resumable=False,
+                with_variables=(
+                    campaign.recipient_type in VARIABLE_RECIPIENT_TYPES if campaign
+                    else any(letter.get("variables") for letter in group)
+                ),
+            )
+            sent += report.sent_count
+            failed += report.error_count
+
+            if campaign:
+                # The recipients' rows and the counters move together. Each
+                # dead letter was counted as an error when it was given up on.
+                # One UPDATE of deltas, like the checkpoints, so it cannot lose
+                # their concurrent increments; SET reads the old row.
+                now = datetime.utcnow()
+                if results:
+                    record_send_results(self.db, campaign_id, results, now)
+                recovered = report.sent_count
+                if recovered:
+                    self.db.execute(
+                        update(Campaign)
+                        .where(Campaign.id == campaign_id)
+                        .values(
+                            sent_count=Campaign.sent_count + recovered,
+                            error_count=func.greatest(0, Campaign.error_count - recovered),
+                            status=case(
+                                (
+                                    and_(
+                                        Campaign.status == "partial",
+                                        Campaign.error_count <= recovered,
+                                    ),
+                                    "completed",
+                                ),
+                                else_=Campaign.status,
+                            ),
+                            updated_at=now,
+                        )
+                    )
+                self.db.commit()
+
+        logger.info(f"Re-drove {len(letters)} dead letters: {sent} sent, {failed} failed again")
+        return {"redriven": len(letters), "sent": sent, "failed": failed}
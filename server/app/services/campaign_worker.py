@@ -0,0 +1,271 @@
+"""Campaign worker: claims jobs from campaign_jobs and runs them."""
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.campaign_jobs import CampaignJobStore
+from app.services.campaign_sender import CampaignSender
+from app.services.campaign_service import CampaignService
+from app.services.whatsapp_service import WhatsAppService
+from app.utils.retry import RetryPolicy, RetryRule
+
+PURGE_INTERVAL = 3600.0
+
+
+def run_id(job: Dict[str, Any]) -> str:
+    """The sender run of a job, so stopping it leaves other runs alone."""
+    return f"job-{job['id']}"
+
+
+def build_campaign_sender(whatsapp_service: WhatsAppService) -> CampaignSender:
+    """The campaign sender of a process, configured from settings."""
+    return CampaignSender(
+        whatsapp_service,
+        rate=settings.WHATSAPP_MESSAGING_RATE,
+        burst=settings.WHATSAPP_MESSAGING_BURST,
+        concurrency=settings.CAMPAIGN_SEND_CONCURRENCY,
+        max_pair_wait=settings.CAMPAIGN_MAX_PAIR_WAIT,
+        controller_options={
+            "floor": settings.WHATSAPP_RATE_MIN,
+            "decrease_factor": settings.WHATSAPP_RATE_DECREASE_FACTOR,
+            "increase_step": settings.WHATSAPP_RATE_INCREASE_STEP,
+            "increase_interval": settings.WHATSAPP_RATE_INCREASE_INTERVAL,
+        },
+        retry_policy=RetryPolicy({
+            "transient": RetryRule(
+                max_attempts=settings.CAMPAIGN_RETRY_MAX_ATTEMPTS,
+                base_delay=settings.CAMPAIGN_RETRY_BASE_DELAY,
+                max_delay=settings.CAMPAIGN_RETRY_MAX_DELAY,
+            ),
+            "throttled": RetryRule(
+                max_attempts=settings.CAMPAIGN_THROTTLE_MAX_RETRIES + 1,
+                base_delay=0.5,
+                max_delay=30.0,
+            ),
+        }),
+        checkpoint_batch=settings.CAMPAIGN_CHECKPOINT_BATCH,
+        checkpoint_interval=settings.CAMPAIGN_CHECKPOINT_INTERVAL,
+        health_options={
+            "failure_threshold": settings.SENDER_FAILURE_THRESHOLD,
+            "cooldown": settings.SENDER_COOLDOWN_SECONDS,
+        },
+    )
+
+
+class CampaignWorker:
+    """Run queued campaign jobs, up to ``max_jobs`` at a time.
+
+    Every job of the process goes through one ``CampaignSender``, so they
+    share its per-number rate limits. Across processes, ``claim`` only hands
+    a worker jobs whose sender numbers no other worker is sending from, so
+    each number is rate limited in one place. Leases are renewed every
+    quarter of ``lease_seconds``. A job whose lease was lost has been
+    claimed by another worker and is stopped here.
+
+    A campaign that stops without finishing (the worker is shutting down,
+    or its lease was lost) has its job released back to the queue, and
+    the next worker resumes it from the last checkpoint.
+    """
+
+    def __init__(
+        self,
+        sender: CampaignSender,
+        jobs: Optional[CampaignJobStore] = None,
+        max_jobs: int = 4,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 120.0,
+        max_attempts: int = 5,
+        retention_hours: int = 168,
+        worker_id: Optional[str] = None,
+    ) -> None:
+        self.sender = sender
+        self.jobs = jobs or CampaignJobStore()
+        self.max_jobs = max(1, max_jobs)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_hours = retention_hours
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Dict[int, Tuple[Dict[str, Any], asyncio.Task]] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._claimed = 0
+        self._done = 0
+        self._failed = 0
+        self._released = 0
+        self._lost = 0
+
+    @property
+    def running(self) -> bool:
+        return self._poller is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._poller = asyncio.create_task(self._poll_loop(), name="campaign-worker")
+        logger.info(f"Campaign worker {self.worker_id} started, up to {self.max_jobs} jobs")
+
+    async def stop(self, grace: float = 30.0) -> None:
+        """Stop claiming, stop running campaigns and hand their jobs back.
+
+        Campaigns stop at their next send and checkpoint. Jobs still running
+        after ``grace`` seconds (a list still loading, say) are cancelled.
+        """
+        if not self.running:
+            return
+        self._poller.cancel()
+        await asyncio.gather(self._poller, return_exceptions=True)
+        self._poller = None
+        for job, _ in self._running.values():
+            if job["kind"] == "send":
+                self.sender.request_stop(run_id(job))
+        tasks = [task for _, task in self._running.values()]
+        if tasks:
+            _, late = await asyncio.wait(tasks, timeout=grace)
+            for task in late:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _poll_loop(self) -> None:
+        next_heartbeat = next_purge = 0.0
+        while True:
+            try:
+                now = time.monotonic()
+                if self._running and now >= next_heartbeat:
+                    next_heartbeat = now + self.lease_seconds / 4
+                    await self._heartbeat()
+                if now >= next_purge:
+                    next_purge = now + PURGE_INTERVAL
+                    cutoff = datetime.utcnow() - timedelta(hours=self.retention_hours)
+                    await asyncio.to_thread(self.jobs.purge_finished, cutoff)
+                free = self.max_jobs - len(self._running)
+                if free > 0:
+                    claimed = await asyncio.to_thread(
+                        self.jobs.claim, self.worker_id, free, self.lease_seconds, self.max_attempts
+                    )
+                    for job in claimed:
+                        self._launch(job)
+            except Exception as e:
+                logger.error(f"Campaign worker poll failed: {str(e)}")
+            # A finished job wakes the loop early to claim the next one
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat(self) -> None:
+        job_ids = list(self._running)
+        held = set(await asyncio.to_thread(self.jobs.heartbeat, self.worker_id, job_ids))
+        for job_id in job_ids:
+            if job_id in held or job_id not in self._running:
+                continue
+            job = self._running[job_id][0]
+            self._lost += 1
+            logger.warning(f"Lost the lease on campaign job {job_id}; stopping it here")
+            if job["kind"] == "send":
+                self.sender.request_stop(run_id(job))
+
+    def _launch(self, job: Dict[str, Any]) -> None:
+        self._claimed += 1
+        if job["attempts"] > 1:
+            logger.info(f"Resuming campaign job {job['id']} (attempt {job['attempts']})")
+        task = asyncio.get_running_loop().create_task(
+            self._run(job), name=f"campaign-job-{job['id']}"
+        )
+        self._running[job["id"]] = (job, task)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        unfinished = False
+        error: Optional[str] = None
+        try:
+            if job["kind"] == "send":
+                unfinished = await self._send(job["campaign_id"], run_id(job))
+            elif job["kind"] == "redrive":
+                await self._redrive(job["payload"] or {}, run_id(job))
+            else:
+                raise ValueError(f"Unknown campaign job kind {job['kind']}")
+        except asyncio.CancelledError:
+            # Cut short by stop(); a re-drive may have sent part of its letters
+            unfinished = job["kind"] == "send"
+            error = None if unfinished else "Interrupted by worker shutdown"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.error(f"Campaign job {job['id']} failed: {error}")
+
+        try:
+            if unfinished:
+                await asyncio.to_thread(self.jobs.release, self.worker_id, job["id"])
+                self._released += 1
+            else:
+                await asyncio.to_thread(self.jobs.finish, self.worker_id, job["id"], error)
+                if error:
+                    self._failed += 1
+                else:
+                    self._done += 1
+        except Exception as e:
+            logger.error(f"Failed to update campaign job {job['id']}: {str(e)}")
+        finally:
+            self._running.pop(job["id"], None)
+            if self._wakeup:
+                self._wakeup.set()
+
+    async def _send(self, campaign_id: str, run_id: str) -> bool:
+        """Send a campaign; True when it stopped before finishing."""
+        db = SessionLocal()
+        try:
+            campaign = await CampaignService(
+                db, self.sender.whatsapp_service, self.sender
+            ).process_campaign(campaign_id, run_id=run_id)
+            # Pause and cancel change the status; a plain stop leaves it running
+            return campaign.status == "in_progress"
+        finally:
+            db.close()
+
+    async def _redrive(self, payload: Dict[str, Any], run_id: str) -> None:
+        letters = await asyncio.to_thread(self.sender.dead_letters.read, payload.get("ids") or [])
+        db = SessionLocal()
+        try:
+            await CampaignService(
+                db, self.sender.whatsapp_service, self.sender
+            ).redrive_dead_letters(letters, run_id=run_id)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        jobs: List[Dict[str, Any]] = [
+            {"id": job["id"], "kind": job["kind"], "campaign_id": job["campaign_id"]}
+            for job, _ in self._running.values()
+        ]
+        return {
+            "worker_id": self.worker_id,
+            "running": self.running,
+            "max_jobs": self.max_jobs,
+            "jobs": jobs,
+            "claimed": self._claimed,
+            "done": self._done,
+            "failed": self._failed,
+            "released": self._released,
+            "leases_lost": self._lost,
+            "sender": self.sender.stats(),
+        }
+
+
+def build_campaign_worker(sender: CampaignSender, max_jobs: Optional[int] = None) -> CampaignWorker:
+    """A campaign worker configured from settings."""
+    return CampaignWorker(
+        sender,
+        max_jobs=max_jobs or settings.CAMPAIGN_WORKER_JOBS,
+        poll_interval=settings.CAMPAIGN_WORKER_POLL_INTERVAL,
+        lease_seconds=settings.CAMPAIGN_STALE_SECONDS,
+        max_attempts=settings.CAMPAIGN_JOB_MAX_ATTEMPTS,
+        retention_hours=settings.CAMPAIGN_JOB_RETENTION_HOURS,
+    )
@@ -0,0 +1,89 @@
+"""Storage for outbound sends that exhausted their retries."""
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.campaign import Campaign
+from app.models.dead_letter import OutboundDeadLetter
+
+# What a re-drive needs to send a dead letter again
+REDRIVE_COLUMNS = (
+    OutboundDeadLetter.id,
+    OutboundDeadLetter.campaign_id,
+    OutboundDeadLetter.position,
+    OutboundDeadLetter.recipient,
+    OutboundDeadLetter.template_name,
+    OutboundDeadLetter.template_data,
+    OutboundDeadLetter.variables,
+)
+
+
+class DeadLetterStore:
+    """Synchronous dead-letter queries. Every method runs in a single transaction."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self.session_factory = session_factory
+
+    def write(self, letters: List[Dict[str, Any]]) -> None:
+        if not letters:
+            return
+        with self.session_factory() as db:
+            db.execute(insert(OutboundDeadLetter), letters)
+            db.commit()
+
+    def read(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """The dead letters with the given ids, as claimed for a re-drive."""
+        if not ids:
+            return []
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(*REDRIVE_COLUMNS)
+                .where(OutboundDeadLetter.id.in_(ids))
+                .order_by(OutboundDeadLetter.id)
+            ).mappings().all()
+        return [dict(row) for row in rows]
+
+
+def claim_dead_letters(
+    db: Session,
+    campaign_id: Optional[str] = None,
+    ids: Optional[List[int]] = None,
+    limit: int = 1000,
+    user_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Mark up to ``limit`` dead letters as redriven and return them.
+
+    With ``user_id``, only dead letters of that user's campaigns are
+    claimed, whatever ``campaign_id`` or ``ids`` ask for.
+
+    Rows are locked with ``SKIP LOCKED`` so two concurrent re-drives never
+    send the same message twice. The caller commits, so the claim can share
+    a transaction with the job that re-sends them.
+    """
+    claimable = select(OutboundDeadLetter.id).where(OutboundDeadLetter.status == "dead")
+    if campaign_id:
+        claimable = claimable.where(OutboundDeadLetter.campaign_id == campaign_id)
+    if ids:
+        claimable = claimable.where(OutboundDeadLetter.id.in_(ids))
+    if user_id:
+        claimable = claimable.where(
+            OutboundDeadLetter.campaign_id.in_(
+                select(Campaign.id).where(Campaign.user_id == user_id)
+            )
+        )
+    claimable = (
+        claimable.order_by(OutboundDeadLetter.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        update(OutboundDeadLetter)
+        .where(OutboundDeadLetter.id.in_(claimable))
+        .values(status="redriven", redriven_at=datetime.utcnow())
+        .returning(*REDRIVE_COLUMNS)
+    ).mappings().all()
+    return [dict(row) for row in rows]
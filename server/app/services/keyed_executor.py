@@ -0,0 +1,109 @@
+"""Ordered-per-key, parallel-across-keys execution of async jobs."""
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class KeyQueueFullError(Exception):
+    """Raised when a key already has the maximum number of pending jobs."""
+
+
+class KeyedExecutor:
+    """Run jobs that share a key strictly one after another.
+
+    Jobs for different keys run in parallel, up to ``max_concurrency`` at a
+    time. Each key has a bounded queue. A key only exists while it has work:
+    its drain task removes it as soon as the queue empties, so memory follows
+    the number of active conversations rather than the number of users ever
+    seen.
+    """
+
+    def __init__(self, max_pending_per_key: int = 32, max_concurrency: int = 64) -> None:
+        self.max_pending_per_key = max(1, max_pending_per_key)
+        self.max_concurrency = max(1, max_concurrency)
+        self._queues: Dict[str, Deque[Tuple[Job, asyncio.Future]]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._peak_keys = 0
+
+    def submit(self, key: str, job: Job) -> asyncio.Future:
+        """Queue ``job`` behind earlier jobs for ``key`` and return its future."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        loop = asyncio.get_running_loop()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = deque()
+            self._queues[key] = queue
+            self._peak_keys = max(self._peak_keys, len(self._queues))
+            task = loop.create_task(self._drain(key, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif len(queue) >= self.max_pending_per_key:
+            self._rejected += 1
+            raise KeyQueueFullError(f"Too many pending jobs for {key}")
+
+        future = loop.create_future()
+        queue.append((job, future))
+        return future
+
+    async def run(self, key: str, job: Job) -> Any:
+        """Submit ``job`` and wait for its result."""
+        return await self.submit(key, job)
+
+    async def _drain(self, key: str, queue: Deque[Tuple[Job, asyncio.Future]]) -> None:
+        try:
+            while queue:
+                # The job stays at the head while it runs so it counts
+                # towards the per-key bound.
+                job, future = queue[0]
+                try:
+                    async with self._semaphore:
+                        result = await job()
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    self._failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    self._completed += 1
+                    if not future.done():
+                        future.set_result(result)
+                finally:
+                    queue.popleft()
+        except asyncio.CancelledError:
+            for _, future in queue:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Keyed executor drain for {key} crashed: {str(e)}")
+        finally:
+            # Idle keys are evicted right away. There is no await between the
+            # emptiness check above and this line, so no job can slip in.
+            if self._queues.get(key) is queue:
+                del self._queues[key]
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_keys": len(self._queues),
+            "peak_keys": self._peak_keys,
+            "queued_jobs": sum(len(q) for q in self._queues.values()),
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
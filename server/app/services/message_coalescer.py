@@ -0,0 +1,133 @@
+"""Debounce bursts of inbound messages into single conversation turns."""
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.keyed_executor import KeyedExecutor, KeyQueueFullError
+from app.utils.whatsapp_utils import MessageEvent
+
+Turn = Callable[[List[MessageEvent]], Awaitable[Dict[str, Any]]]
+Pending = Tuple[MessageEvent, asyncio.Future]
+
+
+class _Conversation:
+    __slots__ = ("pending", "first_at", "timer", "in_flight")
+
+    def __init__(self) -> None:
+        self.pending: List[Pending] = []
+        self.first_at: Optional[float] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.in_flight = False
+
+
+class MessageCoalescer:
+    """Merge consecutive messages from one user into one turn.
+
+    A message starts (or restarts) a ``debounce_seconds`` timer for its
+    ``wa_id``. When the timer fires, everything buffered so far becomes one
+    turn on the keyed executor. ``max_wait_seconds`` caps how long the first
+    message of a burst can be held back. Messages that arrive while a turn is
+    being generated are buffered and become the next turn. Every message gets
+    the outcome of the turn it was merged into.
+    """
+
+    def __init__(
+        self,
+        executor: KeyedExecutor,
+        turn: Turn,
+        debounce_seconds: float = 1.5,
+        max_wait_seconds: float = 5.0,
+        max_pending: int = 32,
+    ) -> None:
+        self.executor = executor
+        self.turn = turn
+        self.debounce_seconds = max(0.0, debounce_seconds)
+        self.max_wait_seconds = max(self.debounce_seconds, max_wait_seconds)
+        self.max_pending = max(1, max_pending)
+        self._conversations: Dict[str, _Conversation] = {}
+        self._received = 0
+        self._turns = 0
+
+    def add(self, event: MessageEvent) -> asyncio.Future:
+        """Buffer ``event`` and return a future for the turn it ends up in."""
+        loop = asyncio.get_running_loop()
+        conversation = self._conversations.get(event.wa_id)
+        if conversation is None:
+            conversation = _Conversation()
+            self._conversations[event.wa_id] = conversation
+        elif len(conversation.pending) >= self.max_pending:
+            raise KeyQueueFullError(f"Too many buffered messages for {event.wa_id}")
+
+        if not conversation.pending:
+            conversation.first_at = loop.time()
+        future = loop.create_future()
+        conversation.pending.append((event, future))
+        self._received += 1
+        if not conversation.in_flight:
+            self._arm(event.wa_id, conversation)
+        return future
+
+    def _arm(self, wa_id: str, conversation: _Conversation) -> None:
+        loop = asyncio.get_running_loop()
+        if conversation.timer:
+            conversation.timer.cancel()
+        deadline = conversation.first_at + self.max_wait_seconds
+        delay = min(self.debounce_seconds, max(0.0, deadline - loop.time()))
+        conversation.timer = loop.call_later(delay, self._fire, wa_id)
+
+    def _fire(self, wa_id: str) -> None:
+        conversation = self._conversations.get(wa_id)
+        if conversation is None or not conversation.pending:
+            return
+        batch, conversation.pending = conversation.pending, []
+        conversation.timer = None
+        conversation.first_at = None
+        conversation.in_flight = True
+        self._turns += 1
+
+        events = [event for event, _ in batch]
+        try:
+            future = self.executor.submit(wa_id, lambda: self.turn(events))
+        except KeyQueueFullError as e:
+            future = asyncio.get_running_loop().create_future()
+            future.set_exception(e)
+        future.add_done_callback(partial(self._finished, wa_id, batch))
+
+    def _finished(self, wa_id: str, batch: List[Pending], outcome: asyncio.Future) -> None:
+        for _, future in batch:
+            if future.done():
+                continue
+            if outcome.cancelled():
+                future.cancel()
+            elif outcome.exception() is not None:
+                future.set_exception(outcome.exception())
+            else:
+                future.set_result(outcome.result())
+
+        conversation = self._conversations.get(wa_id)
+        if conversation is None:
+            return
+        conversation.in_flight = False
+        if conversation.pending:
+            # Messages that came in during generation form the next turn
+            self._arm(wa_id, conversation)
+        else:
+            del self._conversations[wa_id]
+
+    def close(self) -> None:
+        for conversation in self._conversations.values():
+            if conversation.timer:
+                conversation.timer.cancel()
+            for _, future in conversation.pending:
+                future.cancel()
+        self._conversations.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "debounce_seconds": self.debounce_seconds,
+            "buffered_users": len(self._conversations),
+            "buffered_messages": sum(len(c.pending) for c in self._conversations.values()),
+            "messages": self._received,
+            "turns": self._turns,
+            "messages_per_turn": round(self._received / self._turns, 2) if self._turns else 0.0,
+        }
@@ -0,0 +1,160 @@
+"""Idempotency guard for inbound WhatsApp messages keyed on wamid."""
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.processed_message import ProcessedMessage
+
+
+class MessageDeduplicator:
+    """Claim each wamid once so Meta redeliveries are not processed twice.
+
+    A bounded LRU answers repeats seen by this process without touching the
+    database. Everything else goes through the ``processed_messages`` unique
+    key, which is what makes the guard hold across workers and replicas. A
+    claim whose owner crashed can be taken over once its lease expires.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100_000,
+        ttl_seconds: int = 86_400,
+        lease_seconds: int = 300,
+        retention_hours: int = 168,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.capacity = max(1, capacity)
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.retention_hours = retention_hours
+        self.session_factory = session_factory
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._last_purge = time.monotonic()
+        self._purge_task: Optional[asyncio.Task] = None
+        self._lookups = 0
+        self._memory_hits = 0
+        self._db_hits = 0
+
+    def _remember(self, wamid: str) -> None:
+        self._seen[wamid] = time.monotonic()
+        self._seen.move_to_end(wamid)
+        while len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+
+    def _seen_recently(self, wamid: str) -> bool:
+        seen_at = self._seen.get(wamid)
+        if seen_at is None:
+            return False
+        if time.monotonic() - seen_at > self.ttl_seconds:
+            del self._seen[wamid]
+            return False
+        self._seen.move_to_end(wamid)
+        return True
+
+    def _claim_in_db(self, wamid: str) -> bool:
+        now = datetime.utcnow()
+        stmt = insert(ProcessedMessage).values(
+            wamid=wamid, status="processing", claimed_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProcessedMessage.wamid],
+            set_={"claimed_at": now},
+            where=(ProcessedMessage.status == "processing")
+            & (ProcessedMessage.claimed_at < now - timedelta(seconds=self.lease_seconds)),
+        ).returning(ProcessedMessage.wamid)
+        with self.session_factory() as db:
+            claimed = db.execute(stmt).first() is not None
+            db.commit()
+        return claimed
+
+    def _finish_in_db(self, wamid: str, done: bool) -> None:
+        with self.session_factory() as db:
+            if done:
+                db.execute(
+                    update(ProcessedMessage)
+                    .where(ProcessedMessage.wamid == wamid)
+                    .values(status="done")
+                )
+            else:
+                db.execute(
+                    delete(ProcessedMessage).where(
+                        ProcessedMessage.wamid == wamid,
+                        ProcessedMessage.status == "processing",
+                    )
+                )
+            db.commit()
+
+    def _purge_in_db(self) -> int:
+        cutoff = datetime.utcnow() - timedelta(hours=self.retention_hours)
+        with self.session_factory() as db:
+            result = db.execute(
+                delete(ProcessedMessage).where(ProcessedMessage.claimed_at < cutoff)
+            )
+            db.commit()
+        return result.rowcount
+
+    async def claim(self, wamid: Optional[str]) -> bool:
+        """Return True if the caller should process this message."""
+        if not wamid:
+            return True
+        self._lookups += 1
+        if self._seen_recently(wamid):
+            self._memory_hits += 1
+            return False
+
+        claimed = await asyncio.to_thread(self._claim_in_db, wamid)
+        self._remember(wamid)
+        if not claimed:
+            self._db_hits += 1
+            logger.info(f"Skipping duplicate delivery of message {wamid}")
+        self._maybe_purge()
+        return claimed
+
+    async def complete(self, wamid: Optional[str]) -> None:
+        """Mark a claimed message as fully processed."""
+        if wamid:
+            await asyncio.to_thread(self._finish_in_db, wamid, True)
+
+    async def release(self, wamid: Optional[str]) -> None:
+        """Give up a claim after a failure so that a redelivery is processed."""
+        if not wamid:
+            return
+        self._seen.pop(wamid, None)
+        try:
+            await asyncio.to_thread(self._finish_in_db, wamid, False)
+        except Exception as e:
+            logger.error(f"Failed to release claim on message {wamid}: {str(e)}")
+
+    def _maybe_purge(self) -> None:
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+
+        async def purge() -> None:
+            try:
+                removed = await asyncio.to_thread(self._purge_in_db)
+                logger.info(f"Purged {removed} expired message dedupe records")
+            except Exception as e:
+                logger.error(f"Failed to purge message dedupe records: {str(e)}")
+
+        self._purge_task = asyncio.get_running_loop().create_task(purge())
+
+    def stats(self) -> Dict[str, Any]:
+        duplicates = self._memory_hits + self._db_hits
+        return {
+            "cached": len(self._seen),
+            "capacity": self.capacity,
+            "lookups": self._lookups,
+            "memory_hits": self._memory_hits,
+            "db_hits": self._db_hits,
+            "duplicates_skipped": duplicates,
+            "hit_rate": round(duplicates / self._lookups, 4) if self._lookups else 0.0,
+        }
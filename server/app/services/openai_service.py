@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.models.order import KnowledgeBase, Order
+from app.utils.phone_numbers import normalize_phone
 
 SUPPORT_SYSTEM_PROMPT = """You are a helpful WhatsApp Business assistant. Your role is to:
 1. Answer questions about products and services
@@ -109,10 +110,10 @@ class OpenAIService:
     ) -> List[Dict[str, Any]]:
         """Get order details for a customer."""
         try:
-            # Format phone number to match database format
-            phone_number = phone_number.strip().replace(" ", "")
-            if not phone_number.startswith("+"):
-                phone_number = f"+{phone_number}"
+            # Orders store the canonical +digits form
+            phone_number = (
+                normalize_phone(phone_number, settings.PHONE_DEFAULT_COUNTRY_CODE) or phone_number
+            )
 
             logger.debug(f"Searching orders for phone number: {phone_number}")
             orders = (
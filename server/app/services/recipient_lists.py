@@ -0,0 +1,206 @@
+"""Streaming reader for the CSV/XLSX recipient lists of list campaigns."""
+import os
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from app.core.config import settings
+from app.utils.phone_numbers import PhoneDeduper, parse_phones
+
+# (+digits phone number, template variables) for one row of the list
+RecipientRow = Tuple[str, Dict[str, str]]
+
+LIST_EXTENSIONS = (".csv", ".xlsx")
+MAX_REPORTED_INVALID = 100
+
+
+class ListReport:
+    """What one pass over a recipient list kept and dropped."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.invalid = 0
+        # Sheet row numbers (the header is row 1) of the first invalid numbers
+        self.invalid_rows: List[int] = []
+        self.deduper = PhoneDeduper()
+
+    @property
+    def duplicates(self) -> int:
+        return self.deduper.duplicates
+
+    @property
+    def accepted(self) -> int:
+        return self.rows - self.invalid - self.duplicates
+
+
+def resolve_list_path(file_url: str) -> str:
+    """Path of a list file uploaded to ``CAMPAIGN_LIST_DIR``."""
+    root = os.path.realpath(settings.CAMPAIGN_LIST_DIR)
+    path = os.path.realpath(os.path.join(root, file_url))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Recipient list {file_url} is outside the list directory")
+    if not os.path.isfile(path):
+        raise ValueError(f"Recipient list {file_url} not found")
+    return path
+
+
+def list_extension(file_url: str) -> str:
+    extension = os.path.splitext(file_url.split("?", 1)[0])[1].lower()
+    if extension not in LIST_EXTENSIONS:
+        raise ValueError(f"Recipient lists must be CSV or XLSX, got {file_url}")
+    return extension
+
+
+def download_list(file_url: str, extension: str) -> str:
+    """Stream a remote list to a temporary file and return its path."""
+    fd, path = tempfile.mkstemp(suffix=extension)
+    try:
+        with os.fdopen(fd, "wb") as out, httpx.stream(
+            "GET", file_url, follow_redirects=True, timeout=settings.CAMPAIGN_LIST_DOWNLOAD_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            for block in response.iter_bytes(1 << 16):
+                out.write(block)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def to_rows(
+    frame: pd.DataFrame, phone_column: str, columns: Dict[str, str], report: ListReport
+) -> List[RecipientRow]:
+    """Turn a chunk of the list into recipients with whole-column operations.
+
+    Phone numbers are parsed in one batch. Rows with an invalid number, and
+    repeats of a number seen earlier in the list, are dropped and counted
+    in ``report``.
+    """
+    # Numbers exported from spreadsheets as floats
+    raw = frame[phone_column].astype(str).str.replace(r"\.0$", "", regex=True)
+    batch = parse_phones(raw.tolist(), settings.PHONE_DEFAULT_COUNTRY_CODE)
+    invalid = np.flatnonzero(~batch.valid)
+    room = MAX_REPORTED_INVALID - len(report.invalid_rows)
+    if room > 0:
+        report.invalid_rows.extend((invalid[:room] + report.rows + 2).tolist())
+    report.invalid += invalid.size
+    report.rows += len(frame)
+
+    keep = report.deduper.first_seen(batch.numbers, batch.valid)
+    phones = batch.e164(keep)
+    if not columns:
+        return [(phone, {}) for phone in phones]
+    values = frame.loc[keep, list(columns.values())].astype(str).apply(lambda column: column.str.strip())
+    values.columns = list(columns.keys())
+    return list(zip(phones, values.to_dict("records")))
+
+
+def read_csv_chunks(
+    path: str, needed: List[str], chunk_size: int, start_offset: int
+) -> Iterator[pd.DataFrame]:
+    header = pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns
+    check_columns(needed, header)
+    yield from pd.read_csv(
+        path,
+        usecols=needed,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8-sig",
+        chunksize=chunk_size,
+        # Skipped lines are not parsed, so resuming does not rescan the rows
+        skiprows=range(1, start_offset + 1) if start_offset else None,
+    )
+
+
+def read_xlsx_chunks(
+    path: str, needed: List[str], chunk_size: int, start_offset: int
+) -> Iterator[pd.DataFrame]:
+    # Imported here so CSV-only deployments do not need openpyxl
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        check_columns(needed, header)
+        positions = [header.index(column) for column in needed]
+        # The header row is the first row; data starts on the second
+        rows = workbook.active.iter_rows(min_row=start_offset + 2, values_only=True)
+        chunk: List[List[str]] = []
+        for row in rows:
+            chunk.append([cell_text(row[i] if i < len(row) else None) for i in positions])
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=needed)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=needed)
+    finally:
+        workbook.close()
+
+
+def cell_text(value: object) -> str:
+    if value is None:
+        return ""
+    # Phone numbers typed into Excel come back as floats
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def check_columns(needed: List[str], header) -> None:
+    present = set(header)
+    missing = [column for column in needed if column not in present]
+    if missing:
+        raise ValueError(f"Recipient list is missing columns: {', '.join(missing)}")
+
+
+def read_list(
+    path: str,
+    extension: str,
+    phone_column: str,
+    columns: Dict[str, str],
+    chunk_size: int,
+    report: ListReport,
+    start_offset: int = 0,
+) -> Iterator[List[RecipientRow]]:
+    """Yield the recipients of a list file ``chunk_size`` rows at a time."""
+    needed = list(dict.fromkeys([phone_column, *columns.values()]))
+    reader = read_xlsx_chunks if extension == ".xlsx" else read_csv_chunks
+    for frame in reader(path, needed, chunk_size, start_offset):
+        yield to_rows(frame.reset_index(drop=True), phone_column, columns, report)
+
+
+def iter_list_recipients(
+    file_url: str,
+    phone_column: str,
+    columns: Dict[str, str],
+    chunk_size: Optional[int] = None,
+    report: Optional[ListReport] = None,
+) -> Iterator[RecipientRow]:
+    """Yield the recipients of a campaign list, reading it in chunks.
+
+    Blocking; run it in a worker thread. Memory stays flat however long the
+    list is, but for 8 bytes per distinct number to drop repeats.
+    ``columns`` maps template variables to list columns. Dropped rows are
+    counted in ``report``. A remote list is downloaded to a temporary file
+    first and removed afterwards.
+    """
+    extension = list_extension(file_url)
+    remote = file_url.startswith(("http://", "https://"))
+    path = download_list(file_url, extension) if remote else resolve_list_path(file_url)
+    try:
+        for chunk in read_list(
+            path, extension, phone_column, columns,
+            chunk_size or settings.CAMPAIGN_LIST_CHUNK_SIZE, report or ListReport(),
+        ):
+            yield from chunk
+    finally:
+        if remote:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove downloaded list {path}: {str(e)}")
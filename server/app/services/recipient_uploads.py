@@ -0,0 +1,222 @@
+"""Streaming upload of campaign recipients from CSV or NDJSON request bodies."""
+import asyncio
+import csv
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.campaign import Campaign
+from app.services.campaign_recipients import RecipientInput, copy_recipients
+from app.services.recipient_lists import check_columns
+from app.utils.phone_numbers import PhoneDeduper, parse_phones
+
+# Content type -> upload format
+UPLOAD_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/x-jsonlines": "ndjson",
+}
+
+MAX_REPORTED_INVALID = 100
+
+
+async def iter_line_batches(
+    chunks: AsyncIterator[bytes], batch_lines: int, max_line_bytes: int
+) -> AsyncIterator[List[bytes]]:
+    """Split a byte stream into batches of at most ``batch_lines`` lines."""
+    carry = b""
+    batch: List[bytes] = []
+    async for chunk in chunks:
+        lines = (carry + chunk).split(b"\n")
+        carry = lines.pop()
+        if len(carry) > max_line_bytes:
+            raise ValueError(f"Upload has a line longer than {max_line_bytes} bytes")
+        batch.extend(lines)
+        while len(batch) >= batch_lines:
+            yield batch[:batch_lines]
+            batch = batch[batch_lines:]
+    if carry:
+        batch.append(carry)
+    if batch:
+        yield batch
+
+
+class RecipientUpload:
+    """Parse, validate and store one upload, a batch of lines at a time.
+
+    Every batch is parsed into columns, its phone numbers are validated in
+    one pass and the valid rows are appended to campaign_recipients with
+    ``COPY``. All batches go into one transaction, which holds the campaign
+    row locked so concurrent uploads cannot interleave positions and the
+    campaign cannot start half-loaded. Invalid rows are counted and the
+    first ``MAX_REPORTED_INVALID`` are reported by line number. Repeats of
+    a number earlier in the upload are dropped.
+    """
+
+    def __init__(
+        self,
+        campaign_id: str,
+        upload_format: str,
+        phone_column: str = "phone",
+        columns: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.campaign_id = campaign_id
+        self.format = upload_format
+        self.phone_column = phone_column
+        # Template variable -> column (CSV) or key (NDJSON)
+        self.columns = columns or {}
+        self.needed = list(dict.fromkeys([phone_column, *self.columns.values()]))
+        self.start = 0
+        self.lines = 0
+        self.accepted = 0
+        self.invalid = 0
+        self.invalid_rows: List[Dict[str, Any]] = []
+        self.deduper = PhoneDeduper()
+        self._positions: Optional[List[int]] = None
+
+    def begin(self, db: Session) -> None:
+        campaign = db.execute(
+            select(Campaign).where(Campaign.id == self.campaign_id).with_for_update()
+        ).scalar_one_or_none()
+        if campaign is None:
+            raise ValueError(f"Campaign {self.campaign_id} not found")
+        if campaign.status != "pending":
+            raise ValueError(f"Campaign is {campaign.status}; recipients can only be added before it starts")
+        self.start = campaign.recipient_count or 0
+
+    def store(self, db: Session, lines: List[bytes]) -> None:
+        numbers, records = self.parse(lines)
+        if not records:
+            return
+        frame = pd.DataFrame(records, columns=self.needed)
+        raw = frame[self.phone_column].tolist()
+        phones = parse_phones(raw, settings.PHONE_DEFAULT_COUNTRY_CODE)
+        for index in (~phones.valid).nonzero()[0].tolist():
+            self.reject(numbers[index], raw[index], "not a valid phone number")
+
+        keep = self.deduper.first_seen(phones.numbers, phones.valid)
+        rows: List[RecipientInput]
+        if self.columns:
+            values = frame.loc[keep, list(self.columns.values())].fillna("").astype(str)
+            values = values.apply(lambda column: column.str.strip())
+            values.columns = list(self.columns.keys())
+            rows = list(zip(phones.e164(keep), values.to_dict("records")))
+        else:
+            rows = phones.e164(keep)
+        self.accepted += copy_recipients(db, self.campaign_id, rows, start=self.start + self.accepted)
+
+    def finish(self, db: Session) -> None:
+        db.execute(
+            update(Campaign)
+            .where(Campaign.id == self.campaign_id)
+            .values(recipient_count=self.start + self.accepted)
+        )
+        db.commit()
+
+    def parse(self, lines: List[bytes]) -> Tuple[List[int], List[List[Any]]]:
+        """Line numbers and column values of the non-blank lines of a batch."""
+        numbers: List[int] = []
+        texts: List[str] = []
+        for line in lines:
+            self.lines += 1
+            text = line.decode("utf-8-sig" if self.lines == 1 else "utf-8", errors="replace").rstrip("\r")
+            if text.strip():
+                numbers.append(self.lines)
+                texts.append(text)
+        if self.format == "csv":
+            return self._parse_csv(numbers, texts)
+        return self._parse_ndjson(numbers, texts)
+
+    def _parse_csv(self, numbers: List[int], texts: List[str]) -> Tuple[List[int], List[List[Any]]]:
+        rows = list(csv.reader(texts))
+        if len(rows) != len(texts):
+            raise ValueError("Line breaks inside quoted CSV fields are not supported")
+        if self._positions is None and rows:
+            header = [cell.strip() for cell in rows.pop(0)]
+            numbers = numbers[1:]
+            check_columns(self.needed, header)
+            self._positions = [header.index(column) for column in self.needed]
+        positions = self._positions or []
+        return numbers, [[row[i] if i < len(row) else "" for i in positions] for row in rows]
+
+    def _parse_ndjson(self, numbers: List[int], texts: List[str]) -> Tuple[List[int], List[List[Any]]]:
+        kept: List[int] = []
+        records: List[List[Any]] = []
+        variables = self.needed[1:]
+        for number, text in zip(numbers, texts):
+            try:
+                item = json.loads(text)
+            except ValueError:
+                self.reject(number, text, "invalid JSON")
+                continue
+            # A bare string is just the phone number
+            if isinstance(item, str) and not variables:
+                item = {self.phone_column: item}
+            if not isinstance(item, dict):
+                self.reject(number, text, "expected a JSON object")
+                continue
+            missing = [key for key in self.needed if key not in item]
+            if missing:
+                self.reject(number, text, f"missing {', '.join(missing)}")
+                continue
+            kept.append(number)
+            records.append([item[key] for key in self.needed])
+        return kept, records
+
+    def reject(self, line: int, value: Any, reason: str) -> None:
+        self.invalid += 1
+        if len(self.invalid_rows) < MAX_REPORTED_INVALID:
+            self.invalid_rows.append({"line": line, "value": str(value)[:200], "reason": reason})
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "campaign_id": self.campaign_id,
+            "lines": self.lines,
+            "accepted": self.accepted,
+            "invalid": self.invalid,
+            "invalid_rows": self.invalid_rows,
+            "duplicates": self.deduper.duplicates,
+            "recipient_count": self.start + self.accepted,
+        }
+
+
+async def upload_recipients(
+    upload: RecipientUpload,
+    chunks: AsyncIterator[bytes],
+    batch_lines: int,
+    max_line_bytes: int,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> Dict[str, Any]:
+    """Stream an upload into campaign_recipients and return its report.
+
+    The database work runs in worker threads, one batch at a time, while
+    the next batch is read from the request. At most two batches are held
+    in memory whatever the size of the upload. Nothing is stored unless
+    the whole upload succeeds.
+    """
+    loop = asyncio.get_running_loop()
+    db = session_factory()
+    step: Optional[asyncio.Future] = loop.create_task(asyncio.to_thread(upload.begin, db))
+    try:
+        # Shielded: a cancelled request waits for the running step below
+        # instead of closing the session under it
+        await asyncio.shield(step)
+        async for lines in iter_line_batches(chunks, batch_lines, max_line_bytes):
+            await asyncio.shield(step)
+            step = loop.create_task(asyncio.to_thread(upload.store, db, lines))
+        await asyncio.shield(step)
+        step = loop.create_task(asyncio.to_thread(upload.finish, db))
+        await asyncio.shield(step)
+    finally:
+        await asyncio.gather(step, return_exceptions=True)
+        # Rolls back unless finish committed
+        await asyncio.to_thread(db.close)
+    return upload.report()
@@ -0,0 +1,77 @@
+"""Sticky assignment of campaign recipients to a pool of sender numbers."""
+import hashlib
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+
+class SenderHealth:
+    """Circuit breaker for one business phone number.
+
+    After ``failure_threshold`` failures in a row the number is taken out of
+    rotation for ``cooldown`` seconds. When the cooldown is over it gets
+    traffic again; one more failure in a row takes it straight back out.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 60.0) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self._failures = 0
+        self._down_until = 0.0
+        self._trips = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def on_success(self) -> None:
+        self._failures = 0
+
+    def on_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._down_until = time.monotonic() + self.cooldown
+            self._failures = self.failure_threshold - 1
+            self._trips += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "consecutive_failures": self._failures,
+            "down_for": round(max(0.0, self._down_until - time.monotonic()), 1),
+            "trips": self._trips,
+        }
+
+
+class SenderPool:
+    """Pick the sender number for each recipient by rendezvous hashing.
+
+    Every (sender, recipient) pair gets a hash weight and the recipient goes
+    to the healthy sender with the highest weight. The choice depends only on
+    the recipient and the pool, so a recipient hears from the same number
+    in every campaign. Adding or removing a number only moves the recipients
+    that hashed to it. While a number is unhealthy its recipients go to
+    their second choice, and they move back once it recovers.
+    """
+
+    def __init__(self, senders: Sequence[str], health: Callable[[str], SenderHealth]) -> None:
+        # Deduplicate but keep the given order for stable reporting
+        self.senders: List[str] = list(dict.fromkeys(senders))
+        if not self.senders:
+            raise ValueError("A sender pool needs at least one phone number")
+        self.health = health
+
+    def __len__(self) -> int:
+        return len(self.senders)
+
+    @staticmethod
+    def weight(sender: str, recipient: str) -> int:
+        digits = "".join(ch for ch in recipient if ch.isdigit())
+        digest = hashlib.blake2b(f"{sender}:{digits}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def assign(self, recipient: str) -> str:
+        if len(self.senders) == 1:
+            return self.senders[0]
+        healthy = [sender for sender in self.senders if self.health(sender).healthy]
+        # With every number down, keep the sticky choice and let retries wait
+        return max(healthy or self.senders, key=lambda sender: self.weight(sender, recipient))
@@ -0,0 +1,134 @@
+"""Aggregate delivery/read status webhooks into per-campaign counters."""
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.services.campaign_recipients import RecipientStore
+from app.utils.whatsapp_utils import StatusEvent
+
+# A recipient's status only moves up this order. "sent" is already recorded
+# when the Graph API accepts the message, so it is not tracked here.
+STATUS_RANK = {"delivered": 1, "read": 2, "failed": 3}
+
+
+class StatusPipeline:
+    """Buffer status events in memory and write them in bulk.
+
+    Outbound campaign messages carry the campaign id in
+    ``biz_opaque_callback_data``, which Meta echoes back on every status;
+    statuses without it are not campaign messages and are ignored. The
+    pipeline keeps the highest status per message for ``flush_interval``
+    seconds and then applies them all to campaign_recipients, found by
+    message id, in one statement. Campaign counters are moved in the same
+    transaction by the recipients whose state actually changed, so a
+    webhook Meta redelivers is never counted twice.
+
+    A status can arrive before the checkpoint that stores its message id,
+    so one that matches no recipient is kept for up to
+    ``max_unmatched_flushes`` flushes before it is dropped.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 2.0,
+        max_pending: int = 10_000,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_unmatched_flushes: int = 30,
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self.recipient_store = RecipientStore(session_factory)
+        self.max_unmatched_flushes = max_unmatched_flushes
+        # message id -> (status, at, error, flushes it went unmatched)
+        self._statuses: Dict[str, Tuple[str, datetime, Optional[str], int]] = {}
+        self._unmatched_dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._received = 0
+        self._flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop(), name="status-pipeline")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+    def add(self, event: StatusEvent) -> None:
+        """Record a status event; it is written with the next flush."""
+        self._received += 1
+        if event.status == "failed" and event.errors:
+            logger.warning(f"Message {event.message_id} failed: {event.errors}")
+
+        if event.status not in STATUS_RANK or not event.callback_data:
+            return
+
+        at = datetime.utcfromtimestamp(int(event.timestamp)) if event.timestamp else datetime.utcnow()
+        error = None
+        if event.errors:
+            error = "; ".join(str(e.get("title") or e.get("message") or e.get("code")) for e in event.errors)
+        self._track(event.message_id, event.status, at, error, 0)
+        if len(self._statuses) >= self.max_pending and self._wakeup:
+            self._wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _track(
+        self, wamid: str, status: str, at: datetime, error: Optional[str], unmatched: int
+    ) -> None:
+        current = self._statuses.get(wamid)
+        if current is None or STATUS_RANK[status] >= STATUS_RANK[current[0]]:
+            self._statuses[wamid] = (status, at, error, unmatched)
+
+    async def flush(self) -> None:
+        if not self._statuses:
+            return
+        statuses, self._statuses = self._statuses, {}
+        updates = [(wamid, status, at, error) for wamid, (status, at, error, _) in statuses.items()]
+        try:
+            matched = await asyncio.to_thread(self.recipient_store.apply_statuses, updates)
+            self._flushes += 1
+        except Exception as e:
+            logger.error(f"Failed to write recipient statuses: {str(e)}")
+            for wamid, entry in statuses.items():
+                self._track(wamid, *entry)
+            return
+        for wamid, (status, at, error, unmatched) in statuses.items():
+            if wamid in matched:
+                continue
+            if unmatched + 1 >= self.max_unmatched_flushes:
+                self._unmatched_dropped += 1
+                continue
+            self._track(wamid, status, at, error, unmatched + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "received": self._received,
+            "flushes": self._flushes,
+            "pending_recipient_statuses": len(self._statuses),
+            "unmatched_statuses_dropped": self._unmatched_dropped,
+        }
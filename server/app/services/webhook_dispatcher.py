@@ -0,0 +1,124 @@
+"""Bounded in-process queue and worker pool for webhook events."""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+class WebhookDispatcher:
+    """Hand webhook payloads to a fixed pool of async workers.
+
+    The queue is bounded so that a slow downstream (OpenAI, Graph API, the
+    database) turns into fast 503 responses instead of unbounded memory growth.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        workers: int = 8,
+        queue_size: int = 1000,
+    ) -> None:
+        self.handler = handler
+        self.worker_count = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._started_at: Optional[float] = None
+        self._processed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._max_depth = 0
+        self._wait_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        """Create the queue and spawn the workers on the running loop."""
+        if self.running:
+            return
+        # The queue is created here rather than in __init__ so that it binds to
+        # the server's event loop on Python 3.9.
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._started_at = time.monotonic()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"webhook-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(
+            f"Webhook dispatcher started with {self.worker_count} workers "
+            f"(queue size {self.queue_size})"
+        )
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Give queued events a chance to finish, then cancel the workers."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Webhook dispatcher stopped with {self._queue.qsize()} events still queued"
+            )
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Webhook dispatcher stopped")
+
+    def submit(self, item: Any) -> bool:
+        """Enqueue an item without waiting. Returns False when the queue is full."""
+        if not self.running:
+            raise RuntimeError("Webhook dispatcher is not running")
+        try:
+            self._queue.put_nowait((time.monotonic(), item))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            return False
+        self._max_depth = max(self._max_depth, self._queue.qsize())
+        return True
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            enqueued_at, item = await self._queue.get()
+            started = time.monotonic()
+            self._wait_seconds += started - enqueued_at
+            self._busy += 1
+            try:
+                await self.handler(item)
+                self._processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed += 1
+                logger.error(f"Webhook worker {index} failed to handle event: {str(e)}")
+            finally:
+                self._busy -= 1
+                self._busy_seconds += time.monotonic() - started
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and worker utilisation counters."""
+        depth = self._queue.qsize() if self._queue else 0
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        handled = self._processed + self._failed
+        return {
+            "running": self.running,
+            "queue_depth": depth,
+            "queue_size": self.queue_size,
+            "max_queue_depth": self._max_depth,
+            "workers": self.worker_count,
+            "busy_workers": self._busy,
+            "utilisation": round(self._busy / self.worker_count, 3),
+            "average_utilisation": round(
+                self._busy_seconds / (uptime * self.worker_count), 3
+            ) if uptime else 0.0,
+            "processed": self._processed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "average_wait_ms": round(self._wait_seconds * 1000 / handled, 2) if handled else 0.0,
+        }
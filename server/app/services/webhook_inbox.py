@@ -0,0 +1,305 @@
+"""Durable, group-committed inbox between the webhook endpoint and the bot."""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.webhook_inbox import InboxEvent
+
+
+class WebhookInboxStore:
+    """Synchronous inbox queries. Every method runs in a single transaction."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self.session_factory = session_factory
+
+    def write_batch(self, payloads: List[Dict[str, Any]], done_ids: List[int]) -> List[int]:
+        """Insert new events and mark finished ones done in one commit."""
+        now = datetime.utcnow()
+        ids: List[int] = []
+        with self.session_factory() as db:
+            if payloads:
+                # New rows are leased to this process right away so that other
+                # replicas only replay them if this one dies.
+                ids = list(db.execute(
+                    insert(InboxEvent).returning(InboxEvent.id, sort_by_parameter_order=True),
+                    [
+                        {
+                            "payload": payload,
+                            "status": "pending",
+                            "attempts": 1,
+                            "received_at": now,
+                            "claimed_at": now,
+                        }
+                        for payload in payloads
+                    ],
+                ).scalars())
+            if done_ids:
+                db.execute(
+                    update(InboxEvent)
+                    .where(InboxEvent.id.in_(done_ids))
+                    .values(status="done", processed_at=now)
+                )
+            db.commit()
+        return ids
+
+    def claim_unfinished(
+        self, limit: int, lease_seconds: int, max_attempts: int
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """Lease pending events whose previous lease expired.
+
+        ``FOR UPDATE SKIP LOCKED`` lets several replicas sweep the inbox at the
+        same time without handing the same event to two of them.
+        """
+        now = datetime.utcnow()
+        expired = or_(
+            InboxEvent.claimed_at.is_(None),
+            InboxEvent.claimed_at < now - timedelta(seconds=lease_seconds),
+        )
+        with self.session_factory() as db:
+            db.execute(
+                update(InboxEvent)
+                .where(
+                    InboxEvent.status == "pending",
+                    InboxEvent.attempts >= max_attempts,
+                    expired,
+                )
+                .values(status="failed", processed_at=now)
+            )
+            claimable = (
+                select(InboxEvent.id)
+                .where(InboxEvent.status == "pending", expired)
+                .order_by(InboxEvent.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            rows = db.execute(
+                update(InboxEvent)
+                .where(InboxEvent.id.in_(claimable))
+                .values(claimed_at=now, attempts=InboxEvent.attempts + 1)
+                .returning(InboxEvent.id, InboxEvent.payload)
+            ).all()
+            db.commit()
+        return [(row.id, row.payload) for row in rows]
+
+    def renew(self, ids: List[int]) -> None:
+        """Extend the lease on events this process is still working on."""
+        if not ids:
+            return
+        with self.session_factory() as db:
+            db.execute(
+                update(InboxEvent)
+                .where(InboxEvent.id.in_(ids), InboxEvent.status == "pending")
+                .values(claimed_at=datetime.utcnow())
+            )
+            db.commit()
+
+    def purge_done(self, older_than: datetime) -> int:
+        """Delete processed events older than the retention window."""
+        with self.session_factory() as db:
+            result = db.execute(
+                delete(InboxEvent).where(
+                    InboxEvent.status == "done",
+                    InboxEvent.processed_at < older_than,
+                )
+            )
+            db.commit()
+        return result.rowcount
+
+
+class WebhookInbox:
+    """Persist webhook payloads before they are acknowledged.
+
+    ``append`` does not issue its own INSERT. Callers are parked on a future
+    while a single flusher writes everything that accumulated since the last
+    commit, so under load the per-event cost is a small slice of one round trip.
+    Completions are piggy-backed on the same commits.
+
+    Events handed to ``track`` keep their lease while they wait and while
+    they are handled: it is renewed every third of ``lease_seconds`` until
+    ``mark_done`` or ``release``. A slow conversation turn (LLM calls,
+    debounce, send retries) therefore never lets another replica replay an
+    event that is still in flight. Only a process that died stops renewing.
+    """
+
+    def __init__(
+        self,
+        store: Optional[WebhookInboxStore] = None,
+        batch_size: int = 500,
+        lease_seconds: int = 60,
+        max_attempts: int = 5,
+        retention_hours: int = 24,
+    ) -> None:
+        self.store = store or WebhookInboxStore()
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_hours = retention_hours
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._done: List[int] = []
+        self._in_flight: Set[int] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._replayer: Optional[asyncio.Task] = None
+        self._renewer: Optional[asyncio.Task] = None
+        self._replayed = 0
+        self._renewals = 0
+        self._commits = 0
+        self._appended = 0
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None
+
+    async def start(
+        self,
+        resubmit: Optional[Callable[[int, Dict[str, Any]], bool]] = None,
+        replay_interval: float = 15.0,
+    ) -> None:
+        """Start the flusher and, given ``resubmit``, the replay sweeper.
+
+        ``resubmit`` receives every unfinished event found in the inbox (first
+        right away, which covers a restart, then every ``replay_interval``) and
+        returns False when it cannot take more work.
+        """
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop(), name="webhook-inbox-flusher")
+        self._renewer = asyncio.create_task(self._renew_loop(), name="webhook-inbox-renewer")
+        if resubmit:
+            self._replayer = asyncio.create_task(
+                self._replay_loop(resubmit, replay_interval), name="webhook-inbox-replayer"
+            )
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        tasks = [t for t in (self._flusher, self._replayer, self._renewer) if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._flusher = None
+        self._replayer = None
+        self._renewer = None
+        # Write out anything that was accepted while shutting down
+        while (self._pending or self._done) and await self._flush():
+            pass
+
+    async def append(self, payload: Dict[str, Any]) -> int:
+        """Durably store a payload and return its inbox id."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((payload, future))
+        self._wakeup.set()
+        return await future
+
+    def track(self, inbox_id: int) -> None:
+        """Keep renewing an event's lease; it was handed to a worker of this process."""
+        self._in_flight.add(inbox_id)
+
+    def mark_done(self, inbox_id: int) -> None:
+        """Queue a completion; it is committed with the next batch."""
+        self._in_flight.discard(inbox_id)
+        self._done.append(inbox_id)
+        self._wakeup.set()
+
+    def release(self, inbox_id: int) -> None:
+        """Stop renewing a failed event, so it is replayed once its lease expires."""
+        self._in_flight.discard(inbox_id)
+
+    async def claim_unfinished(self, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        return await asyncio.to_thread(
+            self.store.claim_unfinished, limit, self.lease_seconds, self.max_attempts
+        )
+
+    async def purge(self) -> int:
+        cutoff = datetime.utcnow() - timedelta(hours=self.retention_hours)
+        return await asyncio.to_thread(self.store.purge_done, cutoff)
+
+    async def _replay_loop(
+        self, resubmit: Callable[[int, Dict[str, Any]], bool], interval: float
+    ) -> None:
+        while True:
+            try:
+                while True:
+                    events = await self.claim_unfinished(self.batch_size)
+                    accepted = 0
+                    for inbox_id, payload in events:
+                        if not resubmit(inbox_id, payload):
+                            # Rows we could not hand over keep their fresh lease
+                            # and are picked up again once it expires.
+                            break
+                        accepted += 1
+                    self._replayed += accepted
+                    if accepted:
+                        logger.info(f"Replayed {accepted} unfinished webhook events")
+                    if len(events) < self.batch_size or accepted < len(events):
+                        break
+                await self.purge()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook inbox replay failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    async def _renew_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            ids = list(self._in_flight)
+            if not ids:
+                continue
+            try:
+                await asyncio.to_thread(self.store.renew, ids)
+                self._renewals += 1
+            except Exception as e:
+                logger.error(f"Failed to renew webhook inbox leases: {str(e)}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending or self._done:
+                await self._flush()
+
+    async def _flush(self) -> bool:
+        batch = self._pending[: self.batch_size]
+        del self._pending[: self.batch_size]
+        done, self._done = self._done, []
+        try:
+            ids = await asyncio.to_thread(
+                self.store.write_batch, [payload for payload, _ in batch], done
+            )
+        except Exception as e:
+            logger.error(f"Failed to write webhook inbox batch: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            # Completions are not lost on failure; they go out with the next batch
+            self._done[:0] = done
+            await asyncio.sleep(1)
+            return False
+
+        self._commits += 1
+        self._appended += len(batch)
+        for (_, future), inbox_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(inbox_id)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending_writes": len(self._pending),
+            "pending_completions": len(self._done),
+            "in_flight": len(self._in_flight),
+            "lease_renewals": self._renewals,
+            "appended": self._appended,
+            "replayed": self._replayed,
+            "commits": self._commits,
+            "events_per_commit": round(self._appended / self._commits, 2) if self._commits else 0.0,
+        }
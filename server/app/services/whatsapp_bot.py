@@ -1,25 +1,62 @@
+import asyncio
 import json
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 import httpx
-import requests
 from fastapi import HTTPException
 from loguru import logger
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.graph_client import graph_client
+from app.core.template_registry import template_registry
+from app.db.session import SessionLocal
+from app.services.keyed_executor import KeyedExecutor, KeyQueueFullError
+from app.services.message_coalescer import MessageCoalescer
+from app.services.message_dedupe import MessageDeduplicator
 from app.services.openai_service import OpenAIService
+from app.services.status_pipeline import StatusPipeline
+from app.services.whatsapp_service import pair_rate_scheduler
+from app.utils.phone_numbers import normalize_phone
 from app.utils.whatsapp_utils import (
-    extract_whatsapp_message_data,
-    is_valid_whatsapp_message,
+    MessageEvent,
+    StatusEvent,
+    WebhookEvent,
+    iter_webhook_events,
     log_http_response,
     process_text_for_whatsapp,
 )
 
 
 class WhatsAppBot:
-    def __init__(self) -> None:
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        # Turns outlive the webhook request and run side by side, so each
+        # opens a session of its own
+        self.session_factory = session_factory
         self.openai = OpenAIService()
+        self.dedupe = MessageDeduplicator(
+            capacity=settings.MESSAGE_DEDUPE_CACHE_SIZE,
+            ttl_seconds=settings.MESSAGE_DEDUPE_TTL_SECONDS,
+            lease_seconds=settings.MESSAGE_DEDUPE_LEASE_SECONDS,
+            retention_hours=settings.MESSAGE_DEDUPE_RETENTION_HOURS,
+        ) if settings.MESSAGE_DEDUPE_ENABLED else None
+        # Turns of one conversation run in order; different users in parallel
+        self.conversations = KeyedExecutor(
+            max_pending_per_key=settings.CONVERSATION_MAX_PENDING,
+            max_concurrency=settings.CONVERSATION_MAX_CONCURRENCY,
+        )
+        # Bursts of short messages from one user become a single LLM turn
+        self.coalescer = MessageCoalescer(
+            self.conversations,
+            self.handle_conversation_turn,
+            debounce_seconds=settings.MESSAGE_DEBOUNCE_SECONDS,
+            max_wait_seconds=settings.MESSAGE_DEBOUNCE_MAX_WAIT_SECONDS,
+            max_pending=settings.CONVERSATION_MAX_PENDING,
+        )
+        self.status_pipeline = StatusPipeline(
+            flush_interval=settings.STATUS_FLUSH_INTERVAL,
+            max_pending=settings.STATUS_MAX_PENDING,
+        )
         self.base_url = f"https://graph.facebook.com/{settings.VERSION}"
         self.phone_number_id = settings.PHONE_NUMBER_ID
         self.whatsapp_token = settings.WHATSAPP_TOKEN
@@ -28,19 +65,92 @@ class WhatsAppBot:
             "Content-Type": "application/json",
         }
 
-    async def handle_message(self, body: Dict[Any, Any], db: Session) -> Dict[str, Any]:
-        """Handle incoming WhatsApp messages with AI responses"""
+    async def handle_message(
+        self,
+        body: Dict[Any, Any],
+        events: Optional[List[WebhookEvent]] = None,
+    ) -> Dict[str, Any]:
+        """Handle every message and status in a webhook payload concurrently
+
+        ``events`` may carry the already-decoded events of ``body`` so the
+        payload is not walked a second time.
+        """
         try:
-            if not is_valid_whatsapp_message(body):
+            if not body.get("object"):
                 raise ValueError("Invalid WhatsApp message format")
 
-            # Extract message data
-            message_data = extract_whatsapp_message_data(body)
+            if events is None:
+                events = list(iter_webhook_events(body))
+            if not events:
+                return {
+                    "status": "ignored",
+                    "message": "No messages or statuses in payload",
+                }
+
+            # One delivery can carry dozens of events; statuses run side by
+            # side but never more than the configured fan-out at once.
+            semaphore = asyncio.Semaphore(settings.WEBHOOK_EVENT_FANOUT)
+
+            async def bounded(job: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+                async with semaphore:
+                    return await job
+
+            def schedule(event: WebhookEvent) -> Awaitable[Dict[str, Any]]:
+                if not isinstance(event, MessageEvent):
+                    return bounded(self.handle_status_event(event))
+                # Messages are buffered per user right here, in payload order;
+                # the coalescer turns them into ordered conversation turns.
+                try:
+                    return self.coalescer.add(event)
+                except KeyQueueFullError as e:
+                    failed = asyncio.get_running_loop().create_future()
+                    failed.set_exception(e)
+                    return failed
+
+            results = await asyncio.gather(
+                *[schedule(event) for event in events], return_exceptions=True
+            )
 
+            errors = [r for r in results if isinstance(r, BaseException)]
+            for error in errors:
+                logger.error(f"Error handling webhook event: {str(error)}")
+            if errors:
+                # Handled events are protected by dedupe when Meta redelivers
+                raise errors[0]
+
+            return {
+                "status": "success",
+                "message": f"Processed {len(events)} webhook events",
+                "results": results,
+            }
+
+        except ValueError as e:
+            logger.error(f"Validation error: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error handling message: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def handle_conversation_turn(self, events: List[MessageEvent]) -> Dict[str, Any]:
+        """Reply once to one or more consecutive messages from the same user"""
+        # Meta redelivers webhooks; only the first delivery gets a reply
+        if self.dedupe:
+            events = [event for event in events if await self.dedupe.claim(event.message_id)]
+            if not events:
+                return {
+                    "status": "duplicate",
+                    "message": "Message already processed",
+                }
+        message_ids = [event.message_id for event in events]
+
+        db = self.session_factory()
+        try:
             # Generate AI response with database context
             response = await self.openai.generate_response(
-                message=message_data["message"],
-                user_id=message_data["wa_id"],
+                message="\n".join(event.text for event in events if event.text),
+                user_id=events[0].wa_id,
                 db=db,
                 context="support",
             )
@@ -50,23 +160,37 @@ class WhatsAppBot:
 
             # Send the response as a regular text message
             await self.send_message(
-                recipient=message_data["wa_id"],
+                recipient=events[0].wa_id,
                 message=formatted_response,
                 use_template=False,
             )
+        except Exception:
+            if self.dedupe:
+                for message_id in message_ids:
+                    await self.dedupe.release(message_id)
+            raise
+        finally:
+            db.close()
+
+        if self.dedupe:
+            for message_id in message_ids:
+                await self.dedupe.complete(message_id)
+
+        return {
+            "status": "success",
+            "message": "Response sent successfully",
+            "recipient": events[-1].name,
+            "message_ids": message_ids,
+        }
 
-            return {
-                "status": "success",
-                "message": "Response sent successfully",
-                "recipient": message_data["name"],
-            }
-
-        except ValueError as e:
-            logger.error(f"Validation error: {str(e)}")
-            raise HTTPException(status_code=400, detail=str(e))
-        except Exception as e:
-            logger.error(f"Error handling message: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+    async def handle_status_event(self, event: StatusEvent) -> Dict[str, Any]:
+        """Feed a delivery status update into the campaign counters"""
+        self.status_pipeline.add(event)
+        return {
+            "status": "received",
+            "message_id": event.message_id,
+            "delivery_status": event.status,
+        }
 
     async def send_message(
         self,
@@ -77,9 +201,10 @@ class WhatsAppBot:
     ) -> None:
         """Send message to WhatsApp recipient."""
         try:
-            recipient = recipient.strip().replace(" ", "")
-            if not recipient.startswith("+"):
-                recipient = f"+{recipient}"
+            formatted = normalize_phone(recipient, settings.PHONE_DEFAULT_COUNTRY_CODE)
+            if formatted is None:
+                raise HTTPException(status_code=400, detail="Invalid phone number %s" % recipient)
+            recipient = formatted
 
             url = f"{self.base_url}/{self.phone_number_id}/messages"
             headers = {
@@ -88,13 +213,13 @@ class WhatsAppBot:
             }
 
             if use_template:
-                templates = await self.get_templates()
-                template = templates.get(template_name)
+                approved = await template_registry.get(template_name)
 
-                if not template:
+                if not approved:
                     raise HTTPException(
                         status_code=400, detail="Template %s not found" % template_name
                     )
+                template = self.describe_template(approved)
 
                 data = {
                     "messaging_product": "whatsapp",
@@ -137,15 +262,23 @@ class WhatsAppBot:
                 }
                 logger.debug("Sending text message: %s", json.dumps(data))
 
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
+            # Quick consecutive replies to one user would trip Meta's pair rate
+            await pair_rate_scheduler.wait(recipient)
+            async with graph_client.session() as client:
+                response = await client.post(
+                    url,
+                    headers=headers,
+                    json=data,
+                    timeout=graph_client.timeout("messages"),
+                )
+                response.raise_for_status()
 
             log_http_response(response)
             logger.info("Message sent successfully to %s", recipient)
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error("Error sending message: %s", str(e))
-            if hasattr(e.response, "text"):
+            if isinstance(e, httpx.HTTPStatusError):
                 logger.error("Response: %s", e.response.text)
             raise HTTPException(
                 status_code=500, detail="Failed to send WhatsApp message: %s" % str(e)
@@ -180,12 +313,12 @@ class WhatsAppBot:
         try:
             params = {"messaging_product": "whatsapp", "message_id": message_id}
 
-            async with httpx.AsyncClient() as client:
+            async with graph_client.session() as client:
                 response = await client.delete(
                     f"{self.base_url}/{self.phone_number_id}/messages",
                     headers=self.headers,
                     params=params,
-                    timeout=10.0,
+                    timeout=graph_client.timeout("messages"),
                 )
                 response.raise_for_status()
 
@@ -204,12 +337,12 @@ class WhatsAppBot:
                 "type": "contacts",
             }
 
-            async with httpx.AsyncClient() as client:
+            async with graph_client.session() as client:
                 response = await client.post(
                     f"{self.base_url}/{self.phone_number_id}/messages",
                     headers=self.headers,
                     json=data,
-                    timeout=10.0,
+                    timeout=graph_client.timeout("messages"),
                 )
                 response.raise_for_status()
 
@@ -218,84 +351,56 @@ class WhatsAppBot:
             if hasattr(e, "response"):
                 logger.error("Response: %s", e.response.text)
 
+    @staticmethod
+    def describe_template(template: Dict[str, Any]) -> Dict[str, Any]:
+        """Reshape a Graph API template for the frontend and send_message"""
+        components = template.get("components", [])
+        parameters = []
+        variables_count = 0
+
+        # Process each component
+        for component in components:
+            comp_type = component.get("type", "").upper()
+
+            # Count actual parameters in the component
+            if "parameters" in component:
+                param_count = len(component.get("parameters", []))
+                variables_count += param_count
+
+                if param_count > 0:
+                    parameters.append({
+                        "type": comp_type,
+                        "format": component.get("format", "TEXT"),
+                        "text": component.get("text", ""),
+                        "example": component.get("example", {}),
+                        "param_count": param_count
+                    })
+
+        return {
+            "name": template.get("name"),
+            "description": template.get("category", "").title(),
+            "category": template.get("category"),
+            "parameters": parameters,
+            "requiresMessage": variables_count > 0,
+            "language": template.get("language"),
+            "components": components,
+            "variables_count": variables_count,
+        }
+
     async def get_templates(self) -> Dict[str, Any]:
-        """Fetch templates from WhatsApp Business API"""
+        """Approved templates from the shared template registry, keyed by name"""
         try:
-            url = f"{self.base_url}/{settings.BUSINESS_ID}/message_templates"
-
-            headers = {
-                "Authorization": f"Bearer {self.whatsapp_token}",
-                "Content-Type": "application/json",
-            }
-
-            # Add required fields according to the API docs
-            params = {
-                "limit": 1000,
-                "fields": "name,status,language,category,components",
+            templates = await template_registry.approved()
+            processed_templates = {
+                template.get("name"): self.describe_template(template)
+                for template in templates
             }
-
-            logger.debug("Fetching templates from URL: %s", url)
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-
-            response_data = response.json()
-            logger.debug("API Response: %s", json.dumps(response_data))
-
-            templates = response_data.get("data", [])
-            logger.debug("Fetched %d templates", len(templates))
-
-            # Process templates to match frontend format
-            processed_templates = {}
-            for template in templates:
-                status = template.get("status")
-                name = template.get("name")
-                logger.debug("Processing template: %s with status: %s", name, status)
-
-                if status == "APPROVED":
-                    components = template.get("components", [])
-                    parameters = []
-                    variables_count = 0
-
-                    # Process each component
-                    for component in components:
-                        comp_type = component.get("type", "").upper()
-                        
-                        # Count actual parameters in the component
-                        if "parameters" in component:
-                            param_count = len(component.get("parameters", []))
-                            variables_count += param_count
-                            
-                            if param_count > 0:
-                                parameters.append({
-                                    "type": comp_type,
-                                    "format": component.get("format", "TEXT"),
-                                    "text": component.get("text", ""),
-                                    "example": component.get("example", {}),
-                                    "param_count": param_count
-                                })
-
-                    processed_templates[name] = {
-                        "name": name,
-                        "description": template.get("category", "").title(),
-                        "category": template.get("category"),
-                        "parameters": parameters,
-                        "requiresMessage": variables_count > 0,
-                        "language": template.get("language"),
-                        "components": components,
-                        "variables_count": variables_count,
-                    }
-
-                    logger.debug(
-                        "Successfully processed template: %s with %d variables",
-                        name, variables_count
-                    )
-
-            logger.info("Total processed templates: %d", len(processed_templates))
+            logger.debug("Total processed templates: %d", len(processed_templates))
             return processed_templates
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error("Error fetching templates: %s", str(e))
-            if hasattr(e.response, "text"):
+            if isinstance(e, httpx.HTTPStatusError):
                 logger.error("Response: %s", e.response.text)
             raise HTTPException(
                 status_code=500,
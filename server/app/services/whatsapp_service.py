@@ -5,7 +5,30 @@ import httpx
 from loguru import logger
 
 from app.core.config import settings
-from app.utils.error_handler import WhatsAppError
+from app.core.graph_client import graph_client
+from app.core.template_registry import template_registry
+from app.utils.error_handler import (
+    PAIR_RATE_ERROR_CODE,
+    THROTTLING_ERROR_CODES,
+    PairRateDeferredError,
+    WhatsAppError,
+    WhatsAppPairRateError,
+    WhatsAppThrottledError,
+)
+from app.utils.payload_compiler import CompiledPayload, build_template_payload
+from app.utils.phone_numbers import normalize_phone
+from app.utils.rate_limiter import PairRateScheduler
+
+# Process-wide: every outbound path must see every send to a recipient
+pair_rate_scheduler = PairRateScheduler(interval=settings.WHATSAPP_PAIR_RATE_INTERVAL)
+
+
+def format_recipient(phone_number: str) -> str:
+    """The recipient in canonical ``+digits`` form, as every send uses it."""
+    formatted = normalize_phone(phone_number, settings.PHONE_DEFAULT_COUNTRY_CODE)
+    if formatted is None:
+        raise WhatsAppError(message=f"Invalid phone number: {phone_number}", status_code=400)
+    return formatted
 
 
 class WhatsAppService:
@@ -17,45 +40,81 @@ class WhatsAppService:
         self.phone_number_id = settings.PHONE_NUMBER_ID
         self.version = settings.VERSION
         self.business_id = settings.BUSINESS_ID
-        self._setup_client()
-
-    def _setup_client(self):
-        """Set up the HTTP client with proper configuration."""
-        self.client = httpx.AsyncClient(
-            base_url=self.api_url,
-            headers={
-                "Authorization": f"Bearer {self.token}",
-                "Content-Type": "application/json",
-            },
-            timeout=30.0
-        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The process-wide Graph API client; relative URLs include the version."""
+        return graph_client.client
 
     async def close(self):
-        """Properly close the client connection."""
-        if self.client:
-            await self.client.aclose()
+        """Kept for callers; the shared pool is closed on app shutdown."""
+
+    async def _send_message(
+        self,
+        payload: Dict[str, Any],
+        max_pair_wait: Optional[float] = None,
+        phone_number_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Send message to WhatsApp API.
+
+        Sends to a recipient messaged less than the pair-rate interval ago are
+        delayed. If the delay would exceed ``max_pair_wait``, nothing is sent
+        and ``PairRateDeferredError`` is raised instead. ``phone_number_id`` picks
+        the sending business number; it defaults to the configured one.
+        """
+        logger.opt(lazy=True).debug("Payload: {}", lambda: json.dumps(payload, indent=2))
+        return await self._post_message(
+            payload.get("to", ""), {"json": payload}, max_pair_wait, phone_number_id
+        )
+
+    async def _post_message(
+        self,
+        recipient: str,
+        body: Dict[str, Any],
+        max_pair_wait: Optional[float],
+        phone_number_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """POST a message body (``json=`` or ``content=`` for httpx) to the messages edge."""
+        if not await pair_rate_scheduler.wait(recipient, max_pair_wait):
+            raise PairRateDeferredError(
+                message=f"Pair rate limit: {recipient} was messaged too recently",
+                retry_after=pair_rate_scheduler.delay_for(recipient)
+            )
 
-    async def _send_message(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """Send message to WhatsApp API."""
         try:
-            url = f"/{self.phone_number_id}/messages"
+            url = f"/{phone_number_id or self.phone_number_id}/messages"
 
-            logger.debug("WhatsApp API Request:")
-            logger.debug(f"URL: {self.api_url}{url}")
-            logger.debug(f"Payload: {json.dumps(payload, indent=2)}")
+            logger.debug(f"WhatsApp API Request: {self.api_url}{url}")
 
-            response = await self.client.post(url, json=payload)
+            response = await self.client.post(
+                url, timeout=graph_client.timeout("messages"), **body
+            )
 
             logger.debug(f"Response Status: {response.status_code}")
-            logger.debug(f"Response Body: {response.text}")
+            logger.opt(lazy=True).debug("Response Body: {}", lambda: response.text)
 
             if not response.is_success:
+                error_code = None
                 try:
-                    error_data = response.json()
-                    error_msg = error_data.get('error', {}).get('message', response.text)
+                    error_data = response.json().get('error', {})
+                    error_msg = error_data.get('message', response.text)
+                    error_code = error_data.get('code')
                 except json.JSONDecodeError:
                     error_msg = response.text
 
+                if error_code == PAIR_RATE_ERROR_CODE:
+                    pair_rate_scheduler.penalize(recipient)
+                    raise WhatsAppPairRateError(
+                        message=f"WhatsApp API pair rate limit: {error_msg}",
+                        error_code=error_code
+                    ) from None
+
+                if error_code in THROTTLING_ERROR_CODES or response.status_code == 429:
+                    raise WhatsAppThrottledError(
+                        message=f"WhatsApp API rate limit: {error_msg}",
+                        error_code=error_code
+                    ) from None
+
                 raise WhatsAppError(
                     message=f"WhatsApp API error: {error_msg}",
                     status_code=response.status_code
@@ -63,8 +122,12 @@ class WhatsAppService:
 
             return response.json()
 
+        except WhatsAppError:
+            raise
+        except httpx.TimeoutException as e:
+            raise WhatsAppError(message=f"Timeout: {str(e)}", status_code=504) from e
         except httpx.HTTPError as e:
-            raise WhatsAppError(message=f"HTTP error: {str(e)}", status_code=500) from e
+            raise WhatsAppError(message=f"HTTP error: {str(e)}", status_code=502) from e
         except Exception as e:
             raise WhatsAppError(
                 message=f"Unexpected error: {str(e)}",
@@ -75,76 +138,32 @@ class WhatsAppService:
         self,
         phone_number: str,
         template_name: str,
-        template_data: Optional[dict] = None
+        template_data: Optional[dict] = None,
+        callback_data: Optional[str] = None,
+        max_pair_wait: Optional[float] = None,
+        phone_number_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Send a template message."""
+        """Send a template message.
+
+        ``callback_data`` is sent as ``biz_opaque_callback_data`` and echoed
+        back by Meta on every status webhook for the message.
+        ``max_pair_wait`` and ``phone_number_id`` are passed on to
+        ``_send_message``.
+        """
         try:
-            # Format phone number to include country code if not present
-            formatted_phone = (
-                phone_number if phone_number.startswith("+") 
-                else f"+{phone_number}"
-            )
+            formatted_phone = format_recipient(phone_number)
 
-            # Base payload structure
-            payload = {
-                "messaging_product": "whatsapp",
-                "to": formatted_phone,
-                "type": "template",
-                "template": {
-                    "name": template_name,
-                    "language": {
-                        "code": template_data.get("language", {}).get("code", "en_US")
-                    },
-                    "components": []
-                }
-            }
+            payload = build_template_payload(
+                formatted_phone, template_name, template_data, callback_data
+            )
 
-            # Process components
-            if template_data and template_data.get("components"):
-                components = []
-                
-                # Add header if present
-                header_component = next(
-                    (c for c in template_data["components"] if c.get("type", "").upper() == "HEADER"),
-                    None
-                )
-                if header_component and header_component.get("parameters"):
-                    components.append({
-                        "type": "header",
-                        "parameters": header_component["parameters"]
-                    })
-
-                # Collect all body parameters into a single body component
-                body_parameters = []
-                for component in template_data["components"]:
-                    if component.get("type", "").upper() == "BODY" and component.get("parameters"):
-                        body_parameters.extend(component["parameters"])
-
-                if body_parameters:
-                    components.append({
-                        "type": "body",
-                        "parameters": body_parameters
-                    })
-
-                # Add buttons if present
-                button_component = next(
-                    (c for c in template_data["components"] if c.get("type", "").upper() == "BUTTONS"),
-                    None
-                )
-                if button_component:
-                    components.append({
-                        "type": "button",
-                        "sub_type": "url",
-                        "parameters": button_component.get("parameters", [])
-                    })
-
-                payload["template"]["components"] = components
-
-            logger.debug(f"Template message payload:\n{json.dumps(payload, indent=2)}")
-            
-            response = await self._send_message(payload)
+            response = await self._send_message(
+                payload, max_pair_wait=max_pair_wait, phone_number_id=phone_number_id
+            )
             return response
 
+        except WhatsAppError:
+            raise
         except Exception as e:
             logger.error(f"Error sending template message: {str(e)}")
             raise WhatsAppError(
@@ -152,12 +171,37 @@ class WhatsAppService:
                 status_code=500
             )
 
+    async def send_compiled_template(
+        self,
+        phone_number: str,
+        compiled: CompiledPayload,
+        variables: Optional[Dict[str, Any]] = None,
+        max_pair_wait: Optional[float] = None,
+        phone_number_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Send a template message precompiled for a campaign.
+
+        Same request as ``send_template_message``, but only the recipient and
+        ``variables`` are serialised per call.
+        """
+        formatted_phone = format_recipient(phone_number)
+        try:
+            content = compiled.render(formatted_phone, variables)
+        except KeyError as e:
+            raise WhatsAppError(
+                message=f"No value for template variable {e.args[0]} for {formatted_phone}",
+                status_code=400
+            ) from None
+        return await self._post_message(
+            formatted_phone, {"content": content}, max_pair_wait, phone_number_id
+        )
+
     async def send_text_message(self, phone_number: str, message: str) -> Dict[str, Any]:
         """Send a text message."""
         try:
             payload = {
                 "messaging_product": "whatsapp",
-                "to": phone_number,
+                "to": format_recipient(phone_number),
                 "type": "text",
                 "text": {"body": message}
             }
@@ -165,6 +209,8 @@ class WhatsAppService:
             logger.debug(f"Text message payload:\n{json.dumps(payload, indent=2)}")
             return await self._send_message(payload)
 
+        except WhatsAppError:
+            raise
         except Exception as e:
             raise WhatsAppError(
                 message=f"Failed to send text message: {str(e)}",
@@ -181,7 +227,7 @@ class WhatsAppService:
                 "Content-Type": "application/json"
             }
             
-            async with httpx.AsyncClient() as client:
+            async with graph_client.session() as client:
                 response = await client.get(url, headers=headers)
                 response.raise_for_status()
                 return True
@@ -235,34 +281,22 @@ class WhatsAppService:
                 "button_clicks": []
             }
 
-    async def get_template_content(self, template_name: str) -> Dict[str, Any]:
-        """Fetch template content from WhatsApp API."""
+    async def get_template_content(
+        self, template_name: str, language: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Template content from the shared template registry."""
         try:
-            # The correct endpoint for fetching message templates
-            url = f"/{self.phone_number_id}/message_templates"
-            response = await self.client.get(url)
-            
-            if not response.is_success:
-                logger.error(f"Failed to get template content: {response.text}")
-                return None
+            template = await template_registry.get(template_name, language, approved_only=False)
 
-            data = response.json()
-            # Extract the specific template from the response
-            templates = data.get("data", [])
-            template = next((t for t in templates if t.get("name") == template_name), None)
-            
             if not template:
-                logger.error(f"Template {template_name} not found in response")
+                logger.error(f"Template {template_name} not found")
                 return None
 
-            # Extract the components in the correct language (default to first available)
-            components = template.get("components", [])
-            
             return {
                 "name": template.get("name"),
                 "language": template.get("language"),
                 "category": template.get("category"),
-                "components": components,
+                "components": template.get("components", []),
                 "status": template.get("status")
             }
 
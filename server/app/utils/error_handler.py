@@ -11,6 +11,35 @@ class WhatsAppError(Exception):
         self.details = details or {}
         super().__init__(self.message)
 
+
+# Graph API error codes that mean "slow down" rather than "this send failed":
+# 4 app-level rate limit, 80007 WABA rate limit, 130429 throughput reached.
+THROTTLING_ERROR_CODES = {4, 80007, 130429}
+
+
+class WhatsAppThrottledError(WhatsAppError):
+    """Meta rejected a request because a rate limit was hit; retry it later."""
+
+    def __init__(self, message: str, error_code: int, details: Dict[str, Any] = None):
+        self.error_code = error_code
+        super().__init__(message, status_code=429, details=details)
+
+
+# Too many messages to one user in a short window (per business/user pair)
+PAIR_RATE_ERROR_CODE = 131056
+
+
+class WhatsAppPairRateError(WhatsAppThrottledError):
+    """The recipient was messaged too recently; only this recipient must wait."""
+
+
+class PairRateDeferredError(WhatsAppError):
+    """A send was not attempted because the recipient's pair-rate slot is too far off."""
+
+    def __init__(self, message: str, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(message, status_code=429)
+
 def handle_whatsapp_error(error: Exception) -> None:
     """Centralized error handler for WhatsApp operations"""
     if isinstance(error, HTTPException):
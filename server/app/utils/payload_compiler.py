@@ -0,0 +1,144 @@
+"""Template message payloads for the Graph API, built once per campaign.
+
+Every message of a campaign carries the same template, language and
+components. Only the recipient and any per-recipient variables change.
+``compile_template_payload`` serialises the payload once, with marker
+strings in those slots, and cuts the JSON into literal byte segments around
+them. ``CompiledPayload.render`` then only escapes the slot values and joins
+bytes: there is no dict to build and no whole-payload ``json.dumps`` per
+recipient.
+
+Variables are parameter values written as ``{{name}}``, where the name
+starts with a letter or underscore, e.g. ``{"type": "text", "text":
+"{{first_name}}"}``. Meta's own numbered placeholders such as ``{{1}}`` are
+left alone. Only campaigns whose recipients carry variables (list and upload
+campaigns) compile with ``with_variables``; for the others ``{{first_name}}``
+is plain text and sent as written.
+"""
+import json
+import re
+from json.encoder import encode_basestring
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# Cannot occur in a recipient number, so it is safe to search for
+_TO_MARKER = "\x00to\x00"
+_TO_SLOT = ""
+_TO_PATTERN = re.compile(re.escape(encode_basestring(_TO_MARKER)))
+_SLOT_PATTERN = re.compile(_TO_PATTERN.pattern + r'|"\{\{([A-Za-z_][\w.]*)\}\}"')
+
+
+def build_template_payload(
+    to: str,
+    template_name: str,
+    template_data: Optional[Dict[str, Any]] = None,
+    callback_data: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build the ``messages`` request body for a template message."""
+    template_data = template_data or {}
+    payload = {
+        "messaging_product": "whatsapp",
+        "to": to,
+        "type": "template",
+        "template": {
+            "name": template_name,
+            "language": {
+                "code": template_data.get("language", {}).get("code", "en_US")
+            },
+            "components": []
+        }
+    }
+
+    if callback_data:
+        payload["biz_opaque_callback_data"] = callback_data
+
+    if template_data.get("components"):
+        components = []
+
+        # Add header if present
+        header_component = next(
+            (c for c in template_data["components"] if c.get("type", "").upper() == "HEADER"),
+            None
+        )
+        if header_component and header_component.get("parameters"):
+            components.append({
+                "type": "header",
+                "parameters": header_component["parameters"]
+            })
+
+        # Collect all body parameters into a single body component
+        body_parameters = []
+        for component in template_data["components"]:
+            if component.get("type", "").upper() == "BODY" and component.get("parameters"):
+                body_parameters.extend(component["parameters"])
+
+        if body_parameters:
+            components.append({
+                "type": "body",
+                "parameters": body_parameters
+            })
+
+        # Add buttons if present
+        button_component = next(
+            (c for c in template_data["components"] if c.get("type", "").upper() == "BUTTONS"),
+            None
+        )
+        if button_component:
+            components.append({
+                "type": "button",
+                "sub_type": "url",
+                "parameters": button_component.get("parameters", [])
+            })
+
+        payload["template"]["components"] = components
+
+    return payload
+
+
+class CompiledPayload:
+    """A serialised template payload with slots for the recipient and variables."""
+
+    def __init__(self, literals: List[bytes], slots: List[str]) -> None:
+        # literals[i] comes before slots[i]; there is one more literal than slots
+        self._literals = literals
+        self._slots = slots
+        self._pairs: List[Tuple[str, bytes]] = list(zip(slots, literals[1:]))
+        self.variables = tuple(sorted({slot for slot in slots if slot != _TO_SLOT}))
+
+    def render(self, to: str, variables: Optional[Mapping[str, Any]] = None) -> bytes:
+        """Request body for one recipient.
+
+        Raises KeyError when a variable of the template has no value.
+        """
+        variables = variables or {}
+        parts = [self._literals[0]]
+        for slot, literal in self._pairs:
+            value = to if slot == _TO_SLOT else variables[slot]
+            parts.append(encode_basestring(str(value)).encode())
+            parts.append(literal)
+        return b"".join(parts)
+
+
+def compile_template_payload(
+    template_name: str,
+    template_data: Optional[Dict[str, Any]] = None,
+    callback_data: Optional[str] = None,
+    with_variables: bool = False,
+) -> CompiledPayload:
+    """Serialise the invariant part of a template message once.
+
+    With ``with_variables``, ``{{name}}`` parameters become slots filled per
+    recipient; without it only the recipient changes.
+    """
+    payload = build_template_payload(_TO_MARKER, template_name, template_data, callback_data)
+    text = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+    literals: List[bytes] = []
+    slots: List[str] = []
+    position = 0
+    pattern = _SLOT_PATTERN if with_variables else _TO_PATTERN
+    for match in pattern.finditer(text):
+        literals.append(text[position:match.start()].encode())
+        slots.append(match.group(1) if match.lastindex else _TO_SLOT)
+        position = match.end()
+    literals.append(text[position:].encode())
+    return CompiledPayload(literals, slots)
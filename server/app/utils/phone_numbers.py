@@ -0,0 +1,207 @@
+"""Phone number normalisation to E.164, one number at a time or in NumPy batches.
+
+Numbers are reduced to their digits, country code included, and written
+canonically as ``+`` followed by the digits. The rules:
+
+- spaces, tabs, dashes, dots, slashes and parentheses are ignored; any other
+  character, or more than ``MAX_LENGTH`` characters, makes the number invalid
+- a leading ``+`` or ``00`` means the country code is already there
+- otherwise, when a default country code is given, a leading trunk ``0`` is
+  replaced by it, and a number of at most ``NATIONAL_MAX_DIGITS`` digits gets
+  it in front
+- otherwise the digits are taken to include the country code, as in the
+  ``wa_id`` of WhatsApp webhooks
+- a valid number has ``MIN_DIGITS`` to ``MAX_DIGITS`` digits and does not
+  start with 0
+
+``normalize_phone`` and ``parse_phones`` apply exactly the same rules.
+"""
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+MIN_DIGITS = 8
+MAX_DIGITS = 15
+NATIONAL_MAX_DIGITS = 10
+
+# Longest value, separators included, that is parsed at all
+MAX_LENGTH = 32
+
+_SEPARATORS = " \t\r-./()"
+_STRIP_SEPARATORS = str.maketrans("", "", _SEPARATORS)
+_POWERS = 10 ** np.arange(MAX_DIGITS + 1, dtype=np.int64)
+
+# Character code -> kind, for the codes of the whole batch at once
+_PAD, _DIGIT, _PLUS, _SEPARATOR, _OTHER = range(5)
+_OTHER_CODE = 128
+_KINDS = np.full(_OTHER_CODE + 1, _OTHER, dtype=np.uint8)
+_KINDS[0] = _PAD
+_KINDS[ord("0"):ord("9") + 1] = _DIGIT
+_KINDS[ord("+")] = _PLUS
+_KINDS[[ord(c) for c in _SEPARATORS]] = _SEPARATOR
+
+
+def _country_code(default_country_code: Optional[str]) -> str:
+    code = (default_country_code or "").strip().lstrip("+")
+    if code and not (code.isascii() and code.isdigit() and code[0] != "0" and len(code) <= 3):
+        raise ValueError(f"Invalid default country code {default_country_code}")
+    return code
+
+
+def normalize_phone(value: Any, default_country_code: Optional[str] = None) -> Optional[str]:
+    """The number in canonical ``+digits`` form, or None when it is not valid."""
+    country_code = _country_code(default_country_code)
+    text = _text(value)
+    if len(text) > MAX_LENGTH:
+        return None
+    text = text.translate(_STRIP_SEPARATORS)
+    international = text.startswith("+")
+    digits = text[1:] if international else text
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    if not international and digits.startswith("00"):
+        digits = digits[2:]
+    elif not international and country_code:
+        if digits.startswith("0"):
+            digits = country_code + digits[1:]
+        elif len(digits) <= NATIONAL_MAX_DIGITS:
+            digits = country_code + digits
+    if not MIN_DIGITS <= len(digits) <= MAX_DIGITS or digits[0] == "0":
+        return None
+    return f"+{digits}"
+
+
+class PhoneBatch(NamedTuple):
+    """Parsed numbers of a batch, in input order."""
+
+    # Digits with the country code as an integer; 0 where not valid
+    numbers: np.ndarray
+    valid: np.ndarray
+
+    def e164(self, mask: Optional[np.ndarray] = None) -> List[str]:
+        """Canonical ``+digits`` strings of the numbers selected by ``mask``."""
+        numbers = self.numbers if mask is None else self.numbers[mask]
+        return [f"+{number}" if number else "" for number in numbers.tolist()]
+
+
+def _text(value: Any) -> str:
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    # Numbers typed into spreadsheets come back as floats
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def parse_phones(values: Sequence[Any], default_country_code: Optional[str] = None) -> PhoneBatch:
+    """Parse a batch of phone numbers with array operations.
+
+    The batch becomes one fixed-width character matrix. Every character is
+    classified through a lookup table, and the kept digits are accumulated
+    column by column (Horner's rule) into int64s. No Python code runs per
+    number, only per column.
+    """
+    country_code = _country_code(default_country_code)
+    count = len(values)
+    if count == 0:
+        return PhoneBatch(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool))
+    if not set(map(type, values)) <= {str}:
+        values = [_text(value) for value in values]
+    # As wide as the longest value, up to one column more than allowed so
+    # an over-long value can be told from a full one
+    width = max(1, min(max(map(len, values)), MAX_LENGTH + 1))
+    codes = np.array(values, dtype=f"U{width}").view(np.uint32).reshape(count, width)
+    kinds = _KINDS[np.minimum(codes, _OTHER_CODE)]
+
+    is_digit = kinds == _DIGIT
+    is_plus = kinds == _PLUS
+    bad = (kinds == _OTHER).any(axis=1)
+    if width > MAX_LENGTH:
+        bad |= codes[:, MAX_LENGTH] != 0
+    lengths = is_digit.sum(axis=1)
+    has_digits = lengths > 0
+    # Digit number (1-based) at and left of every column
+    order = np.cumsum(is_digit, axis=1, dtype=np.int8)
+    rows = np.arange(count)
+
+    # One "+" before the first digit; anything else with a "+" is invalid
+    pluses = is_plus.sum(axis=1)
+    international = (pluses == 1) & (~has_digits | (is_plus.argmax(axis=1) < is_digit.argmax(axis=1)))
+    bad |= (pluses > 1) | ((pluses == 1) & ~international)
+
+    # Leading zeros: "00" is an international prefix, "0" a trunk prefix
+    digits = (codes - 48).astype(np.int8)
+    first = np.where(has_digits, digits[rows, is_digit.argmax(axis=1)], -1)
+    second = np.where(lengths > 1, digits[rows, (is_digit & (order == 2)).argmax(axis=1)], -1)
+    double_zero = ~international & (first == 0) & (second == 0)
+    trunk_zero = ~international & ~double_zero & (first == 0) & bool(country_code)
+    international |= double_zero
+    dropped = np.where(double_zero, 2, np.where(trunk_zero, 1, 0)).astype(np.int8)
+    kept_lengths = lengths - dropped
+
+    # Column-major, so every step of the loop reads contiguous memory
+    kept = np.ascontiguousarray((is_digit & (order > dropped[:, None])).T)
+    digits = np.ascontiguousarray(np.where(kept, digits.T, 0))
+    numbers = np.zeros(count, dtype=np.int64)
+    for column in range(min(width, MAX_LENGTH)):
+        # Over-long numbers wrap around here; they are invalid anyway
+        numbers = numbers * np.where(kept[column], 10, 1) + digits[column]
+
+    final_lengths = kept_lengths
+    if country_code:
+        prefixed = ~international & (trunk_zero | (kept_lengths <= NATIONAL_MAX_DIGITS))
+        prefixed &= kept_lengths <= MAX_DIGITS
+        numbers = np.where(
+            prefixed,
+            int(country_code) * _POWERS[np.clip(kept_lengths, 0, MAX_DIGITS)] + numbers,
+            numbers,
+        )
+        final_lengths = np.where(prefixed, kept_lengths + len(country_code), kept_lengths)
+
+    in_range = (final_lengths >= MIN_DIGITS) & (final_lengths <= MAX_DIGITS)
+    # A leading zero makes the number shorter than its digit count
+    leading = in_range & (numbers >= _POWERS[np.clip(final_lengths - 1, 0, MAX_DIGITS)])
+    valid = ~bad & in_range & leading
+    return PhoneBatch(np.where(valid, numbers, 0), valid)
+
+
+class PhoneDeduper:
+    """Remembers numbers across batches and picks out the first copy of each.
+
+    Numbers seen so far are kept as sorted int64 runs that are merged like
+    a binary counter, so there are about log2(n) runs at most. Memory is 8
+    bytes per distinct number, and a lookup is one binary search per run.
+    """
+
+    def __init__(self) -> None:
+        self._runs: List[np.ndarray] = []
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return sum(run.size for run in self._runs)
+
+    def first_seen(self, numbers: np.ndarray, valid: Optional[np.ndarray] = None) -> np.ndarray:
+        """Mask of the numbers not seen before, the first copy only within the batch."""
+        candidates = np.flatnonzero(valid) if valid is not None else np.arange(numbers.size)
+        unique, first = np.unique(numbers[candidates], return_index=True)
+        fresh = np.ones(unique.size, dtype=bool)
+        for run in self._runs:
+            at = np.searchsorted(run, unique)
+            inside = at < run.size
+            fresh[inside] &= run[at[inside]] != unique[inside]
+        mask = np.zeros(numbers.size, dtype=bool)
+        mask[candidates[first[fresh]]] = True
+        self.duplicates += candidates.size - int(fresh.sum())
+        self._add(unique[fresh])
+        return mask
+
+    def _add(self, run: np.ndarray) -> None:
+        if not run.size:
+            return
+        self._runs.append(run)
+        while len(self._runs) > 1 and self._runs[-2].size <= 2 * self._runs[-1].size:
+            newer, older = self._runs.pop(), self._runs.pop()
+            merged = np.concatenate((older, newer))
+            # Two sorted runs: the stable sort merges them in linear time
+            merged.sort(kind="stable")
+            self._runs.append(merged)
@@ -0,0 +1,204 @@
+"""Async token bucket for pacing outbound Graph API traffic."""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+
+class TokenBucket:
+    """Hand out at most ``rate`` tokens per second, with bursts of ``burst``.
+
+    ``acquire`` reserves its tokens straight away and then sleeps off any
+    deficit, so callers are served in arrival order. The long-run rate never
+    goes above ``rate`` no matter how many tasks are waiting. There is no
+    lock: nothing awaits between reading and updating the balance.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._acquired = 0
+        self._waited = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate; tokens earned so far are kept."""
+        self._refill()
+        self.rate = max(float(rate), 1e-6)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        self._refill()
+        self._tokens -= tokens
+        self._acquired += 1
+        if self._tokens >= 0:
+            return
+        delay = -self._tokens / self.rate
+        self._waited += delay
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Give the reservation back so later callers are not delayed
+            self._refill()
+            self._tokens += tokens
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "burst": self.capacity,
+            "available": round(max(0.0, self._tokens), 3),
+            "reserved": round(max(0.0, -self._tokens), 3),
+            "acquired": self._acquired,
+            "average_wait_ms": round(self._waited / self._acquired * 1000, 2) if self._acquired else 0.0,
+        }
+
+
+class AdaptiveRateController:
+    """AIMD control of a token bucket's rate below a fixed ceiling.
+
+    On a throttling response the rate is multiplied by ``decrease_factor``.
+    Further throttles within ``increase_interval`` are treated as echoes of
+    the same overload, since requests already in flight report it too. While
+    sends succeed, the rate climbs back by ``increase_step`` msg/s per
+    ``increase_interval`` until it reaches ``ceiling`` again.
+    """
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        ceiling: float,
+        floor: float = 1.0,
+        decrease_factor: float = 0.5,
+        increase_step: float = 5.0,
+        increase_interval: float = 1.0,
+    ) -> None:
+        self.bucket = bucket
+        self.ceiling = ceiling
+        self.floor = min(floor, ceiling)
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.increase_interval = increase_interval
+        self._last_change = time.monotonic()
+        self._last_decrease = float("-inf")
+        self._throttled = 0
+        self._decreases = 0
+        self._increases = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def on_throttle(self) -> None:
+        self._throttled += 1
+        now = time.monotonic()
+        if now - self._last_decrease < self.increase_interval:
+            return
+        self.bucket.set_rate(max(self.floor, self.bucket.rate * self.decrease_factor))
+        self._last_change = self._last_decrease = now
+        self._decreases += 1
+
+    def on_success(self) -> None:
+        if self.bucket.rate >= self.ceiling:
+            return
+        now = time.monotonic()
+        if now - self._last_change < self.increase_interval:
+            return
+        steps = (now - self._last_change) // self.increase_interval
+        self.bucket.set_rate(min(self.ceiling, self.bucket.rate + steps * self.increase_step))
+        self._last_change = now
+        self._increases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "effective_rate": round(self.bucket.rate, 2),
+            "ceiling": self.ceiling,
+            "throttled": self._throttled,
+            "decreases": self._decreases,
+            "increases": self._increases,
+        }
+
+
+class PairRateScheduler:
+    """Space out messages to the same recipient by at least ``interval``.
+
+    Meta limits how fast one business number can message one user (error
+    131056). Last-send times are kept in a dict keyed by the recipient's
+    digits as an int. Entries older than ``interval`` no longer matter, so
+    they are pruned as the table grows and its size follows the number of
+    recipients messaged in the last few seconds. Only sends to the same
+    recipient wait on each other.
+    """
+
+    def __init__(self, interval: float = 6.0, prune_threshold: int = 10_000) -> None:
+        self.interval = interval
+        self.prune_threshold = prune_threshold
+        self._next_allowed: Dict[int, float] = {}
+        self._delayed = 0
+        self._deferred = 0
+        self._total_delay = 0.0
+
+    @staticmethod
+    def key(recipient: str) -> int:
+        digits = "".join(ch for ch in recipient if ch.isdigit())
+        return int(digits) if digits else 0
+
+    def delay_for(self, recipient: str) -> float:
+        """Seconds until ``recipient`` may be messaged again, without reserving."""
+        allowed = self._next_allowed.get(self.key(recipient))
+        return max(0.0, allowed - time.monotonic()) if allowed else 0.0
+
+    def reserve(self, recipient: str, max_wait: Optional[float] = None) -> Optional[float]:
+        """Claim the next send slot for ``recipient`` and return the delay.
+
+        Returns None without reserving when the delay would exceed
+        ``max_wait``, so the caller can put the message aside and move on.
+        """
+        now = time.monotonic()
+        key = self.key(recipient)
+        slot = max(now, self._next_allowed.get(key, now))
+        delay = slot - now
+        if max_wait is not None and delay > max_wait:
+            self._deferred += 1
+            return None
+        self._next_allowed[key] = slot + self.interval
+        if delay > 0:
+            self._delayed += 1
+            self._total_delay += delay
+        if len(self._next_allowed) > self.prune_threshold:
+            self._prune(now)
+        return delay
+
+    async def wait(self, recipient: str, max_wait: Optional[float] = None) -> bool:
+        """Sleep until ``recipient`` may be messaged; False if deferred."""
+        delay = self.reserve(recipient, max_wait)
+        if delay is None:
+            return False
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return True
+
+    def penalize(self, recipient: str) -> None:
+        """Meta reported a pair-rate hit: hold the recipient for a full interval."""
+        self._next_allowed[self.key(recipient)] = time.monotonic() + self.interval
+
+    def _prune(self, now: float) -> None:
+        self._next_allowed = {k: t for k, t in self._next_allowed.items() if t > now}
+        # Never prune on every call when most entries are still live
+        self.prune_threshold = max(self.prune_threshold, 2 * len(self._next_allowed))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "tracked_recipients": len(self._next_allowed),
+            "delayed": self._delayed,
+            "deferred": self._deferred,
+            "average_delay_ms": round(self._total_delay / self._delayed * 1000, 2) if self._delayed else 0.0,
+        }
@@ -0,0 +1,57 @@
+"""Retry rules for outbound Graph API sends."""
+import random
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.utils.error_handler import WhatsAppError, WhatsAppThrottledError
+
+
+class RetryRule(NamedTuple):
+    """How often and how patiently to retry one class of error."""
+
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+
+
+# Defaults per error class; attempts count the first send
+DEFAULT_RETRY_RULES: Dict[str, RetryRule] = {
+    # Meta or network trouble: 5xx, timeouts, dropped connections
+    "transient": RetryRule(max_attempts=5, base_delay=1.0, max_delay=60.0),
+    # Rate limits: the AIMD controller slows the number down meanwhile
+    "throttled": RetryRule(max_attempts=6, base_delay=0.5, max_delay=30.0),
+    # Bad request, invalid recipient, template problems: retrying cannot help
+    "permanent": RetryRule(max_attempts=1, base_delay=0.0, max_delay=0.0),
+}
+
+
+def classify_error(error: Exception) -> str:
+    """Map a send failure to an error class of the retry policy."""
+    if isinstance(error, WhatsAppThrottledError):
+        return "throttled"
+    status_code = error.status_code if isinstance(error, WhatsAppError) else 500
+    if status_code >= 500 or status_code in (408, 409):
+        return "transient"
+    return "permanent"
+
+
+class RetryPolicy:
+    """Decide whether and when a failed send is tried again.
+
+    Delays grow exponentially per attempt with "full jitter": a uniform
+    random delay between zero and the capped exponential. Retries from one
+    burst of failures are spread out instead of hitting the API together.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, RetryRule]] = None) -> None:
+        self.rules = {**DEFAULT_RETRY_RULES, **(rules or {})}
+
+    def next_delay(self, error: Exception, attempts: int) -> Optional[float]:
+        """Delay before the next try after ``attempts`` sends, or None to give up."""
+        rule = self.rules[classify_error(error)]
+        if attempts >= rule.max_attempts:
+            return None
+        ceiling = min(rule.max_delay, rule.base_delay * (2 ** (attempts - 1)))
+        return random.uniform(0, ceiling)
+
+    def describe(self) -> Dict[str, Any]:
+        return {name: rule._asdict() for name, rule in self.rules.items()}
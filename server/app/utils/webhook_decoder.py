@@ -0,0 +1,40 @@
+"""Single-pass decoding of raw webhook request bodies."""
+import json
+from typing import Any, Dict, List, NamedTuple
+
+from app.utils.whatsapp_utils import WebhookEvent, iter_webhook_events
+
+try:
+    import orjson
+
+    def _loads(raw: bytes) -> Any:
+        return orjson.loads(raw)
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    def _loads(raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class DecodedWebhook(NamedTuple):
+    """Webhook body decoded once, plus the typed events found in it."""
+
+    body: Dict[str, Any]
+    events: List[WebhookEvent]
+
+
+def decode_webhook(raw: bytes) -> DecodedWebhook:
+    """Parse the raw request bytes and extract every event in one pass.
+
+    The bytes are parsed exactly once (with orjson when it is installed) and
+    walked straight into ``MessageEvent``/``StatusEvent`` tuples, so nothing
+    downstream has to re-serialise or re-walk the payload. Raises
+    ``ValueError`` for bodies that are not a WhatsApp webhook object.
+    """
+    try:
+        body = _loads(raw)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON body: {str(e)}") from e
+
+    if not isinstance(body, dict) or not isinstance(body.get("entry"), list):
+        raise ValueError("Invalid webhook payload")
+
+    return DecodedWebhook(body=body, events=list(iter_webhook_events(body)))
@@ -1,6 +1,6 @@
 import json
 import re
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Union
 
 from loguru import logger
 
@@ -41,63 +41,121 @@ def log_http_response(response: Any) -> None:
     logger.info("Body: %s", response.text)
 
 
+class MessageEvent(NamedTuple):
+    """Inbound customer message from a webhook payload."""
+
+    phone_number_id: Optional[str]
+    wa_id: str
+    name: Optional[str]
+    message_id: str
+    timestamp: str
+    type: str
+    text: str
+    media: Optional[Dict[str, Any]]
+
+
+class StatusEvent(NamedTuple):
+    """Delivery status update (sent/delivered/read/failed) for an outbound message."""
+
+    phone_number_id: Optional[str]
+    message_id: str
+    recipient_id: Optional[str]
+    status: str
+    timestamp: Optional[str]
+    errors: Optional[List[Dict[str, Any]]]
+    callback_data: Optional[str]
+
+
+WebhookEvent = Union[MessageEvent, StatusEvent]
+
+MEDIA_MESSAGE_TYPES = ("audio", "image", "video", "document")
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    message_type = message.get("type", "unknown")
+    if message_type == "text":
+        return message.get("text", {}).get("body", "")
+    return f"[{message_type.title()} Message]"
+
+
+def iter_webhook_events(body: Dict[str, Any]) -> Iterator[WebhookEvent]:
+    """Yield every message and status in a webhook payload.
+
+    Meta batches several entries, changes, messages and statuses into one
+    delivery at high volume, so the whole tree is walked. Malformed items are
+    logged and skipped so that they cannot hide the rest of the batch.
+    """
+    for entry in body.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+            phone_number_id = (value.get("metadata") or {}).get("phone_number_id")
+
+            names = {
+                contact.get("wa_id"): (contact.get("profile") or {}).get("name")
+                for contact in value.get("contacts") or []
+            }
+
+            for message in value.get("messages") or []:
+                try:
+                    message_type = message["type"]
+                    wa_id = message["from"]
+                    yield MessageEvent(
+                        phone_number_id=phone_number_id,
+                        wa_id=wa_id,
+                        name=names.get(wa_id),
+                        message_id=message["id"],
+                        timestamp=message["timestamp"],
+                        type=message_type,
+                        text=_message_text(message),
+                        media=message.get(message_type)
+                        if message_type in MEDIA_MESSAGE_TYPES else None,
+                    )
+                except KeyError as e:
+                    logger.error(f"Skipping malformed webhook message, missing {e}")
+
+            for status in value.get("statuses") or []:
+                try:
+                    yield StatusEvent(
+                        phone_number_id=phone_number_id,
+                        message_id=status["id"],
+                        recipient_id=status.get("recipient_id"),
+                        status=status["status"],
+                        timestamp=status.get("timestamp"),
+                        errors=status.get("errors"),
+                        callback_data=status.get("biz_opaque_callback_data"),
+                    )
+                except KeyError as e:
+                    logger.error(f"Skipping malformed webhook status, missing {e}")
+
+
+def message_event_to_data(event: MessageEvent) -> Dict[str, Any]:
+    """Flatten a message event into the dict shape used by the bot."""
+    message_data = {
+        "from": event.wa_id,
+        "wa_id": event.wa_id,
+        "name": event.name,
+        "message_id": event.message_id,
+        "timestamp": event.timestamp,
+        "type": event.type,
+        "message": event.text,
+    }
+    if event.media is not None:
+        message_data[event.type] = event.media
+    return message_data
+
+
 def is_valid_whatsapp_message(body: Dict[str, Any]) -> bool:
-    """Check if the incoming webhook event has a valid WhatsApp message structure.
+    """Check if the incoming webhook event contains at least one WhatsApp message.
     """
-    return (
-        body.get("object")
-        and body.get("entry")
-        and body["entry"][0].get("changes")
-        and body["entry"][0]["changes"][0].get("value")
-        and body["entry"][0]["changes"][0]["value"].get("messages")
-        and body["entry"][0]["changes"][0]["value"]["messages"][0]
+    return bool(body.get("object")) and any(
+        isinstance(event, MessageEvent) for event in iter_webhook_events(body)
     )
 
 
 def extract_whatsapp_message_data(body: dict) -> dict:
-    """Extract message data from WhatsApp webhook body."""
-    try:
-        entry = body["entry"][0]
-        changes = entry["changes"][0]
-        value = changes["value"]
-        
-        # Extract contact info
-        contact = value["contacts"][0]
-        wa_id = contact["wa_id"]
-        name = contact["profile"]["name"]
-        
-        message = value["messages"][0]
-        
-        # Get basic message info
-        message_data = {
-            "from": message["from"],
-            "wa_id": wa_id,
-            "name": name,
-            "message_id": message["id"],
-            "timestamp": message["timestamp"],
-            "type": message["type"]
-        }
-        
-        # Handle different message types
-        if message["type"] == "text":
-            message_data["message"] = message["text"]["body"]
-        elif message["type"] == "audio":
-            message_data["message"] = "[Audio Message]"
-            message_data["audio"] = message["audio"]
-        elif message["type"] == "image":
-            message_data["message"] = "[Image Message]"
-            message_data["image"] = message["image"]
-        elif message["type"] == "video":
-            message_data["message"] = "[Video Message]"
-            message_data["video"] = message["video"]
-        elif message["type"] == "document":
-            message_data["message"] = "[Document Message]"
-            message_data["document"] = message["document"]
-        else:
-            message_data["message"] = f"[{message['type'].title()} Message]"
-            
-        return message_data
-        
-    except KeyError as e:
-        logger.error(f"Error extracting WhatsApp message data: {e}")
-        raise ValueError("Invalid message format") from e
\ No newline at end of file
+    """Extract the first message from a WhatsApp webhook body."""
+    for event in iter_webhook_events(body):
+        if isinstance(event, MessageEvent):
+            return message_event_to_data(event)
+    logger.error("Error extracting WhatsApp message data: no message in payload")
+    raise ValueError("Invalid message format")
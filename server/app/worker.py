@@ -0,0 +1,67 @@
+"""Campaign worker process: sends the campaigns the API queues in campaign_jobs.
+
+Run as many as needed, one per core, on one host or several; they share
+the queue through Postgres and never claim the same job. A sender number is
+sent from by one worker at a time, so it never goes over its tier rate;
+more workers add throughput across numbers, not on a single one. One of
+them at a time also queues scheduled campaigns when they are due:
+
+    poetry run python -m app.worker [--jobs 4]
+"""
+import argparse
+import asyncio
+import signal
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.graph_client import graph_client
+from app.core.logger import setup_logging
+from app.core.template_registry import template_registry
+from app.services.campaign_scheduler import CampaignScheduler
+from app.services.campaign_worker import build_campaign_sender, build_campaign_worker
+from app.services.whatsapp_service import WhatsAppService
+
+
+async def run(max_jobs: Optional[int] = None) -> None:
+    """Run a campaign worker until SIGINT or SIGTERM."""
+    worker = build_campaign_worker(build_campaign_sender(WhatsAppService()), max_jobs=max_jobs)
+    scheduler = CampaignScheduler(
+        reload_interval=settings.CAMPAIGN_SCHEDULER_INTERVAL,
+        batch_size=settings.CAMPAIGN_SCHEDULER_BATCH,
+    )
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    await graph_client.start()
+    await template_registry.start()
+    try:
+        await worker.start()
+        await scheduler.start()
+        await stopping.wait()
+        logger.info("Stopping campaign worker; running campaigns go back to the queue")
+    finally:
+        await scheduler.stop()
+        await worker.stop()
+        await template_registry.stop()
+        await graph_client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help=f"campaign jobs run at once (default {settings.CAMPAIGN_WORKER_JOBS})",
+    )
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(run(args.jobs))
+
+
+if __name__ == "__main__":
+    main()
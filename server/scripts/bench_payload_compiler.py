@@ -0,0 +1,95 @@
+"""Micro-benchmark: per-recipient template payload building vs. the compiled payload.
+
+Measures CPU time per message for producing the request body of one
+campaign send, as the old send path did it and as the campaign engine does
+it now.
+
+Usage:
+    poetry run python scripts/bench_payload_compiler.py [--messages 20000] [--parameters 4]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.payload_compiler import (  # noqa: E402
+    build_template_payload,
+    compile_template_payload,
+)
+
+CAMPAIGN_ID = "2f1c5a9e-7d0b-4f1e-9a51-0c6c1f4e8a77"
+
+
+def build_template_data(parameters: int) -> dict:
+    """A realistic marketing template: image header, body text and a URL button."""
+    return {
+        "language": {"code": "en_US"},
+        "components": [
+            {
+                "type": "HEADER",
+                "parameters": [{"type": "image", "image": {"link": "https://example.com/banner.jpg"}}],
+            },
+            {
+                "type": "BODY",
+                "parameters": [
+                    {"type": "text", "text": f"Offer detail number {i} for this week"}
+                    for i in range(parameters)
+                ],
+            },
+            {"type": "BUTTONS", "parameters": [{"type": "text", "text": "summer-sale"}]},
+        ],
+    }
+
+
+def legacy_path(recipients: list, template_data: dict) -> None:
+    """What send_template_message did for every recipient of a campaign."""
+    for recipient in recipients:
+        to = recipient if recipient.startswith("+") else f"+{recipient}"
+        payload = build_template_payload(to, "summer_sale", template_data, CAMPAIGN_ID)
+        f"Template message payload:\n{json.dumps(payload, indent=2)}"  # debug log
+        f"Payload: {json.dumps(payload, indent=2)}"  # debug log in _send_message
+        json.dumps(payload).encode()  # httpx json=
+
+
+def compiled_path(recipients: list, template_data: dict) -> None:
+    """One compile per campaign, then a splice per recipient."""
+    compiled = compile_template_payload("summer_sale", template_data, CAMPAIGN_ID)
+    for recipient in recipients:
+        to = recipient if recipient.startswith("+") else f"+{recipient}"
+        compiled.render(to)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--parameters", type=int, default=4)
+    args = parser.parse_args()
+
+    recipients = [f"9198{i:08d}" for i in range(args.messages)]
+    template_data = build_template_data(args.parameters)
+
+    # The two paths must produce the same request
+    to = f"+{recipients[0]}"
+    expected = build_template_payload(to, "summer_sale", template_data, CAMPAIGN_ID)
+    rendered = compile_template_payload("summer_sale", template_data, CAMPAIGN_ID).render(to)
+    assert json.loads(rendered) == expected
+
+    legacy = min(timeit.repeat(
+        lambda: legacy_path(recipients, template_data), number=1, repeat=5, timer=time.process_time
+    ))
+    compiled = min(timeit.repeat(
+        lambda: compiled_path(recipients, template_data), number=1, repeat=5, timer=time.process_time
+    ))
+
+    print(f"payload: {len(rendered)} bytes, {args.parameters} body parameters, {args.messages} messages")
+    print(f"per-recipient build: {legacy / args.messages * 1e6:8.2f} us CPU/message")
+    print(f"compiled payload   : {compiled / args.messages * 1e6:8.2f} us CPU/message")
+    print(f"speedup            : {legacy / compiled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
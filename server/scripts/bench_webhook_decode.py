@@ -0,0 +1,121 @@
+"""Micro-benchmark: legacy dict webhook path vs. the raw-bytes decoder.
+
+Usage:
+    poetry run python scripts/bench_webhook_decode.py [--events 50] [--rounds 2000]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.webhook_decoder import decode_webhook  # noqa: E402
+
+APP_SECRET = b"bench-secret"
+
+
+def build_payload(events: int) -> bytes:
+    """A realistic delivery with half messages and half statuses."""
+    now = str(int(time.time()))
+    messages = [
+        {
+            "from": f"1555000{i:04d}",
+            "id": f"wamid.HBgLMTU1NTAwMDAwMDAVAgASGBQz{i:08d}",
+            "timestamp": now,
+            "type": "text",
+            "text": {"body": f"Hi, where is my order ORD{i:06d}?"},
+        }
+        for i in range(events // 2)
+    ]
+    statuses = [
+        {
+            "id": f"wamid.HBgLMTU1NTAwMDAwMDAVAgARGBI{i:08d}",
+            "status": "delivered",
+            "timestamp": now,
+            "recipient_id": f"1555100{i:04d}",
+            "biz_opaque_callback_data": "2f1c5a9e-7d0b-4f1e-9a51-0c6c1f4e8a77",
+            "conversation": {"id": f"conv{i}", "origin": {"type": "marketing"}},
+            "pricing": {"billable": True, "pricing_model": "CBP", "category": "marketing"},
+        }
+        for i in range(events - events // 2)
+    ]
+    body = {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "102290129340398",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {
+                        "display_phone_number": "15550783881",
+                        "phone_number_id": "106540352242922",
+                    },
+                    "contacts": [
+                        {"profile": {"name": f"Customer {i}"}, "wa_id": m["from"]}
+                        for i, m in enumerate(messages)
+                    ],
+                    "messages": messages,
+                    "statuses": statuses,
+                },
+            }],
+        }],
+    }
+    return json.dumps(body).encode()
+
+
+def legacy_path(raw: bytes) -> None:
+    """What POST /webhook used to do before touching the first message."""
+    body = json.loads(raw)
+    json.dumps(body, indent=2)  # debug log
+    if "statuses" in str(body):  # status short-circuit
+        pass
+    entry = body["entry"][0]
+    value = entry["changes"][0]["value"]
+    if value.get("messages") and value["messages"][0]:
+        contact = value["contacts"][0]
+        message = value["messages"][0]
+        {
+            "from": message["from"],
+            "wa_id": contact["wa_id"],
+            "name": contact["profile"]["name"],
+            "message_id": message["id"],
+            "timestamp": message["timestamp"],
+            "type": message["type"],
+            "message": message["text"]["body"],
+        }
+
+
+def decoder_path(raw: bytes, signature: str) -> None:
+    """Signature check on the raw bytes plus a single decode into events."""
+    expected = hmac.new(APP_SECRET, raw, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(f"sha256={expected}", signature):
+        raise RuntimeError("signature mismatch")
+    decode_webhook(raw)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    raw = build_payload(args.events)
+    signature = "sha256=" + hmac.new(APP_SECRET, raw, hashlib.sha256).hexdigest()
+
+    legacy = min(timeit.repeat(lambda: legacy_path(raw), number=args.rounds, repeat=5))
+    decoder = min(timeit.repeat(lambda: decoder_path(raw, signature), number=args.rounds, repeat=5))
+
+    print(f"payload: {len(raw)} bytes, {args.events} events")
+    print(f"legacy dict path : {legacy / args.rounds * 1e6:9.1f} us/delivery (first message only)")
+    print(f"raw-bytes decoder: {decoder / args.rounds * 1e6:9.1f} us/delivery (all events, HMAC checked)")
+    print(f"speedup          : {legacy / decoder:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
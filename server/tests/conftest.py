@@ -0,0 +1,16 @@
+"""Test configuration: settings the app refuses to import without."""
+import os
+
+for name, value in {
+    "WHATSAPP_TOKEN": "test-token",
+    "PHONE_NUMBER_ID": "1000",
+    "APP_ID": "test-app",
+    "APP_SECRET": "test-secret",
+    "BUSINESS_ID": "test-business",
+    "WEBHOOK_URL": "https://example.com/webhook",
+    "VERIFY_TOKEN": "test-verify",
+    "OPENAI_API_KEY": "test-openai",
+    "OPENAI_ASSISTANT_ID": "test-assistant",
+    "SECRET_KEY": "test-secret-key",
+}.items():
+    os.environ.setdefault(name, value)
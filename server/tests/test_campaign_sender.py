@@ -0,0 +1,113 @@
+import json
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services import campaign_service
+from app.services.campaign_sender import CampaignCheckpoint, CampaignSender
+from app.services.campaign_service import CampaignService
+from app.utils.error_handler import WhatsAppError
+
+
+class FakeWhatsAppService:
+    phone_number_id = "1000"
+
+    def __init__(self, rejected: Tuple[str, ...] = ()) -> None:
+        self.rejected = set(rejected)
+        self.sent: List[str] = []
+        self.bodies: List[bytes] = []
+
+    async def send_compiled_template(
+        self,
+        phone_number: str,
+        compiled: Any,
+        variables: Optional[Dict[str, str]] = None,
+        max_pair_wait: Optional[float] = None,
+        phone_number_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if phone_number in self.rejected:
+            raise WhatsAppError("Invalid recipient", status_code=400)
+        self.bodies.append(compiled.render(phone_number, variables))
+        self.sent.append(phone_number)
+        return {"messages": [{"id": f"wamid.{phone_number}"}]}
+
+
+class FakeDeadLetters:
+    def __init__(self) -> None:
+        self.letters: List[Dict[str, Any]] = []
+
+    def write(self, letters: List[Dict[str, Any]]) -> None:
+        self.letters.extend(letters)
+
+
+async def test_checkpoints_persist_every_recipient_outcome(monkeypatch):
+    recipients = [f"+1555000{i:04d}" for i in range(7)]
+    rejected = recipients[3]
+    saved: List[CampaignCheckpoint] = []
+
+    def write_checkpoint(campaign_id: str, state: CampaignCheckpoint) -> str:
+        assert campaign_id == "campaign-1"
+        saved.append(state)
+        return "in_progress"
+
+    # The real wiring of process_campaign, minus the database
+    monkeypatch.setattr(campaign_service, "write_checkpoint", write_checkpoint)
+    dead_letters = FakeDeadLetters()
+    sender = CampaignSender(
+        FakeWhatsAppService(rejected=(rejected,)),
+        rate=1000.0,
+        burst=1000.0,
+        concurrency=3,
+        dead_letters=dead_letters,
+        checkpoint_batch=2,
+    )
+
+    report = await sender.send_campaign(
+        "campaign-1",
+        recipients,
+        "welcome",
+        checkpoint=partial(CampaignService._save_checkpoint, None, "campaign-1"),
+    )
+
+    assert report.sent_count == 6
+    assert report.error_count == 1
+    assert not report.stopped
+    outcomes = {index: (message_id, error) for state in saved for index, message_id, error in state.results}
+    assert sorted(outcomes) == list(range(len(recipients)))
+    for index, recipient in enumerate(recipients):
+        message_id, error = outcomes[index]
+        if recipient == rejected:
+            assert message_id is None
+            assert error == "Invalid recipient"
+        else:
+            assert message_id == f"wamid.{recipient}"
+            assert error is None
+    assert sum(state.sent_delta for state in saved) == 6
+    assert sum(state.error_delta for state in saved) == 1
+    assert saved[-1].offset == len(recipients)
+    assert [letter["recipient"] for letter in dead_letters.letters] == [rejected]
+
+
+async def test_only_variable_campaigns_fill_named_parameters():
+    template_data = {
+        "language": {"code": "en_US"},
+        "components": [{"type": "BODY", "parameters": [{"type": "text", "text": "{{first_name}}"}]}],
+    }
+    service = FakeWhatsAppService()
+    dead_letters = FakeDeadLetters()
+    sender = CampaignSender(service, rate=1000.0, burst=1000.0, dead_letters=dead_letters)
+
+    # An individual campaign has no per-recipient values; the text goes out as written
+    report = await sender.send_campaign("campaign-1", ["+15550000001"], "welcome", template_data)
+    assert report.sent_count == 1
+    assert json.loads(service.bodies[-1])["template"]["components"][0]["parameters"][0]["text"] == "{{first_name}}"
+
+    report = await sender.send_campaign(
+        "campaign-2",
+        [("+15550000002", {"first_name": "Ada"})],
+        "welcome",
+        template_data,
+        with_variables=True,
+    )
+    assert report.sent_count == 1
+    assert json.loads(service.bodies[-1])["template"]["components"][0]["parameters"][0]["text"] == "Ada"
+    assert not dead_letters.letters
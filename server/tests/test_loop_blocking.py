@@ -0,0 +1,133 @@
+"""The webhook and campaign hot paths must never block the event loop.
+
+Both run against a mocked Graph API with artificial latency while a
+LoopLagMonitor samples the loop. A synchronous HTTP call or any other
+blocking work inside ``async def`` holds the loop for at least the mocked
+latency, far above the threshold.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+from app.core.graph_client import graph_client
+from app.core.loop_monitor import LoopLagMonitor
+from app.services.campaign_sender import CampaignSender
+from app.services.whatsapp_bot import WhatsAppBot
+from app.services.whatsapp_service import WhatsAppService
+
+LATENCY = 0.3
+THRESHOLD = 0.1
+USERS = 20
+
+
+class FakeSession:
+    def close(self) -> None:
+        pass
+
+
+class FakeDeadLetters:
+    def write(self, letters: List[Dict[str, Any]]) -> None:
+        pass
+
+
+@pytest.fixture
+async def mocked_graph():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(LATENCY)
+        return httpx.Response(200, json={"messages": [{"id": f"wamid.{time.monotonic_ns()}"}]})
+
+    transport = graph_client.transport
+    graph_client.transport = httpx.MockTransport(handler)
+    await graph_client.close()
+    # Build the client up front; that is start-up work, not the hot path
+    graph_client._ensure_client()
+    yield
+    await graph_client.close()
+    graph_client.transport = transport
+
+
+@pytest.fixture
+async def monitor():
+    monitor = LoopLagMonitor(interval=0.01, threshold=THRESHOLD)
+    await monitor.start()
+    yield monitor
+    await monitor.stop()
+
+
+def webhook_payload(users: int) -> Dict[str, Any]:
+    now = str(int(time.time()))
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "1",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"phone_number_id": "1000"},
+                    "contacts": [
+                        {"wa_id": f"1555100{i:04d}", "profile": {"name": f"User {i}"}}
+                        for i in range(users)
+                    ],
+                    "messages": [
+                        {
+                            "from": f"1555100{i:04d}",
+                            "id": f"wamid.in{i}",
+                            "timestamp": now,
+                            "type": "text",
+                            "text": {"body": "Where is my order?"},
+                        }
+                        for i in range(users)
+                    ],
+                    "statuses": [
+                        {
+                            "id": f"wamid.out{i}",
+                            "recipient_id": f"1555200{i:04d}",
+                            "status": "delivered",
+                            "timestamp": now,
+                            "biz_opaque_callback_data": "campaign-1",
+                        }
+                        for i in range(users)
+                    ],
+                },
+            }],
+        }],
+    }
+
+
+async def test_webhook_path_does_not_block_the_loop(mocked_graph, monitor):
+    bot = WhatsAppBot(session_factory=FakeSession)
+    bot.dedupe = None
+    bot.coalescer.debounce_seconds = bot.coalescer.max_wait_seconds = 0.0
+
+    async def generate_response(message: str, user_id: str, db: Any, context: str = "support") -> str:
+        await asyncio.sleep(LATENCY)
+        return f"Hi {user_id}, your order is on its way."
+
+    bot.openai.generate_response = generate_response
+
+    result = await bot.handle_message(webhook_payload(USERS))
+
+    assert result["status"] == "success"
+    assert sum(1 for r in result["results"] if r["status"] == "success") == USERS
+    assert monitor.max_lag < THRESHOLD
+
+
+async def test_campaign_path_does_not_block_the_loop(mocked_graph, monitor):
+    sender = CampaignSender(
+        WhatsAppService(),
+        rate=1000.0,
+        burst=1000.0,
+        concurrency=20,
+        dead_letters=FakeDeadLetters(),
+    )
+
+    report = await sender.send_campaign(
+        "campaign-1", [f"+1555300{i:04d}" for i in range(100)], "hello_world"
+    )
+
+    assert report.sent_count == 100
+    assert monitor.max_lag < THRESHOLD